@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# micro-benchmark: legacy vs grid colinear merger on synthetic Hough output
+# usage: python scripts/bench_merge_lines.py [n_wires] [pieces_per_wire] [n_diff_examples]
+import pathlib, random, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.config.loader import load_cfg
+from src.geometry.wires import _merge_colinear_legacy, _merge_colinear_grid
+
+def synthetic_segments(n_wires: int, pieces: int, seed: int = 0):
+    """
+    Horizontal/vertical wires cut into `pieces` with small gaps and 1 px jitter, shuffled like
+    Hough output. Returns (segments, wires): each wire as the set of its two outer endpoints.
+    """
+    rnd = random.Random(seed)
+    segs, wires = [], []
+    for _ in range(n_wires):
+        x0, y0 = rnd.randrange(0, 20000), rnd.randrange(0, 20000)
+        length = rnd.randrange(200, 3000)
+        step = length // pieces
+        horizontal = rnd.random() < 0.5
+        ends = []
+        for k in range(pieces):
+            a, b = k * step + rnd.randrange(0, 3), (k + 1) * step - rnd.randrange(0, 3)
+            j = rnd.randrange(-1, 2)
+            if horizontal:
+                segs.append((x0 + a, y0 + j, x0 + b, y0 + j))
+            else:
+                segs.append((x0 + j, y0 + a, x0 + j, y0 + b))
+            ends.append(segs[-1])
+        wires.append(frozenset([ends[0][:2], ends[-1][2:]]))
+    rnd.shuffle(segs)
+    return segs, wires
+
+def _timed(fn, segs, cfg):
+    t0 = time.perf_counter()
+    out = fn(segs, cfg)
+    return out, time.perf_counter() - t0
+
+def _key(polys):
+    return {frozenset(map(tuple, p["polyline"])) for p in polys}
+
+def main():
+    cfg = load_cfg()
+    n_wires = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pieces = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    show = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    for n in (n_wires // 10, n_wires // 2, n_wires):
+        segs, wires = synthetic_segments(max(1, n), pieces)
+        grid, t_grid = _timed(_merge_colinear_grid, segs, cfg)
+        legacy, t_legacy = _timed(_merge_colinear_legacy, segs, cfg)
+        kg, kl, kw = _key(grid), _key(legacy), set(wires)
+        only_legacy, only_grid = sorted(map(sorted, kl - kg)), sorted(map(sorted, kg - kl))
+        # "wires" = synthetic wires returned as exactly one polyline over their outer endpoints
+        print(f"segs={len(segs):6d}  legacy={t_legacy*1000:9.1f} ms ({len(legacy)} polys, wires {len(kl & kw)}/{len(kw)})  "
+              f"grid={t_grid*1000:8.1f} ms ({len(grid)} polys, wires {len(kg & kw)}/{len(kw)})  "
+              f"identical={len(kl & kg)}  legacy-only={len(only_legacy)}  grid-only={len(only_grid)}  "
+              f"speedup={t_legacy / max(t_grid, 1e-9):.1f}x")
+        # legacy grows a group from its seed's first point and the last endpoint it appended (the
+        # touching end of each joined piece, not its far end), so it stops about one piece past the
+        # seed and splits a wire into several polylines; the grid merger spans every member
+        for p in only_legacy[:show]:
+            print(f"    legacy-only {p}")
+        for p in only_grid[:show]:
+            print(f"    grid-only   {p}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # src/cv/bbox_merge.py
 from __future__ import annotations
 from typing import List, Tuple
+from src.utils.box_cluster import merge_overlaps_greedy
 
 def iou(a, b) -> float:
     ax1,ay1,ax2,ay2 = a; bx1,by1,bx2,by2 = b
@@ -17,16 +18,4 @@ def merge_overlaps(bboxes: List[Tuple[float,float,float,float]], iou_thr=0.5):
     """
     Greedy merge boxes with IoU ≥ iou_thr.
     """
-    boxes = list(bboxes)
-    out = []
-    while boxes:
-        b = boxes.pop()
-        merged = True
-        while merged:
-            merged = False
-            for i, c in list(enumerate(boxes)):
-                if iou(b,c) >= iou_thr:
-                    b = (min(b[0],c[0]), min(b[1],c[1]), max(b[2],c[2]), max(b[3],c[3]))
-                    boxes.pop(i); merged=True; break
-        out.append(b)
-    return out
+    return merge_overlaps_greedy(bboxes, iou_thr)
@@ -0,0 +1,80 @@
+# src/cv/phash.py
+from __future__ import annotations
+from typing import List, Dict, Tuple
+import numpy as np
+from PIL import Image
+
+def dhash(img: Image.Image, hash_size: int = 16) -> int:
+    """Difference hash: sign of horizontal gradients on a (hash_size+1)×hash_size thumbnail."""
+    g = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    a = np.asarray(g, dtype=np.int16)
+    bits = (a[:, 1:] > a[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def ink_features(img: Image.Image, grid: int = 4, ink_thr: int = 128) -> np.ndarray:
+    """Ink ratio per cell of a grid×grid layout, plus the overall ink ratio (len grid*grid+1)."""
+    a = np.asarray(img.convert("L"), dtype=np.uint8) < ink_thr
+    H, W = a.shape
+    ys = np.linspace(0, H, grid + 1).astype(int)
+    xs = np.linspace(0, W, grid + 1).astype(int)
+    cells = [a[ys[r]:ys[r+1], xs[c]:xs[c+1]].mean() if (ys[r+1] > ys[r] and xs[c+1] > xs[c]) else 0.0
+             for r in range(grid) for c in range(grid)]
+    return np.array(cells + [a.mean() if a.size else 0.0], dtype=np.float32)
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _ink_close(a: np.ndarray, b: np.ndarray, ink_tol: float, ink_floor: float) -> bool:
+    """Every feature within ink_tol of the larger of the two (relative), cells below ink_floor count as ink_floor."""
+    return bool(np.all(np.abs(a - b) <= ink_tol * np.maximum(np.maximum(a, b), ink_floor)))
+
+def cluster_near_duplicates(
+    hashes: List[int],
+    feats: List[np.ndarray],
+    groups: List[Tuple] | None = None,
+    hash_bits: int = 256,
+    max_hamming: int = 12,
+    ink_tol: float = 0.15,
+    ink_floor: float = 0.02,
+) -> List[List[int]]:
+    """
+    Representative clustering: in index order, each unassigned item becomes a representative
+    and absorbs the later unassigned items within max_hamming dHash bits and a relative ink
+    tolerance of it (see _ink_close). Members are compared with the representative only, so
+    a chain of small differences never links two distinct symbols. Candidates come from
+    multi-index hashing: with max_hamming+1 bands, near-identical hashes share at least one
+    band exactly, so only same-band buckets are compared. Optional `groups` keys (e.g. tile
+    size) must match as well.
+    Returns clusters as ascending index lists, ordered by their representative (first member).
+    """
+    n = len(hashes)
+    n_bands = max(1, min(hash_bits, int(max_hamming) + 1))
+    edges = np.linspace(0, hash_bits, n_bands + 1).astype(int)
+    buckets: Dict[Tuple, List[int]] = {}
+    keys: List[List[Tuple]] = []
+    for i, h in enumerate(hashes):
+        g = groups[i] if groups is not None else None
+        ks = []
+        for b in range(n_bands):
+            width = int(edges[b+1] - edges[b])
+            part = (h >> (hash_bits - int(edges[b+1]))) & ((1 << width) - 1)
+            ks.append((g, b, part))
+            buckets.setdefault((g, b, part), []).append(i)
+        keys.append(ks)
+
+    rep_of = [-1] * n
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        if rep_of[i] >= 0:
+            continue
+        rep_of[i] = i
+        clusters[i] = [i]
+        cand = sorted({j for k in keys[i] for j in buckets[k] if j > i and rep_of[j] < 0})
+        for j in cand:
+            if _hamming(hashes[i], hashes[j]) > max_hamming:
+                continue
+            if not _ink_close(feats[i], feats[j], ink_tol, ink_floor):
+                continue
+            rep_of[j] = i
+            clusters[i].append(j)
+    return list(clusters.values())
@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Tuple
 import math
 from src.utils.io import read_json, write_json, ensure_dir
 from src.utils.logging import setup_logging
+from src.utils.spatial import TextIndex
 
 BBox = Tuple[float,float,float,float]
 
@@ -25,8 +26,15 @@ def _which_side(px,py, bb:BBox) -> str:
     }
     return min(dists, key=dists.get)
 
+def endpoint_key(x, y) -> str:
+    """Key of an endpoint in the ports JSON's endpoint_junction table."""
+    return f"{int(x)},{int(y)}"
+
+def _cell(x, y, size: float) -> Tuple[int,int]:
+    return (int(math.floor(x / size)), int(math.floor(y / size)))
+
 def _cluster_points(pts: List[Tuple[int,int]], radius: float) -> List[List[Tuple[int,int]]]:
-    # simple union-find by radius
+    # union-find by radius (L-inf); grid cells of `radius` so each point only meets its 3x3 neighbourhood
     n = len(pts)
     if n==0: return []
     parent = list(range(n))
@@ -37,12 +45,20 @@ def _cluster_points(pts: List[Tuple[int,int]], radius: float) -> List[List[Tuple
     def union(a,b):
         ra,rb = find(a), find(b)
         if ra!=rb: parent[rb]=ra
+    size = max(float(radius), 1.0)
+    grid: Dict[Tuple[int,int], List[int]] = {}
+    for i, (x, y) in enumerate(pts):
+        grid.setdefault(_cell(x, y, size), []).append(i)
     for i in range(n):
         x1,y1 = pts[i]
-        for j in range(i+1,n):
-            x2,y2 = pts[j]
-            if max(abs(x1-x2), abs(y1-y2)) <= radius:
-                union(i,j)
+        gx, gy = _cell(x1, y1, size)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in grid.get((gx+dx, gy+dy), ()):
+                    if j <= i: continue
+                    x2,y2 = pts[j]
+                    if max(abs(x1-x2), abs(y1-y2)) <= radius:
+                        union(i,j)
     clusters={}
     for i in range(n):
         r=find(i); clusters.setdefault(r,[]).append(pts[i])
@@ -65,13 +81,24 @@ def snap_wires_to_components(cfg, pdf_stem: str):
 
     # 1) cluster endpoints into junctions (T-joints, etc.)
     endpoints = [tuple(pt) for pt in wires["endpoints"]]
-    junction_sets = _cluster_points(endpoints, junc_px)
+    if "junctions" in wires:
+        # skeleton_graph engine: junctions come from the skeleton topology; every free end is its own node
+        jxy = [tuple(j["xy"]) for j in wires["junctions"]]
+        taken = set(jxy)
+        junction_sets = [[xy] for xy in jxy] + [[ep] for ep in dict.fromkeys(endpoints) if ep not in taken]
+    else:
+        junction_sets = _cluster_points(endpoints, junc_px)
     junctions = []
     for i, cluster in enumerate(junction_sets):
         # centroid
         cx = sum(p[0] for p in cluster)/len(cluster); cy = sum(p[1] for p in cluster)/len(cluster)
         junctions.append({"id": f"J{i:04d}", "xy": [round(cx,1), round(cy,1)], "members": cluster})
 
+    endpoint_junction: Dict[str, str] = {}
+    for j in junctions:
+        for m in j["members"]:
+            endpoint_junction.setdefault(endpoint_key(*m), j["id"])
+
     # 2) snap endpoints to nearest component bbox
     connections = []  # wire_endpoint -> (comp, port)
     ports = []        # created anchors on components
@@ -79,6 +106,11 @@ def snap_wires_to_components(cfg, pdf_stem: str):
     # temp id alloc per component
     comp_port_counters = {c["id"]: 0 for c in comps}
 
+    # grid indexes: component bboxes (query by the snap square) and created ports (8 px cells)
+    comp_ix = TextIndex(comps, cell=max(256.0, 4 * snap_px))
+    port_px = 8
+    port_grid: Dict[Tuple[str,int,int], List[int]] = {}
+
     # helper to allocate a port id on a component
     def _alloc_port_id(cid:str)->str:
         comp_port_counters[cid]+=1
@@ -88,7 +120,9 @@ def snap_wires_to_components(cfg, pdf_stem: str):
         ex,ey = ep
         # nearest component within snap_px
         best = (None, 1e9, None)  # (comp, dist, side)
-        for c in comps:
+        # bbox within snap_px (L-inf) <=> it overlaps the snap square; candidates in list order
+        for ci in comp_ix.query_rect((ex-snap_px, ey-snap_px, ex+snap_px, ey+snap_px), min_overlap_px=0.0):
+            c = comps[ci]
             bb = tuple(c["bbox"])
             d = _pt_rect_dist(ex,ey,bb)
             if d <= snap_px and d < best[1]:
@@ -98,12 +132,16 @@ def snap_wires_to_components(cfg, pdf_stem: str):
         comp = best[0]; side=best[2]
         # is there already a port near this endpoint? (avoid duplicates)
         found = None
-        for p in ports:
-            if p["comp_id"]==comp["id"] and max(abs(p["xy"][0]-ex), abs(p["xy"][1]-ey))<=8:
+        gx, gy = _cell(ex, ey, port_px)
+        near = [k for dx in (-1, 0, 1) for dy in (-1, 0, 1) for k in port_grid.get((comp["id"], gx+dx, gy+dy), ())]
+        for k in sorted(near):   # earliest port first, as a linear scan would
+            p = ports[k]
+            if max(abs(p["xy"][0]-ex), abs(p["xy"][1]-ey))<=port_px:
                 found = p; break
         if found is None:
             pid = _alloc_port_id(comp["id"])
             p = {"comp_id": comp["id"], "port_id": pid, "xy":[int(ex),int(ey)], "side": side}
+            port_grid.setdefault((comp["id"],) + _cell(ex, ey, port_px), []).append(len(ports))
             ports.append(p)
         else:
             pid = found["port_id"]
@@ -120,6 +158,7 @@ def snap_wires_to_components(cfg, pdf_stem: str):
         "junctions": junctions,
         "ports": ports,
         "connections": connections,
+        "endpoint_junction": endpoint_junction,   # "x,y" -> junction id, for O(1) lookups in build_graph
         "wires_ref": str(wires_path),
         "components_ref": [r["path"] for r in page_recs]
     }
@@ -0,0 +1,141 @@
+# src/geometry/skeleton_graph.py
+# wire tracer on the skeleton's 8-connected pixel graph: junctions, free ends, simplified branch polylines
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import cv2, numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+def tracer_opts(cfg) -> Dict[str, Any]:
+    tc = (getattr(cfg.geometry, "tracer", {}) or {})
+    return {
+        "min_branch_px": float(tc.get("min_branch_px", 40)),   # shorter free-ended branches are glyphs / spurs
+        "dp_epsilon_px": float(tc.get("dp_epsilon_px", 1.5)),  # Douglas–Peucker tolerance
+    }
+
+def _pixel_graph(sk: np.ndarray) -> Tuple[np.ndarray, np.ndarray, sparse.csr_matrix]:
+    """(ys, xs, A): skeleton pixels and their symmetric adjacency. A diagonal step is dropped when
+    an orthogonal path through a shared neighbour exists, so staircases do not read as junctions."""
+    on = sk > 0
+    H, W = on.shape
+    ys, xs = np.nonzero(on)
+    idx = np.full((H, W), -1, dtype=np.int64)
+    idx[ys, xs] = np.arange(len(ys))
+    pad = np.pad(on, 1)
+    rows, cols = [], []
+    for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        ny, nx = ys + dy, xs + dx
+        ok = pad[ny + 1, nx + 1]
+        if dy and dx:
+            # (y, x+dx) or (y+1, x) on: the diagonal is redundant
+            ok &= ~(pad[ys + 1, xs + dx + 1] | pad[ys + 2, xs + 1])
+        a = idx[ys[ok], xs[ok]]
+        b = idx[ny[ok], nx[ok]]
+        rows += [a, b]; cols += [b, a]
+    r = np.concatenate(rows) if rows else np.zeros(0, np.int64)
+    c = np.concatenate(cols) if cols else np.zeros(0, np.int64)
+    n = len(ys)
+    A = sparse.csr_matrix((np.ones(len(r), dtype=np.int8), (r, c)), shape=(n, n))
+    return ys, xs, A
+
+def trace_skeleton(sk: np.ndarray, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Degree >= 3 pixels (clustered) become junctions, degree-1 pixels free ends; each run of
+    degree-2 pixels between them is ordered by a DFS on its own subgraph and simplified with
+    Douglas–Peucker. Branches ending at a junction end exactly on its (rounded) centroid.
+    A component with no end and no junction (a rectangle outline) is a closed loop: its
+    polyline repeats the first point, carries closed=True and adds no endpoints.
+    Returns {polylines:[{polyline:[(x,y),...]}], junctions:[{xy, degree}], endpoints:[(x,y)]}.
+    """
+    ys, xs, A = _pixel_graph(sk)
+    n = len(ys)
+    if n == 0:
+        return {"polylines": [], "junctions": [], "endpoints": []}
+    deg = np.asarray(A.sum(axis=1)).ravel()
+    is_j = deg >= 3
+
+    # junction pixels → clusters (adjacent junction pixels are one junction)
+    jpix = np.flatnonzero(is_j)
+    jcluster = np.full(n, -1, dtype=np.int64)
+    junctions: List[Dict[str, Any]] = []
+    if len(jpix):
+        nj, lab = csgraph.connected_components(A[jpix][:, jpix], directed=False)
+        jcluster[jpix] = lab
+        cx = np.bincount(lab, weights=xs[jpix], minlength=nj) / np.bincount(lab, minlength=nj)
+        cy = np.bincount(lab, weights=ys[jpix], minlength=nj) / np.bincount(lab, minlength=nj)
+        jxy = np.stack([np.round(cx), np.round(cy)], axis=1).astype(np.int64)
+        junctions = [{"xy": (int(x), int(y)), "degree": 0} for x, y in jxy]
+
+    # branches: components of the graph without junction pixels (paths, or loops)
+    keep = np.flatnonzero(~is_j)
+    B = A[keep][:, keep].tocsr()
+    bdeg = np.asarray(B.sum(axis=1)).ravel()
+    groups: List[np.ndarray] = []
+    if len(keep):
+        _, blab = csgraph.connected_components(B, directed=False)
+        order = np.argsort(blab, kind="stable")
+        groups = np.split(order, np.flatnonzero(np.diff(blab[order])) + 1)
+
+    polylines: List[Dict[str, Any]] = []
+    endpoints: List[Tuple[int, int]] = []
+    eps = opts["dp_epsilon_px"]
+    for members in groups:
+        if len(members) == 0:
+            continue
+        sub = B[members][:, members]
+        ends = np.flatnonzero(bdeg[members] <= 1)
+        start = int(ends[0]) if len(ends) else 0
+        seq, _ = csgraph.depth_first_order(sub, start, directed=False, return_predecessors=True)
+        pix = keep[members[seq]]
+        pts = np.stack([xs[pix], ys[pix]], axis=1)
+        if len(ends) == 0 and len(pix) > 2:
+            # every pixel has two branch neighbours and none touches a junction (that would make
+            # it degree >= 3): a closed loop, walked once round by the DFS
+            ring = np.vstack([pts, pts[:1]])
+            if float(np.hypot(*np.diff(ring, axis=0).T).sum()) < opts["min_branch_px"]:
+                continue   # glyph loops (o, 0, D)
+            simp = cv2.approxPolyDP(pts.reshape(-1, 1, 2).astype(np.int32), eps, True).reshape(-1, 2)
+            poly = [(int(x), int(y)) for x, y in simp]
+            polylines.append({"polyline": poly + poly[:1], "closed": True})
+            continue
+
+        # attach the junction(s) each end touches
+        tips = []
+        for end_pix in (pix[0], pix[-1]):
+            nbrs = A.indices[A.indptr[end_pix]:A.indptr[end_pix + 1]]
+            js = jcluster[nbrs[is_j[nbrs]]]
+            tips.append(int(js[0]) if len(js) else -1)
+        if len(pix) == 1 and tips[0] >= 0:
+            # one pixel between two junctions: the second touching junction, if any
+            nbrs = A.indices[A.indptr[pix[0]]:A.indptr[pix[0] + 1]]
+            js = np.unique(jcluster[nbrs[is_j[nbrs]]])
+            tips[1] = int(js[-1]) if len(js) > 1 else -1
+        if tips[0] >= 0:
+            pts = np.vstack([junctions[tips[0]]["xy"], pts])
+        if tips[1] >= 0:
+            pts = np.vstack([pts, junctions[tips[1]]["xy"]])
+
+        length = float(np.hypot(*np.diff(pts, axis=0).T).sum()) if len(pts) > 1 else 0.0
+        free = [t < 0 for t in tips]
+        if length < opts["min_branch_px"] and any(free):
+            continue   # glyph strokes and skeleton spurs; junction-to-junction links are always kept
+        if len(pts) < 2:
+            continue
+        for t in tips:
+            if t >= 0:
+                junctions[t]["degree"] += 1
+        simp = cv2.approxPolyDP(pts.reshape(-1, 1, 2).astype(np.int32), eps, False).reshape(-1, 2)
+        polylines.append({"polyline": [(int(x), int(y)) for x, y in simp]})
+        if free[0]:
+            endpoints.append((int(simp[0, 0]), int(simp[0, 1])))
+        if free[1]:
+            endpoints.append((int(simp[-1, 0]), int(simp[-1, 1])))
+
+    # a junction whose other branches were all pruned is a free end of the one left;
+    # junctions with no branch left (blobs, text clusters) are dropped
+    for j in junctions:
+        if j["degree"] == 1:
+            endpoints.append(j["xy"])
+    return {"polylines": polylines,
+            "junctions": [j for j in junctions if j["degree"] >= 1],
+            "endpoints": endpoints}
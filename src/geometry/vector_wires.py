@@ -0,0 +1,66 @@
+# src/geometry/vector_wires.py
+# wire segments straight from PDF drawing operators (PyMuPDF page.get_drawings), in PNG pixel space
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import math
+
+Seg = Tuple[int, int, int, int]
+
+def vector_opts(cfg) -> Dict[str, Any]:
+    vc = (getattr(cfg.geometry, "vector", {}) or {})
+    return {
+        "min_width_pt": float(vc.get("min_width_pt", 0.0)),
+        "max_width_pt": float(vc.get("max_width_pt", 3.0)),
+        "max_luma": float(vc.get("max_luma", 1.0)),
+        "min_len_px": float(vc.get("min_len_px", 20)),
+        "include_rects": bool(vc.get("include_rects", True)),
+    }
+
+def _stroke_ok(d: Dict[str, Any], o: Dict[str, Any]) -> bool:
+    color = d.get("color")
+    if color is None:            # fill-only path (hatching, solid glyphs): not a wire
+        return False
+    w = d.get("width")
+    w = 0.0 if w is None else float(w)
+    if w < o["min_width_pt"] or w > o["max_width_pt"]:
+        return False
+    if o["max_luma"] < 1.0 and len(color) >= 3:
+        luma = 0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]
+        if luma > o["max_luma"]:   # e.g. pale grid / title-block rules
+            return False
+    return True
+
+def _edges(item) -> List[Tuple[Any, Any]]:
+    op = item[0]
+    if op == "l":
+        return [(item[1], item[2])]
+    if op == "re":
+        r = item[1]
+        return [(r.tl, r.tr), (r.tr, r.br), (r.br, r.bl), (r.bl, r.tl)]
+    if op == "qu":
+        q = item[1]
+        return [(q.ul, q.ur), (q.ur, q.lr), (q.lr, q.ll), (q.ll, q.ul)]
+    return []   # bezier curves ("c") are arcs/symbol bodies, not wires
+
+def canonical_seg(x1: int, y1: int, x2: int, y2: int) -> Seg:
+    """Endpoints in lexicographic order: a stroke's drawing direction carries no meaning for a wire."""
+    return (x1, y1, x2, y2) if (x1, y1) <= (x2, y2) else (x2, y2, x1, y1)
+
+def page_vector_segments(page, dpi: int, opts: Dict[str, Any]) -> List[Seg]:
+    """Straight stroked segments of one fitz page, mapped to the rendered PNG's pixel grid (canonical_seg order)."""
+    import fitz  # PyMuPDF
+    m = page.rotation_matrix * fitz.Matrix(dpi / 72.0, dpi / 72.0)
+    min_len = opts["min_len_px"]
+    segs: List[Seg] = []
+    for d in page.get_drawings():
+        if not _stroke_ok(d, opts):
+            continue
+        for item in d.get("items", []):
+            if item[0] == "re" and not opts["include_rects"]:
+                continue
+            for a, b in _edges(item):
+                p, q = fitz.Point(a) * m, fitz.Point(b) * m
+                if math.hypot(q.x - p.x, q.y - p.y) < min_len:
+                    continue
+                segs.append(canonical_seg(int(round(p.x)), int(round(p.y)), int(round(q.x)), int(round(q.y))))
+    return list(dict.fromkeys(segs))   # the same edge is often stroked twice (rect + line), either way round
@@ -1,14 +1,35 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import cv2, numpy as np
 from skimage.morphology import skeletonize as skel
 from src.utils.io import ensure_dir, write_json, read_json
 from src.utils.logging import setup_logging
+from src.geometry.vector_wires import vector_opts, page_vector_segments
+from src.utils.raster_cache import Bilevel, page_bits, page_gray
+from src.geometry.skeleton_graph import tracer_opts, trace_skeleton
+from src.ingest.legend_regions import legend_bbox_from_items
+from src.utils.spatial import load_page_text_index
 import math
 
 BBox = Tuple[int,int,int,int]
 
-def _binarize(img: np.ndarray, cfg) -> np.ndarray:
+def _unpack_ink(bl: Bilevel, rows: int = 1024) -> np.ndarray:
+    """0/255 uint8 ink mask of a Bilevel page or strip, unpacked `rows` at a time into one buffer."""
+    H, W = bl.shape
+    out = np.empty((H, W), dtype=np.uint8)
+    for y in range(0, H, rows):
+        out[y:y + rows] = bl.window(0, y, W, min(H, y + rows))
+    out *= 255
+    return out
+
+def _binarize(img: np.ndarray | Bilevel, cfg) -> np.ndarray:
+    if isinstance(img, Bilevel):
+        # thresholded at ingest (runtime.raster_cache.mode=bilevel): unpack the ink bits, same speckle filter.
+        # This is 1 byte/px for whatever it is given: the banded engine hands it strips, the
+        # skeleton_graph engine (and pages below the band height) the whole page.
+        return cv2.medianBlur(_unpack_ink(img), 3)
     bs = int(cfg.geometry.binarize.blocksize)
     C  = int(cfg.geometry.binarize.C)
     if bs % 2 == 0:
@@ -23,9 +44,8 @@ def _binarize(img: np.ndarray, cfg) -> np.ndarray:
 def _skeletonize(thr: np.ndarray, do_skel: bool) -> np.ndarray:
     if not do_skel:
         return thr
-    bw = (thr > 0).astype(np.uint8)
-    sk = skel(bw > 0)
-    return (sk * 255).astype(np.uint8)
+    sk = skel(thr > 0)
+    return sk.view(np.uint8) * np.uint8(255)
 
 def _hough_segments(sk: np.ndarray, cfg) -> List[Tuple[int,int,int,int]]:
     lines = cv2.HoughLinesP(
@@ -42,7 +62,8 @@ def _hough_segments(sk: np.ndarray, cfg) -> List[Tuple[int,int,int,int]]:
             segs.append((int(x1),int(y1),int(x2),int(y2)))
     return segs
 
-def _merge_colinear(segs: List[Tuple[int,int,int,int]], cfg):
+def _merge_colinear_legacy(segs: List[Tuple[int,int,int,int]], cfg):
+    # seed-and-rescan merger (quadratic-to-cubic); kept for comparison, see scripts/bench_merge_lines.py
     if not segs:
         return []
     angle_eps = math.radians(float(cfg.geometry.merge_lines.angle_deg_eps))
@@ -50,7 +71,7 @@ def _merge_colinear(segs: List[Tuple[int,int,int,int]], cfg):
 
     def angle(s):
         x1,y1,x2,y2 = s
-        return math.atan2(y2-y1, x2-x1)
+        return math.atan2(y2-y1, x2-x1) % math.pi   # undirected: a reversed stroke is the same line
 
     used = [False]*len(segs)
     polys = []
@@ -66,8 +87,9 @@ def _merge_colinear(segs: List[Tuple[int,int,int,int]], cfg):
             for j,t in enumerate(segs):
                 if used[j]: continue
                 bx = angle(t)
-                # angle close?
-                da = abs(math.atan2(math.sin(ax-bx), math.cos(ax-bx)))
+                # angle close? (mod pi)
+                da = abs(ax - bx)
+                da = min(da, math.pi - da)
                 if da < angle_eps:
                     # share an endpoint (within dist_eps)?
                     for a in (pts[0], pts[-1]):
@@ -83,14 +105,324 @@ def _merge_colinear(segs: List[Tuple[int,int,int,int]], cfg):
         polys.append({"polyline":[(int(xs[i1,0]),int(xs[i1,1])), (int(xs[i2,0]),int(xs[i2,1]))]})
     return polys
 
+def _longest_pair(pts: np.ndarray) -> Tuple[int, int]:
+    """Indices (i < j) of the farthest-apart points; the pair lies on the convex hull, so big sets scan only that."""
+    idx = np.arange(len(pts))
+    if len(pts) > 64:
+        idx = np.sort(cv2.convexHull(pts.astype(np.int32), returnPoints=False).ravel())
+    q = pts[idx]
+    d = ((q[:,None,:]-q[None,:,:])**2).sum(-1)
+    i1, i2 = np.unravel_index(np.argmax(d), d.shape)
+    return int(idx[i1]), int(idx[i2])
+
+def _merge_colinear_grid(segs: List[Tuple[int,int,int,int]], cfg):
+    """
+    Seed-grown merger. Seeds are taken in index order (as the legacy merger does); a group is
+    every unassigned segment reachable from its seed through endpoint pairs within
+    endpoint_px_eps (Chebyshev) whose undirected angle is within angle_deg_eps of the *seed's* and
+    whose endpoints both lie within endpoint_px_eps of the seed's line. Testing against the
+    seed, not the neighbour, keeps a chain of slightly bent or stepped pieces from drifting
+    into one group. Neighbours come from a hash keyed by (angle bin, endpoint grid cell);
+    each group becomes the longest span over all its members' endpoints.
+    """
+    if not segs:
+        return []
+    angle_eps = math.radians(float(cfg.geometry.merge_lines.angle_deg_eps))
+    dist_eps  = float(cfg.geometry.merge_lines.endpoint_px_eps)
+    S = np.asarray(segs, dtype=np.int64).reshape(-1, 4)
+    n = len(S)
+    # undirected angle in [0, pi): Hough and PDF strokes come in either direction
+    ang = np.mod(np.arctan2(S[:,3]-S[:,1], S[:,2]-S[:,0]), math.pi)
+
+    # bins at least angle_eps wide: any pair within eps sits in the same or an adjacent bin (cyclic)
+    nb = max(1, int(math.pi // angle_eps)) if angle_eps > 0 else 1
+    abin = np.floor(ang / (math.pi / nb)).astype(np.int64) % nb
+    cell = max(dist_eps, 1.0)
+    ends = S.reshape(n, 2, 2)
+    gcell = np.floor(ends / cell).astype(np.int64)
+
+    grid: Dict[Tuple[int,int,int], List[int]] = {}
+    for i in range(n):
+        for e in range(2):
+            grid.setdefault((int(abin[i]), int(gcell[i,e,0]), int(gcell[i,e,1])), []).append(i)
+
+    group = np.full(n, -1, dtype=np.int64)
+    polys = []
+    for seed in range(n):
+        if group[seed] >= 0:
+            continue
+        group[seed] = seed
+        members = [seed]
+        if angle_eps > 0:
+            a0 = ang[seed]
+            nx, ny = -math.sin(a0), math.cos(a0)                  # unit normal of the seed's line
+            off0 = nx * ends[seed,0,0] + ny * ends[seed,0,1]
+            bins = {(int(abin[seed]) + db) % nb for db in (-1, 0, 1)}
+            stack = [seed]
+            while stack:
+                i = stack.pop()
+                for e in range(2):
+                    gx, gy = int(gcell[i,e,0]), int(gcell[i,e,1])
+                    ax, ay = ends[i,e]
+                    for b in bins:
+                        for dx in (-1, 0, 1):
+                            for dy in (-1, 0, 1):
+                                for j in grid.get((b, gx+dx, gy+dy), ()):
+                                    if group[j] >= 0:
+                                        continue
+                                    da = abs(a0 - ang[j])
+                                    if min(da, math.pi - da) >= angle_eps:
+                                        continue
+                                    if max(abs(nx*ends[j,k,0] + ny*ends[j,k,1] - off0) for k in range(2)) > dist_eps:
+                                        continue
+                                    if min(max(abs(ax-ends[j,k,0]), abs(ay-ends[j,k,1])) for k in range(2)) <= dist_eps:
+                                        group[j] = seed
+                                        members.append(j)
+                                        stack.append(j)
+        pts = ends[members].reshape(-1, 2)
+        i1, i2 = _longest_pair(pts)
+        polys.append({"polyline":[(int(pts[i1,0]),int(pts[i1,1])), (int(pts[i2,0]),int(pts[i2,1]))]})
+    return polys
+
+def _merge_colinear(segs: List[Tuple[int,int,int,int]], cfg):
+    engine = str(cfg.geometry.merge_lines.get("engine", "grid"))
+    return _merge_colinear_legacy(segs, cfg) if engine == "legacy" else _merge_colinear_grid(segs, cfg)
+
 def _endpoints_from_polys(polys):
     pts=[]
     for p in polys:
-        (x1,y1),(x2,y2) = p["polyline"]
-        pts.append((x1,y1)); pts.append((x2,y2))
+        pts.append(tuple(p["polyline"][0])); pts.append(tuple(p["polyline"][-1]))
     # unique
     return list({(int(x),int(y)) for (x,y) in pts})
 
+# ---------- orthogonal engine: H/V lines by morphological opening, Hough only on what is left ----------
+def ortho_opts(cfg) -> Dict[str, Any]:
+    oc = (getattr(cfg.geometry, "orthogonal", {}) or {})
+    return {
+        "min_len_px": int(oc.get("min_len_px", 0) or cfg.geometry.hough.min_line_length),
+        "max_thickness_px": int(oc.get("max_thickness_px", 24)),
+        "gap_px": int(oc.get("gap_px", cfg.geometry.hough.max_line_gap)),
+        "hough_leftovers": bool(oc.get("hough_leftovers", True)),
+    }
+
+def _orthogonal_segments(thr: np.ndarray, cfg) -> List[Tuple[int,int,int,int]]:
+    """
+    Opening with a min_len x 1 (then 1 x min_len) rectangle keeps only horizontal (vertical)
+    strokes; gaps up to gap_px are closed along the same axis, and each connected component
+    no thicker than max_thickness_px becomes one segment through its centre line. Linear in
+    pixels. Ink not covered by the H/V masks (diagonals, glyphs) goes through skeleton + Hough,
+    of which only the non-axis-aligned segments are kept.
+    """
+    o = ortho_opts(cfg)
+    L, gap, thick = max(2, o["min_len_px"]), o["gap_px"], o["max_thickness_px"]
+    segs: List[Tuple[int,int,int,int]] = []
+    hv = np.zeros_like(thr)
+    for horizontal in (True, False):
+        shape = (L, 1) if horizontal else (1, L)   # (width, height)
+        m = cv2.morphologyEx(thr, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, shape))
+        if gap > 0:
+            close = (gap + 1, 1) if horizontal else (1, gap + 1)
+            m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, close))
+        _, _, st, _ = cv2.connectedComponentsWithStats(m, connectivity=8)
+        x, y, w, h = (st[1:, k].astype(np.int64) for k in range(4))
+        if horizontal:
+            ok = (w >= L) & (h <= thick)
+            cy = y + h // 2
+            segs += list(zip(x[ok].tolist(), cy[ok].tolist(), (x + w - 1)[ok].tolist(), cy[ok].tolist()))
+        else:
+            ok = (h >= L) & (w <= thick)
+            cx = x + w // 2
+            segs += list(zip(cx[ok].tolist(), y[ok].tolist(), cx[ok].tolist(), (y + h - 1)[ok].tolist()))
+        cv2.bitwise_or(hv, m, dst=hv)
+    if o["hough_leftovers"]:
+        hv = cv2.dilate(hv, np.ones((3, 3), np.uint8), iterations=2)   # the strokes' anti-aliased edges
+        rest = cv2.bitwise_and(thr, cv2.bitwise_not(hv))
+        for s in _hough_segments(_skeletonize(rest, bool(cfg.geometry.skeletonize)), cfg):
+            dx, dy = abs(s[2] - s[0]), abs(s[3] - s[1])
+            if min(dx, dy) > 0.05 * max(dx, dy):   # diagonals only; H/V ink left here is glyphs
+                segs.append(s)
+    return [tuple(int(v) for v in s) for s in segs]
+
+def _line_segments(thr: np.ndarray, cfg) -> List[Tuple[int,int,int,int]]:
+    if str(getattr(cfg.geometry, "raster_engine", "hough") or "hough") == "orthogonal":
+        return _orthogonal_segments(thr, cfg)
+    sk  = _skeletonize(thr, bool(cfg.geometry.skeletonize))
+    return _hough_segments(sk, cfg)
+
+# ---------- masking: text / title-block boxes blanked out of the binarized page ----------
+def mask_opts(cfg) -> Dict[str, Any]:
+    mc = (getattr(cfg.geometry, "mask", {}) or {})
+    return {
+        "enable": bool(mc.get("enable", True)),
+        "text": bool(mc.get("text", True)),
+        "legend": bool(mc.get("legend", True)),
+        "margin_px": float(mc.get("margin_px", 4)),
+        "count_avoided": bool(mc.get("count_avoided", False)),
+    }
+
+def _scale_items(items: List[Dict[str, Any]], k: float) -> List[Dict[str, Any]]:
+    return [{**it, "bbox": [v * k for v in it["bbox"]]} for it in items] if k != 1.0 else items
+
+def _page_text_items(cfg, pdf_stem: str, pg: Dict[str, Any], dpi: int) -> List[Dict[str, Any]]:
+    """
+    Vector text of a page in PNG pixels, scaled by the coordinate space recorded next to it:
+    the ingest spans (manifest text_ppi), else processed/vector_text (index.json ppi; entries
+    written before ppi was recorded fall back to their source, SVG user units being 96 ppi).
+    """
+    tj, ppi = pg.get("text_json"), pg.get("text_ppi")
+    if tj and ppi and Path(tj).exists():
+        return _scale_items(read_json(tj), dpi / float(ppi))
+    vec_root = Path(cfg.paths.processed)/"vector_text"
+    vec = vec_root/pdf_stem/f"page-{pg['page']}.json"
+    if not vec.exists():
+        return []
+    idx = read_json(vec_root/"index.json") if (vec_root/"index.json").exists() else {}
+    meta = next((p for p in idx.get(pdf_stem, []) if int(p["page"]) == int(pg["page"])), {})
+    ppi = meta.get("ppi") or (96 if meta.get("source") == "svg" else dpi)
+    return _scale_items(load_page_text_index(vec).items, dpi / float(ppi))
+
+def _page_mask_boxes(cfg, pdf_stem: str, pg: Dict[str, Any], dpi: int, mo: Dict[str, Any]) -> List[BBox]:
+    items = _page_text_items(cfg, pdf_stem, pg, dpi) if (mo["text"] or mo["legend"]) else []
+    boxes = [tuple(it["bbox"]) for it in items] if mo["text"] else []
+    legend = legend_bbox_from_items(items) if mo["legend"] else None
+    if legend is not None:
+        boxes.append(legend)
+    m = mo["margin_px"]
+    return [(int(math.floor(x1 - m)), int(math.floor(y1 - m)), int(math.ceil(x2 + m)), int(math.ceil(y2 + m)))
+            for x1, y1, x2, y2 in boxes]
+
+def _mask_boxes(thr: np.ndarray, boxes: List[BBox]) -> None:
+    """Zero every box in thr (in place)."""
+    H, W = thr.shape
+    for x1, y1, x2, y2 in boxes:
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(W, x2), min(H, y2)
+        if x2 > x1 and y2 > y1:
+            thr[y1:y2, x1:x2] = 0
+
+def _segments(img: np.ndarray | Bilevel, cfg, boxes: List[BBox] | None = None,
+              count: bool = False) -> Tuple[List[Tuple[int,int,int,int]], int]:
+    """(segments, segments avoided by the mask) for one page or band. With count, one extra
+    detection pass on the unmasked image: avoided = unmasked - masked segment count."""
+    thr = _binarize(img, cfg)
+    before = len(_line_segments(thr.copy(), cfg)) if (count and boxes) else 0
+    if boxes:
+        _mask_boxes(thr, boxes)
+    segs = _line_segments(thr, cfg)
+    return segs, max(0, before - len(segs)) if before else 0
+
+# ---------- banded engine: overlapping horizontal strips, bounded memory, all cores ----------
+def band_opts(cfg) -> Dict[str, Any]:
+    bc = (getattr(cfg.geometry, "bands", {}) or {})
+    workers = int(bc.get("workers", 0) or 0) or int(getattr(cfg.runtime, "workers", 1) or 1)
+    return {
+        "enable": bool(bc.get("enable", True)),
+        "height_px": max(256, int(bc.get("height_px", 4096))),
+        "overlap_px": max(0, int(bc.get("overlap_px", 128))),
+        "workers": max(1, workers),
+    }
+
+def _bands(H: int, height: int, overlap: int) -> List[Tuple[int,int,int,int]]:
+    """(y0, y1, core0, core1): rows a band reads, and the rows whose segments it owns."""
+    out = []
+    c0 = 0
+    while c0 < H:
+        c1 = min(c0 + height, H)
+        out.append((max(0, c0 - overlap), min(H, c1 + overlap), c0, c1))
+        c0 = c1
+    return out
+
+def _page_rows(png: str, y0: int, y1: int):
+    """Rows [y0, y1) from the ingest raster cache (Bilevel or gray), or None if the page was not cached."""
+    bl = page_bits(png)
+    if bl is not None:
+        return Bilevel(bl.bits[y0:y1], bl.width)
+    gray = page_gray(png)
+    return None if gray is None else np.array(gray[y0:y1])
+
+def _clip_rows(s: Tuple[int,int,int,int], c0: int, c1: int):
+    """Part of s inside the core rows: horizontals by c0 <= y < c1, others clipped to [c0, c1] (shared cut points)."""
+    x1, y1, x2, y2 = s
+    if y1 == y2:
+        return s if c0 <= y1 < c1 else None
+    if y1 > y2:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+    lo, hi = max(y1, c0), min(y2, c1)
+    if hi <= lo:
+        return None
+    fx = lambda y: int(round(x1 + (x2 - x1) * (y - y1) / (y2 - y1)))
+    return (fx(lo), lo, fx(hi), hi)
+
+def _geometry_cfg(cfg):
+    # the only config the band workers read; resolved so it pickles without the env resolvers
+    from omegaconf import OmegaConf
+    return OmegaConf.create({"geometry": OmegaConf.to_container(cfg.geometry, resolve=True)})
+
+def _band_job(png: str, band: Tuple[int,int,int,int], gcfg, boxes: List[BBox],
+              count: bool) -> Tuple[List[Tuple[int,int,int,int]], int]:
+    y0, y1, c0, c1 = band
+    strip = [(x1, by1 - y0, x2, by2 - y0) for x1, by1, x2, by2 in boxes if by2 > y0 and by1 < y1]
+    thr = _binarize(_page_rows(png, y0, y1), gcfg)
+
+    def core(found):
+        out = []
+        for (x1, sy1, x2, sy2) in found:
+            s = _clip_rows((x1, sy1 + y0, x2, sy2 + y0), c0, c1)
+            if s is not None:
+                out.append(s)
+        return out
+
+    # avoided = core segments lost to the mask; one extra pass on the unmasked strip, only when counting
+    before = len(core(_line_segments(thr.copy(), gcfg))) if (count and strip) else 0
+    _mask_boxes(thr, strip)
+    segs = core(_line_segments(thr, gcfg))
+    return segs, max(0, before - len(segs)) if before else 0
+
+def _cached_page(png: Path):
+    # decoded once at ingest (packed bits in bilevel mode); None when the raster cache is off
+    page = page_bits(png)
+    return page if page is not None else page_gray(png)
+
+def _full_page(png: Path, page=None):
+    if page is None:
+        return cv2.imread(str(png), cv2.IMREAD_GRAYSCALE)
+    return page if isinstance(page, Bilevel) else np.asarray(page)
+
+def _raster_trace(png: Path, cfg, boxes: List[BBox] | None = None) -> Dict[str, Any]:
+    """skeleton_graph engine: polylines, junctions and free ends straight from the skeleton (whole page)."""
+    thr = _binarize(_full_page(png, _cached_page(png)), cfg)
+    if boxes:
+        _mask_boxes(thr, boxes)
+    return trace_skeleton(_skeletonize(thr, True), tracer_opts(cfg))
+
+def _raster_segments(png: Path, cfg, ex: ProcessPoolExecutor | None = None, boxes: List[BBox] | None = None,
+                     count: bool = False) -> Tuple[List[Tuple[int,int,int,int]], int]:
+    bo = band_opts(cfg)
+    page = _cached_page(png)
+    H = page.shape[0] if page is not None else 0
+    # Bilevel pages are always banded: only a strip is ever unpacked to 1 byte/px
+    if (bo["enable"] or isinstance(page, Bilevel)) and H > bo["height_px"] + bo["overlap_px"]:
+        # strips are read straight from the memmap; overlap >= blocksize keeps the core's threshold exact
+        bands = _bands(H, bo["height_px"], max(bo["overlap_px"], int(cfg.geometry.binarize.blocksize)))
+        gcfg = _geometry_cfg(cfg)
+        args = ([str(png)] * len(bands), bands, [gcfg] * len(bands), [boxes or []] * len(bands), [count] * len(bands))
+        parts = list(ex.map(_band_job, *args) if ex is not None else map(_band_job, *args))
+        segs = list(dict.fromkeys(s for part, _ in parts for s in part))
+        return segs, sum(n for _, n in parts)
+    return _segments(_full_page(png, page), cfg, boxes, count)
+
+def _open_vector_doc(mani, engine: str):
+    """fitz document for the vector engine, or None (raster-only config, missing PDF / PyMuPDF)."""
+    if engine == "raster":
+        return None
+    pdf = mani.get("pdf")
+    if not pdf or not Path(pdf).exists():
+        return None
+    try:
+        import fitz  # PyMuPDF
+        return fitz.open(pdf)
+    except Exception:
+        return None
+
 def extract_wires_for_pdf(cfg, pdf_stem: str):
     log = setup_logging(cfg.logging.level)
     mani_path = Path(cfg.paths.raw)/"manifests"/f"{pdf_stem}.json"
@@ -100,24 +432,58 @@ def extract_wires_for_pdf(cfg, pdf_stem: str):
     out_root = Path(cfg.paths.processed)/"wires"/pdf_stem
     ensure_dir(out_root)
 
+    # engine: auto (vector on vector-like pages, raster otherwise) | vector | raster
+    engine_cfg = str(getattr(cfg.geometry, "engine", "auto") or "auto")
+    raster_engine = str(getattr(cfg.geometry, "raster_engine", "hough") or "hough")
+    mo = mask_opts(cfg)
+    vopts = vector_opts(cfg)
+    dpi = int(mani.get("dpi") or cfg.runtime.dpi)
+    doc = _open_vector_doc(mani, engine_cfg)
+    bo = band_opts(cfg)
+    ex = ProcessPoolExecutor(max_workers=bo["workers"]) if bo["enable"] and bo["workers"] > 1 else None
+
     for pg in mani["pages"]:
         png = Path(pg["png"])
         assert png.exists(), f"png not found: {png}"
-        img = cv2.imread(str(png), cv2.IMREAD_GRAYSCALE)
-        thr = _binarize(img, cfg)
-        sk  = _skeletonize(thr, bool(cfg.geometry.skeletonize))
-        segs = _hough_segments(sk, cfg)
-        polys = _merge_colinear(segs, cfg)
-        endpoints = _endpoints_from_polys(polys)
+        segs, engine, traced, boxes, avoided = [], "raster", None, [], 0
+        want_vector = engine_cfg == "vector" or (engine_cfg == "auto" and pg.get("vector_like"))
+        if doc is not None and want_vector:
+            segs = page_vector_segments(doc[int(pg["page"]) - 1], dpi, vopts)
+            engine = "vector"
+        if not segs:   # scanned page, or a vector page with no stroked lines
+            # text glyphs / title block never reach the detector
+            boxes = _page_mask_boxes(cfg, pdf_stem, pg, dpi, mo) if mo["enable"] else []
+            if raster_engine == "skeleton_graph":
+                traced, engine = _raster_trace(png, cfg, boxes), "skeleton_graph"   # no avoided count: no segment pass
+            else:
+                (segs, avoided), engine = _raster_segments(png, cfg, ex, boxes, mo["count_avoided"]), "raster"
+        if traced is not None:
+            polys, endpoints = traced["polylines"], traced["endpoints"]
+            segs = [seg for p in polys for seg in zip(p["polyline"], p["polyline"][1:])]   # traced pieces
+        else:
+            polys = _merge_colinear(segs, cfg)
+            endpoints = _endpoints_from_polys(polys)
 
         data = {
             "png": str(png),
             "page": int(pg["page"]),
-            "n_segments_raw": len(segs),
+            "engine": engine,
+            "n_segments_raw": len(segs),    # detector segments (skeleton_graph: pieces of the traced polylines)
+            "n_mask_boxes": len(boxes),
+            "n_segments_masked": avoided,   # lost to the mask: unmasked minus masked detections (0 when count_avoided is off, always 0 for skeleton_graph)
             "n_polylines": len(polys),
-            "polylines": polys,          # [{polyline:[(x1,y1),(x2,y2)]}]
+            "polylines": polys,          # [{polyline:[(x1,y1),(x2,y2)]}] (skeleton_graph: [(x,y), ...], closed loops end on their start, closed=True)
             "endpoints": endpoints       # [(x,y)]
         }
+        if traced is not None:
+            data["junctions"] = traced["junctions"]   # [{xy, degree}]; polylines end exactly on these
         out_path = out_root / f"page-{pg['page']}.json"
         write_json(data, out_path)
-        log.info(f"[wires] {pdf_stem} page-{pg['page']}: segs={len(segs)} polys={len(polys)} → {out_path}")
+        masked = f" masked={len(boxes)} boxes" if boxes else ""
+        if boxes and avoided:
+            masked += f" (~{avoided} segs avoided)"
+        log.info(f"[wires] {pdf_stem} page-{pg['page']} ({engine}): segs={len(segs)} polys={len(polys)}{masked} → {out_path}")
+    if doc is not None:
+        doc.close()
+    if ex is not None:
+        ex.shutdown()
@@ -3,11 +3,17 @@ from typing import Dict, Any, List, Tuple
 import networkx as nx
 from src.utils.io import read_json
 from src.utils.logging import setup_logging
+from src.geometry.ports import endpoint_key
 
 Coord = Tuple[int, int]
 
-def _endpoint_to_junction_id(ep: Coord, junctions: List[Dict[str,Any]]) -> str | None:
-    # exact membership; fallback to nearest
+def _endpoint_to_junction_id(ep: Coord, junctions: List[Dict[str,Any]],
+                             lookup: Dict[str, str] | None = None) -> str | None:
+    # exact membership (O(1) via the ports JSON's endpoint_junction table); fallback to nearest
+    if lookup is not None:
+        jid = lookup.get(endpoint_key(ep[0], ep[1]))
+        if jid is not None:
+            return jid
     for j in junctions:
         if [int(ep[0]), int(ep[1])] in j.get("members", []):
             return j["id"]
@@ -37,6 +43,7 @@ def build_graph_for_page(cfg, pdf_stem: str, page: int = 1) -> nx.Graph:
                   if r["pdf"] == pdf_stem and int(r["page"]) == page]
 
     G = nx.Graph(pdf=pdf_stem, page=page)
+    ep_junc = P.get("endpoint_junction")   # absent in ports JSON written before the table existed
 
     # Components
     for c in comps_meta:
@@ -64,7 +71,7 @@ def build_graph_for_page(cfg, pdf_stem: str, page: int = 1) -> nx.Graph:
     # Port ↔ Junction edges (endpoint snaps)
     for conn in P["connections"]:
         ep = tuple(conn["endpoint"])
-        jid_raw = _endpoint_to_junction_id(ep, P["junctions"])
+        jid_raw = _endpoint_to_junction_id(ep, P["junctions"], ep_junc)
         if not jid_raw:
             continue
         pid = f"port:{conn['comp_id']}:{conn['port_id']}"
@@ -74,9 +81,9 @@ def build_graph_for_page(cfg, pdf_stem: str, page: int = 1) -> nx.Graph:
 
     # Wire segments between junctions
     for poly in W["polylines"]:
-        (x1, y1), (x2, y2) = poly["polyline"]
-        j1_raw = _endpoint_to_junction_id((x1, y1), P["junctions"])
-        j2_raw = _endpoint_to_junction_id((x2, y2), P["junctions"])
+        (x1, y1), (x2, y2) = poly["polyline"][0], poly["polyline"][-1]
+        j1_raw = _endpoint_to_junction_id((x1, y1), P["junctions"], ep_junc)
+        j2_raw = _endpoint_to_junction_id((x2, y2), P["junctions"], ep_junc)
         if j1_raw and j2_raw and j1_raw != j2_raw:
             n1, n2 = f"junc:{j1_raw}", f"junc:{j2_raw}"
             if n1 in G and n2 in G:
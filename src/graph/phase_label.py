@@ -3,8 +3,8 @@ from typing import Dict, Any, Tuple, List
 import re
 import networkx as nx
 
-from src.utils.io import read_json
 from src.utils.logging import setup_logging
+from src.utils.spatial import TextIndex, load_page_text_index
 
 # simple token maps
 PHASE_TOKENS = {
@@ -16,16 +16,9 @@ PHASE_WORDS = {
 }
 VOLT_PAT = re.compile(r"(\d{2,4})\s*V", re.I)
 
-def _nearby_text(cfg, page_text: List[Dict[str,Any]], xy: Tuple[float,float], radius: float) -> List[str]:
-    x0,y0 = xy
-    out=[]
-    for t in page_text:
-        x1,y1,x2,y2 = t["bbox"]
-        # center of text bbox
-        cx, cy = (x1+x2)/2.0, (y1+y2)/2.0
-        if max(abs(cx-x0), abs(cy-y0)) <= radius:
-            out.append(t["text"])
-    return out
+def _nearby_text(cfg, page_text: TextIndex, xy: Tuple[float,float], radius: float) -> List[str]:
+    # center of text bbox within radius (L-inf), via the shared grid index
+    return page_text.texts(page_text.query_radius(xy, radius))
 
 def _tokens_from_text(lines: List[str]) -> Dict[str,int]:
     votes={}
@@ -54,7 +47,7 @@ def infer_phase_labels(cfg, pdf_stem: str, page: int, G: nx.Graph) -> Dict[int,D
     log = setup_logging(cfg.logging.level)
     # page vector text
     vec_page = Path(cfg.paths.processed)/"vector_text"/pdf_stem/f"page-{page}.json"
-    texts = read_json(vec_page) if vec_page.exists() else []
+    texts = load_page_text_index(vec_page)
 
     # gather votes per net
     radius = float(cfg.graph.phase_label.search_radius_px)
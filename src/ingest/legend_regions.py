@@ -1,8 +1,8 @@
 # src/ingest/legend_regions.py
 from __future__ import annotations
 from pathlib import Path
-from typing import Tuple, Optional
-from src.utils.io import read_json
+from typing import Any, Dict, List, Tuple, Optional
+from src.utils.spatial import load_page_text_index
 
 KEYWORDS = ("Title:", "Drawing No", "Rev", "Prepared", "Checked", "Approved")
 
@@ -10,7 +10,11 @@ def detect_legend_bbox(cfg, pdf_stem: str, page: int = 1) -> Optional[Tuple[floa
     """Heuristic: find cluster of metadata labels; return bbox union."""
     vec = Path(cfg.paths.processed)/"vector_text"/pdf_stem/f"page-{page}.json"
     if not vec.exists(): return None
-    items = read_json(vec)
+    items = load_page_text_index(vec).items   # shared with label/phase lookups on the same page
+    return legend_bbox_from_items(items)
+
+def legend_bbox_from_items(items: List[Dict[str, Any]]) -> Optional[Tuple[float,float,float,float]]:
+    """detect_legend_bbox over already-loaded text items (same coordinate space as the items)."""
     hits = [it for it in items if any(k.lower() in it["text"].lower() for k in KEYWORDS)]
     if not hits: return None
     x1=min(it["bbox"][0] for it in hits); y1=min(it["bbox"][1] for it in hits)
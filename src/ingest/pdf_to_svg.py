@@ -3,6 +3,7 @@ from pathlib import Path
 from src.utils.logging import setup_logging
 from src.utils.io import write_json
 from src.utils import pdf as pdfu
+from src.utils.raster_cache import raster_opts, raster_paths, build_pdf_rasters
 
 def extract_svg(pdf: str, cfg):
     log = setup_logging(cfg.logging.level)
@@ -13,8 +14,27 @@ def extract_svg(pdf: str, cfg):
     svg_dir.mkdir(parents=True, exist_ok=True)
     png_dir.mkdir(parents=True, exist_ok=True)
 
-    log.info(f"[ingest] Exporting SVG/PNG for {pdf_path.name} (dpi={cfg.runtime.dpi})")
-    manifest = pdfu.export_svg_and_png(str(pdf_path), str(svg_dir), str(png_dir), dpi=cfg.runtime.dpi)
+    workers = int(getattr(cfg.runtime, "workers", 1) or 1)
+    ropts = raster_opts(cfg)
+    gray = ropts["mode"] in ("gray", "bilevel")   # monochrome drawings: 8-bit pages instead of 24-bit
+    log.info(f"[ingest] Exporting SVG/PNG for {pdf_path.name} (dpi={cfg.runtime.dpi}, workers={workers}, "
+             f"color={'gray' if gray else 'rgb'})")
+    # PyMuPDF text spans (PNG pixels) for build_vector_text_index / geometry masks, so neither reopens the PDF;
+    # kept apart from processed/vector_text, which the labels stage rewrites (possibly in SVG units)
+    text_dir = Path(cfg.paths.processed) / "pdf_text" / pdf_path.stem
+    text_dir.mkdir(parents=True, exist_ok=True)
+    manifest = pdfu.export_svg_and_png(str(pdf_path), str(svg_dir), str(png_dir), dpi=cfg.runtime.dpi, workers=workers,
+                                       text_out_dir=str(text_dir), min_chars=int(cfg.labels.min_vec_chars), gray=gray,
+                                       min_drawings=int(getattr(cfg.runtime, "vector_min_drawings", 8) or 8))
+
+    # decode every page PNG once; tiler, geometry and the vision crops read windows from the arrays
+    if ropts["enable"] and manifest["pages"]:
+        rasters = build_pdf_rasters([p["png"] for p in manifest["pages"]], mode=ropts["mode"],
+                                    threshold=ropts["threshold"], workers=workers)
+        for p, r in zip(manifest["pages"], rasters):
+            p["raster"] = r
+        log.info(f"[ingest] Page raster cache → {raster_paths(manifest['pages'][0]['png'])['gray'].parent} "
+                 f"(mode={ropts['mode']})")
 
     # Add high-level summary fields
     n_pages = manifest.get("num_pages", 0)
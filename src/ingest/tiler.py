@@ -1,6 +1,10 @@
 # src/ingest/tiler.py
+from collections import OrderedDict
 from pathlib import Path
+from typing import Any, Dict, Tuple
+import numpy as np
 from PIL import Image
+from src.utils.raster_cache import page_rgb, page_gray, page_bits
 from src.utils.io import write_json
 from src.utils.logging import setup_logging
 
@@ -19,6 +23,85 @@ def _tiles_for_image(img: Image.Image, size: int, overlap: float):
         y += step; row += 1
     return tiles
 
+# ---------- virtual tiles: crop on demand ----------
+_PAGES: "OrderedDict[Tuple[str, float], Image.Image]" = OrderedDict()
+_PAGES_MAX = 1                     # decoded 900-DPI pages are large; runners walk tiles page by page
+_CROPS: "OrderedDict[Tuple[str, float, Tuple[int, ...]], Image.Image]" = OrderedDict()
+_CROPS_BUDGET = 256 << 20          # bytes; see set_crop_cache_mb
+_crops_bytes = 0
+
+def set_crop_cache_mb(mb: float) -> None:
+    global _CROPS_BUDGET
+    _CROPS_BUDGET = int(float(mb) * (1 << 20))
+
+def _mtime(p) -> float:
+    try:
+        return Path(p).stat().st_mtime
+    except OSError:
+        return 0.0
+
+def _tile_fresh(tile_png, page_png) -> bool:
+    """A written tile is reused only if it is not older than its page (re-ingest of the same stem)."""
+    return Path(tile_png).exists() and _mtime(tile_png) >= _mtime(page_png)
+
+def _page_image(page_png: str) -> Image.Image:
+    key = (page_png, _mtime(page_png))
+    img = _PAGES.get(key)
+    if img is None:
+        img = Image.open(page_png)
+        img.load()   # native mode (L for gray renders); crops are converted to RGB individually
+        _PAGES[key] = img
+        while len(_PAGES) > _PAGES_MAX:
+            _PAGES.popitem(last=False)
+    else:
+        _PAGES.move_to_end(key)
+    return img
+
+def _raster_crop(page_png: str, box: Tuple[int, ...]) -> Image.Image:
+    # window of the ingest-time memmap (only the touched rows are paged in); full decode if it is absent.
+    # gray / bilevel pages stay single-channel and are expanded to RGB per crop, for the VLMs
+    x1, y1, x2, y2 = box
+    rgb = page_rgb(page_png)
+    if rgb is not None:
+        return Image.fromarray(np.ascontiguousarray(rgb[y1:y2, x1:x2]))
+    gray = page_gray(page_png)
+    if gray is not None:
+        return Image.fromarray(np.ascontiguousarray(gray[y1:y2, x1:x2])).convert("RGB")
+    bl = page_bits(page_png)
+    if bl is not None:
+        ink = bl.window(x1, y1, x2, y2)
+        return Image.fromarray((1 - ink) * np.uint8(255)).convert("RGB")   # black ink on white
+    return _page_image(page_png).crop(box).convert("RGB")
+
+def tile_image(t: Dict[str, Any]) -> Image.Image:
+    """RGB pixels of a tile record: its PNG if materialized, else a crop of the page raster (LRU-cached)."""
+    global _crops_bytes
+    p = t.get("path")
+    if p and _tile_fresh(p, t["page_png"]):
+        with Image.open(p) as im:
+            return im.convert("RGB")
+    # page mtime in the key: a re-rendered page never serves crops of the old one
+    key = (t["page_png"], _mtime(t["page_png"]), tuple(int(v) for v in t["bbox"]))
+    crop = _CROPS.get(key)
+    if crop is not None:
+        _CROPS.move_to_end(key)
+        return crop
+    crop = _raster_crop(t["page_png"], key[2])
+    _CROPS[key] = crop
+    _crops_bytes += crop.width * crop.height * 3
+    while _crops_bytes > _CROPS_BUDGET and len(_CROPS) > 1:
+        _, old = _CROPS.popitem(last=False)
+        _crops_bytes -= old.width * old.height * 3
+    return crop
+
+def materialize_tile(t: Dict[str, Any]) -> str:
+    """Write the tile PNG at its indexed path (again if the page is newer) for consumers that need a file."""
+    p = Path(t["path"])
+    if not _tile_fresh(p, t["page_png"]):
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tile_image(t).save(p)
+    return str(p)
+
 def tile_pages(cfg):
     log = setup_logging(cfg.logging.level)
     raw_png_root = Path(cfg.paths.raw) / "png"
@@ -31,6 +114,8 @@ def tile_pages(cfg):
         "macro": cfg.runtime.tile.macro_size,
     }
     overlap = cfg.runtime.tile.overlap
+    # index-only records by default; tile PNGs are written when a model consumes them
+    materialize = bool(cfg.runtime.tile.get("materialize", False))
 
     index = []
     for pdf_folder in sorted(raw_png_root.glob("*")):
@@ -41,29 +126,35 @@ def tile_pages(cfg):
 
         for page_png in page_pngs:
             page_id = int(page_png.stem.split("-")[-1])
-            img = Image.open(page_png).convert("RGB")
+            # header only unless tiles are materialized (crops keep the page's own mode; readers convert)
+            img = Image.open(page_png)
             total_for_page = 0
 
             for scale, size in sizes.items():
                 out_dir = out_root / scale / pdf_folder.name / f"page-{page_id}"
-                out_dir.mkdir(parents=True, exist_ok=True)
                 tiles = _tiles_for_image(img, size, overlap)
+                if materialize:
+                    out_dir.mkdir(parents=True, exist_ok=True)
 
                 for (r, c, bbox) in tiles:
-                    crop = img.crop(bbox)
                     tpath = out_dir / f"tile_r{r:03d}_c{c:03d}.png"
-                    crop.save(tpath)
+                    if materialize:
+                        img.crop(bbox).save(tpath)
                     index.append({
                         "pdf": pdf_folder.name,
                         "page": page_id,
                         "scale": scale,
                         "row": r, "col": c,
                         "bbox": bbox,
-                        "path": str(tpath)
+                        "path": str(tpath),
+                        "page_png": str(page_png),
+                        "materialized": materialize,
                     })
                 total_for_page += len(tiles)
 
-            log.info(f"[tiler] {pdf_folder.name} page-{page_id}: wrote {total_for_page} tiles")
+            img.close()
+            verb = "wrote" if materialize else "indexed"
+            log.info(f"[tiler] {pdf_folder.name} page-{page_id}: {verb} {total_for_page} tiles")
 
     write_json(index, out_root / "tile_index.json")
     log.info(f"[tiler] Wrote tile index ({len(index)} rows) → {out_root/'tile_index.json'}")
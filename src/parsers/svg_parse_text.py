@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import List, Dict, Any, Tuple
 from svgelements import SVG, Text
 from dataclasses import dataclass
+from src.parsers.svg_stream_text import parse_svg_text_stream
 
 BBox = Tuple[float, float, float, float]
 
@@ -17,11 +18,15 @@ def intersect(b1:BBox, b2:BBox, min_overlap_px:float=1.0) -> bool:
     x2 = min(b1[2], b2[2]); y2 = min(b1[3], b2[3])
     return (x2 - x1) >= min_overlap_px and (y2 - y1) >= min_overlap_px
 
-def parse_svg_text(svg_path: str, min_chars: int = 2) -> List[Dict[str, Any]]:
+def parse_svg_text(svg_path: str, min_chars: int = 2, engine: str = "stream") -> List[Dict[str, Any]]:
     """
-    Parse <text>/<tspan> via svgelements with transforms applied.
+    Parse <text>/<tspan> with transforms applied.
+    engine="stream": iterparse, never builds the tree (see svg_stream_text.py);
+    engine="svgelements": full SVG.parse (exact glyph bboxes, slow/huge on dense CAD exports).
     Returns list of {text, bbox:[x1,y1,x2,y2], x, y} in SVG coordinate space.
     """
+    if engine == "stream":
+        return parse_svg_text_stream(svg_path, min_chars=min_chars)
     items: List[Dict[str, Any]] = []
     if not Path(svg_path).exists():
         return items
@@ -49,19 +54,9 @@ def parse_svg_text(svg_path: str, min_chars: int = 2) -> List[Dict[str, Any]]:
     return items
 
 # ---------- PyMuPDF fallback ----------
-def parse_pdf_text_fitz(pdf_path: str, page_number: int, dpi: int = 900, min_chars: int = 2) -> List[Dict[str, Any]]:
-    """
-    Use PyMuPDF to read text spans with bboxes on a page (1-based index).
-    Coords are converted from points (72 dpi) to our PNG pixel space (cfg.runtime.dpi).
-    Returns list of {text, bbox:[x1,y1,x2,y2], x, y} in pixel coords.
-    """
-    import fitz  # PyMuPDF
+def fitz_page_text_items(page, dpi: int = 900, min_chars: int = 2) -> List[Dict[str, Any]]:
+    """Text spans of an open fitz page as {text, bbox:[x1,y1,x2,y2], x, y} in pixel coords."""
     items: List[Dict[str, Any]] = []
-    doc = fitz.open(pdf_path)
-    if page_number < 1 or page_number > len(doc):
-        return items
-
-    page = doc[page_number - 1]
     scale = dpi / 72.0  # points -> pixels
     # page.get_text("dict") -> blocks -> lines -> spans (with bbox)
     td = page.get_text("dict")
@@ -80,3 +75,15 @@ def parse_pdf_text_fitz(pdf_path: str, page_number: int, dpi: int = 900, min_cha
                     "y": bx[1],
                 })
     return items
+
+def parse_pdf_text_fitz(pdf_path: str, page_number: int, dpi: int = 900, min_chars: int = 2) -> List[Dict[str, Any]]:
+    """
+    Use PyMuPDF to read text spans with bboxes on a page (1-based index).
+    Coords are converted from points (72 dpi) to our PNG pixel space (cfg.runtime.dpi).
+    Returns list of {text, bbox:[x1,y1,x2,y2], x, y} in pixel coords.
+    """
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        if page_number < 1 or page_number > len(doc):
+            return []
+        return fitz_page_text_items(doc[page_number - 1], dpi=dpi, min_chars=min_chars)
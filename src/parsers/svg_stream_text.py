@@ -0,0 +1,200 @@
+# src/parsers/svg_stream_text.py
+# streaming <text>/<tspan> extractor for huge SVGs: iterparse + transform stack, no path geometry
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import math, re
+
+Matrix = Tuple[float, float, float, float, float, float]   # (a, b, c, d, e, f) as in SVG matrix()
+_IDENT: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# CSS px per unit (svgelements default ppi=96)
+_UNITS = {"px": 1.0, "pt": 96/72, "pc": 16.0, "in": 96.0, "mm": 96/25.4, "cm": 96/2.54, "": 1.0}
+_NUM = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_LEN_RE = re.compile(rf"\s*({_NUM})\s*([a-z%]*)")
+_TF_RE = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+_NUMS_RE = re.compile(_NUM)
+_SKIP = {"defs", "symbol", "clipPath", "mask", "pattern", "marker", "style", "metadata"}
+
+# glyph box heuristics (fractions of font-size): average advance, ascent, descent
+_ADVANCE, _ASCENT, _DESCENT = 0.55, 0.8, 0.2
+
+def _mul(m: Matrix, n: Matrix) -> Matrix:
+    """m · n (apply n first, then m)."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a*A + c*B, b*A + d*B, a*C + c*D, b*C + d*D, a*E + c*F + e, b*E + d*F + f)
+
+def _apply(m: Matrix, x: float, y: float) -> Tuple[float, float]:
+    a, b, c, d, e, f = m
+    return a*x + c*y + e, b*x + d*y + f
+
+def parse_transform(s: str | None) -> Matrix:
+    m = _IDENT
+    if not s:
+        return m
+    for op, args in _TF_RE.findall(s):
+        v = [float(t) for t in _NUMS_RE.findall(args)]
+        if op == "matrix" and len(v) == 6:
+            t = tuple(v)
+        elif op == "translate" and v:
+            t = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0.0)
+        elif op == "scale" and v:
+            t = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+        elif op == "rotate" and v:
+            r = math.radians(v[0]); cs, sn = math.cos(r), math.sin(r)
+            t = (cs, sn, -sn, cs, 0, 0)
+            if len(v) >= 3:
+                t = _mul(_mul((1, 0, 0, 1, v[1], v[2]), t), (1, 0, 0, 1, -v[1], -v[2]))
+        elif op == "skewX" and v:
+            t = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        elif op == "skewY" and v:
+            t = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        else:
+            continue
+        m = _mul(m, t)
+    return m
+
+def _length(s: str | None, default: float | None = None, font_size: float = 16.0) -> float | None:
+    if not s:
+        return default
+    mt = _LEN_RE.match(s)
+    if not mt:
+        return default
+    val, unit = float(mt.group(1)), mt.group(2)
+    if unit in ("em",):
+        return val * font_size
+    if unit == "%":
+        return default
+    return val * _UNITS.get(unit, 1.0)
+
+def _first(s: str | None) -> float | None:
+    if not s:
+        return None
+    nums = _NUMS_RE.findall(s)
+    return float(nums[0]) if nums else None
+
+def _style(el) -> Dict[str, str]:
+    out = {}
+    st = el.get("style")
+    if st:
+        for part in st.split(";"):
+            if ":" in part:
+                k, v = part.split(":", 1)
+                out[k.strip()] = v.strip()
+    return out
+
+def _root_matrix(el) -> Matrix:
+    """viewBox → width/height scaling, as svgelements applies to the root."""
+    vb = el.get("viewBox")
+    if not vb:
+        return _IDENT
+    v = [float(t) for t in _NUMS_RE.findall(vb)]
+    if len(v) != 4 or v[2] <= 0 or v[3] <= 0:
+        return _IDENT
+    w = _length(el.get("width"), v[2])
+    h = _length(el.get("height"), v[3])
+    sx, sy = w / v[2], h / v[3]
+    return (sx, 0.0, 0.0, sy, -v[0] * sx, -v[1] * sy)
+
+def _local(tag) -> str:
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+def _iterparse(path: str):
+    """(events, parse errors): lxml recovers from most damage, the stdlib parser raises at the first error."""
+    try:
+        from lxml import etree
+        return etree.iterparse(path, events=("start", "end"), huge_tree=True, recover=True), (etree.XMLSyntaxError,)
+    except ImportError:
+        import xml.etree.ElementTree as ET
+        return ET.iterparse(path, events=("start", "end")), (ET.ParseError,)
+
+def parse_svg_text_stream(svg_path: str, min_chars: int = 2) -> List[Dict[str, Any]]:
+    """
+    Same output as parse_svg_text ({text, bbox:[x1,y1,x2,y2], x, y} in SVG user space
+    after the root viewBox scaling) without building the document tree: elements are
+    discarded as soon as they close, and only the transform / font-size stacks and the
+    open <text> subtree are kept. Bboxes are estimated from font-size and glyph count.
+    A file the parser cannot read to the end yields [], so the caller falls back to the
+    PDF's own text.
+    """
+    items: List[Dict[str, Any]] = []
+    if not Path(svg_path).exists():
+        return items
+
+    mats: List[Matrix] = []
+    sizes: List[float] = []
+    anchors: List[str] = []
+    stack = []        # open elements (to detach closed children and keep memory flat)
+    skip_depth = 0    # >0 while inside <defs>/<symbol>/...
+    text_depth = 0    # >0 while inside <text>
+
+    events, errors = _iterparse(str(svg_path))
+    try:
+        for event, el in events:
+            tag = _local(el.tag)
+            if event == "start":
+                parent_m = mats[-1] if mats else _IDENT
+                m = _root_matrix(el) if not mats else _IDENT
+                m = _mul(parent_m, _mul(m, parse_transform(el.get("transform"))))
+                st = _style(el)
+                fs_parent = sizes[-1] if sizes else 16.0
+                fs = _length(el.get("font-size") or st.get("font-size"), fs_parent, fs_parent)
+                anchor = el.get("text-anchor") or st.get("text-anchor") or (anchors[-1] if anchors else "start")
+                mats.append(m); sizes.append(fs); anchors.append(anchor); stack.append(el)
+                if tag in _SKIP:
+                    skip_depth += 1
+                if tag == "text":
+                    text_depth += 1
+                continue
+
+            # end
+            m, fs, anchor = mats.pop(), sizes.pop(), anchors.pop()
+            stack.pop()
+            if tag == "text":
+                text_depth -= 1
+                if not skip_depth:
+                    it = _text_item(el, m, fs, anchor, min_chars)
+                    if it is not None:
+                        items.append(it)
+            if tag in _SKIP:
+                skip_depth -= 1
+            if text_depth == 0:
+                el.clear()
+                if stack and len(stack[-1]) and stack[-1][-1] is el:
+                    del stack[-1][-1]
+    except errors:
+        return []   # half a page of labels would hide the PDF's own (complete) text from the caller
+    return items
+
+def _text_item(el, m: Matrix, fs: float, anchor: str, min_chars: int) -> Dict[str, Any] | None:
+    txt = " ".join("".join(el.itertext()).split())
+    if not txt or len(txt) < min_chars:
+        return None
+    x, y = _first(el.get("x")), _first(el.get("y"))
+    if x is None or y is None:
+        # position carried by the first tspan
+        for ch in el.iter():
+            if ch is el:
+                continue
+            x = _first(ch.get("x")) if x is None else x
+            y = _first(ch.get("y")) if y is None else y
+            if x is not None and y is not None:
+                break
+    x = x or 0.0
+    y = y or 0.0
+    w = _ADVANCE * fs * len(txt)
+    if anchor == "middle":
+        x -= w / 2
+    elif anchor == "end":
+        x -= w
+    corners = [_apply(m, px, py) for px, py in ((x, y - _ASCENT*fs), (x + w, y - _ASCENT*fs),
+                                                (x, y + _DESCENT*fs), (x + w, y + _DESCENT*fs))]
+    xs = [c[0] for c in corners]; ys = [c[1] for c in corners]
+    bbox = (min(xs), min(ys), max(xs), max(ys))
+    return {
+        "text": txt,
+        "bbox": [round(bbox[0],2), round(bbox[1],2), round(bbox[2],2), round(bbox[3],2)],
+        "x": round(bbox[0],2),
+        "y": round(bbox[1],2),
+    }
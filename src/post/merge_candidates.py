@@ -3,6 +3,7 @@ from typing import List, Dict, Any, Tuple
 from dataclasses import dataclass
 from src.utils.io import read_json, write_json, ensure_dir
 from src.utils.logging import setup_logging
+from src.utils.box_cluster import cluster_boxes
 import math, re
 
 BBox = Tuple[float, float, float, float]
@@ -77,28 +78,8 @@ def load_candidates(processed_root: str) -> Dict[Tuple[str,int], List[Dict[str,A
     return groups
 
 def cluster_candidates(cands: List[Dict[str,Any]], iou_th: float, touch_px: float):
-    n = len(cands)
-    parent = list(range(n))
-    def find(x):
-        while parent[x] != x:
-            parent[x] = parent[parent[x]]
-            x = parent[x]
-        return x
-    def union(a,b):
-        ra, rb = find(a), find(b)
-        if ra != rb: parent[rb] = ra
-
-    boxes = [tuple(c["tile_bbox"]) for c in cands]
-    for i in range(n):
-        for j in range(i+1, n):
-            if iou(boxes[i], boxes[j]) >= iou_th or edge_dist(boxes[i], boxes[j]) <= touch_px:
-                union(i,j)
-
-    clusters: Dict[int, List[int]] = {}
-    for i in range(n):
-        r = find(i)
-        clusters.setdefault(r, []).append(i)
-    return list(clusters.values())
+    # union-find over "iou >= iou_th or edge_dist <= touch_px"; pairs come from an x-sorted sweep
+    return cluster_boxes([tuple(c["tile_bbox"]) for c in cands], iou_th, touch_px)
 
 def merge_cluster(pdf:str, page:int, cands: List[Dict[str,Any]], idxs: List[int],
                   prefer_higher_conf: bool, union_bbox_flag: bool) -> Dict[str,Any]:
@@ -49,6 +49,7 @@ class ComponentCandidate(BaseModel):
     page: int
     tile_path: str
     tile_bbox: BBox
+    content_bbox: Optional[BBox] = None  # ink-cropped region sent to the VLM (page px)
     type: Optional[str] = None
     confidence: float = 0.0
     ports_expected: list = []
@@ -56,3 +57,4 @@ class ComponentCandidate(BaseModel):
     alternatives: List[CandidateAlt] = []
     labels_context: List[str] = []      # labels used in prompt
     source_model: Optional[str] = None
+    copied_from: Optional[str] = None   # id of the dedup representative this answer was copied from
@@ -3,8 +3,9 @@ from typing import Dict, Any, List, Tuple
 import re
 import networkx as nx
 
-from src.utils.io import read_json, write_json, ensure_dir
+from src.utils.io import write_json, ensure_dir
 from src.utils.logging import setup_logging
+from src.utils.spatial import TextIndex, load_page_text_index
 from src.graph.build_graph import build_graph_for_page, assign_net_ids
 
 # --- phase tokens ---
@@ -17,15 +18,9 @@ PHASE_TOKENS = {
 PHASE_WORDS = {"neutral":"N"}
 VOLT_PAT = re.compile(r"(\d{2,4})\s*V", re.I)
 
-def _nearby_text(cfg, page_text: List[Dict[str,Any]], xy: Tuple[float,float], radius: float) -> List[str]:
-    x0, y0 = xy
-    out = []
-    for t in page_text:
-        x1, y1, x2, y2 = t["bbox"]
-        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
-        if max(abs(cx - x0), abs(cy - y0)) <= radius:
-            out.append(t["text"])
-    return out
+def _nearby_text(cfg, page_text: TextIndex, xy: Tuple[float,float], radius: float) -> List[str]:
+    # text whose bbox center is within radius (L-inf) of xy, in page order
+    return page_text.texts(page_text.query_radius(xy, radius))
 
 def _tokens_from_text(lines: List[str]) -> Dict[str,int]:
     votes = {}
@@ -46,7 +41,7 @@ def _tokens_from_text(lines: List[str]) -> Dict[str,int]:
 
 def _infer_phase_labels(cfg, pdf_stem: str, page: int, G: nx.Graph) -> Dict[int, Dict[str,Any]]:
     vec_page = Path(cfg.paths.processed) / "vector_text" / pdf_stem / f"page-{page}.json"
-    texts = read_json(vec_page) if vec_page.exists() else []
+    texts = load_page_text_index(vec_page)
 
     radius = float(cfg.graph.phase_label.search_radius_px)
     votes_by_net: Dict[int, Dict[str,int]] = {}
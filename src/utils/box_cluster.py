@@ -0,0 +1,121 @@
+# src/utils/box_cluster.py
+# sort-and-sweep box clustering: candidate pairs from x-sorted intervals, vectorized IoU / gap tests
+from __future__ import annotations
+from typing import List, Sequence, Tuple
+import numpy as np
+
+Box = Tuple[float, float, float, float]
+
+def _as_array(boxes: Sequence[Sequence[float]]) -> np.ndarray:
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+def sweep_pairs(b: np.ndarray, tol: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    All index pairs (i, j), i != j, whose boxes are within `tol` of each other on both axes
+    (gap <= tol; touching and overlapping included). Boxes are sorted by x1 once; each box
+    pairs with the run of later boxes starting before its x2 + tol, then the y test prunes.
+    O(n log n + k) for k x-candidates.
+    """
+    n = len(b)
+    if n < 2:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    order = np.argsort(b[:, 0], kind="stable")
+    x1s = b[order, 0]
+    ends = np.searchsorted(x1s, b[order, 2] + tol, side="right")
+    counts = np.maximum(ends - np.arange(n) - 1, 0)
+    P = np.repeat(np.arange(n), counts)
+    Q = P + 1 + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    I, J = order[P], order[Q]
+    ok = (b[J, 1] - b[I, 3] <= tol) & (b[I, 1] - b[J, 3] <= tol)
+    return I[ok], J[ok]
+
+def iou_to(a: Sequence[float], b: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    """IoU of box a against every row of b (0 where they do not overlap); denominator floored at eps."""
+    iw = np.maximum(0, np.minimum(a[2], b[:, 2]) - np.maximum(a[0], b[:, 0]))
+    ih = np.maximum(0, np.minimum(a[3], b[:, 3]) - np.maximum(a[1], b[:, 1]))
+    inter = iw * ih
+    A = (a[2] - a[0]) * (a[3] - a[1])
+    B = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = inter / np.maximum(eps, A + B - inter)
+    return np.where(inter > 0, v, 0.0)
+
+def pair_iou(b: np.ndarray, I: np.ndarray, J: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    iw = np.maximum(0, np.minimum(b[I, 2], b[J, 2]) - np.maximum(b[I, 0], b[J, 0]))
+    ih = np.maximum(0, np.minimum(b[I, 3], b[J, 3]) - np.maximum(b[I, 1], b[J, 1]))
+    inter = iw * ih
+    A = (b[I, 2] - b[I, 0]) * (b[I, 3] - b[I, 1])
+    B = (b[J, 2] - b[J, 0]) * (b[J, 3] - b[J, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = inter / np.maximum(eps, A + B - inter)
+    return np.where(inter > 0, v, 0.0)
+
+def pair_gap(b: np.ndarray, I: np.ndarray, J: np.ndarray) -> np.ndarray:
+    """L-inf edge distance between boxes I and J (0 when they touch or overlap)."""
+    dx = np.maximum(0, np.maximum(b[I, 0] - b[J, 2], b[J, 0] - b[I, 2]))
+    dy = np.maximum(0, np.maximum(b[I, 1] - b[J, 3], b[J, 1] - b[I, 3]))
+    return np.maximum(dx, dy)
+
+def cluster_boxes(boxes: Sequence[Sequence[float]], iou_th: float, touch_px: float) -> List[List[int]]:
+    """
+    Connected components of "IoU >= iou_th or edge gap <= touch_px". Clusters are ordered by
+    their first member and list members ascending (same output as the all-pairs union-find).
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    b = _as_array(boxes)
+    n = len(b)
+    if n == 0:
+        return []
+    if iou_th <= 0:
+        return [list(range(n))]          # IoU >= 0 holds for every pair
+    # IoU > 0 needs an overlap, so pairs farther apart than max(touch_px, 0) can never link
+    I, J = sweep_pairs(b, max(float(touch_px), 0.0))
+    link = (pair_iou(b, I, J) >= iou_th) | (pair_gap(b, I, J) <= touch_px)
+    I, J = I[link], J[link]
+    _, lab = connected_components(coo_matrix((np.ones(len(I), np.int8), (I, J)), shape=(n, n)), directed=False)
+    clusters: dict = {}
+    for i, l in enumerate(lab.tolist()):
+        clusters.setdefault(l, []).append(i)
+    return list(clusters.values())
+
+def merge_overlaps_greedy(bboxes: Sequence[Box], iou_thr: float = 0.5) -> List[Box]:
+    """
+    Greedy merge: take the last unmerged box, absorb the first remaining box whose IoU with the
+    grown box is >= iou_thr, repeat until none qualifies. Only boxes that can overlap the grown
+    box (x1 < its x2, from the x-sorted order) are tested, vectorized.
+    """
+    boxes = [tuple(bb) for bb in bboxes]
+    n = len(boxes)
+    if n == 0:
+        return []
+    if iou_thr <= 0:   # every pair qualifies: one union box
+        b = boxes[-1]
+        for c in reversed(boxes[:-1]):
+            b = (min(b[0],c[0]), min(b[1],c[1]), max(b[2],c[2]), max(b[3],c[3]))
+        return [b]
+    arr = _as_array(boxes)
+    order = np.argsort(arr[:, 0], kind="stable")
+    x1s = arr[order, 0]
+    alive = np.ones(n, dtype=bool)
+    out: List[Box] = []
+    for last in range(n - 1, -1, -1):
+        if not alive[last]:
+            continue
+        alive[last] = False
+        b = boxes[last]
+        while True:
+            cand = order[:np.searchsorted(x1s, b[2], side="left")]
+            cand = cand[alive[cand]]
+            cand = np.sort(cand[(arr[cand, 2] > b[0]) & (arr[cand, 1] < b[3]) & (arr[cand, 3] > b[1])])
+            if cand.size == 0:
+                break
+            hit = np.flatnonzero(iou_to(b, arr[cand], eps=0.0) >= iou_thr)
+            if hit.size == 0:
+                break
+            j = int(cand[hit[0]])
+            c = boxes[j]
+            b = (min(b[0],c[0]), min(b[1],c[1]), max(b[2],c[2]), max(b[3],c[3]))
+            alive[j] = False
+        out.append(b)
+    return out
@@ -12,3 +12,13 @@ def sha1_file(path: str) -> str:
 def pdf_fingerprint(path: str) -> str:
     p = Path(path)
     return f"{p.stem}-{sha1_file(path)[:8]}"
+
+def sha1_text(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+def image_digest(img) -> str:
+    """Content hash of decoded pixels (mode + size + bytes), independent of file path/encoding."""
+    h = hashlib.sha1()
+    h.update(f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode("ascii"))
+    h.update(img.tobytes())
+    return h.hexdigest()
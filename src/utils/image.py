@@ -2,7 +2,8 @@
 # src/utils/image.py
 from __future__ import annotations
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
+import math
 from PIL import Image, ImageOps, ImageFilter
 
 def ensure_rgb(img: Image.Image) -> Image.Image:
@@ -30,3 +31,35 @@ def resize_max_side(img: Image.Image, max_side: int) -> Image.Image:
 
 def sharpen(img: Image.Image) -> Image.Image:
     return img.filter(ImageFilter.UnsharpMask(radius=1.2, percent=150, threshold=3))
+
+def ink_bbox(img: Image.Image, threshold: int = 200, pad: int = 8) -> Optional[Tuple[int,int,int,int]]:
+    """Bounding box (x0,y0,x1,y1) of pixels darker than threshold, padded and clipped; None if blank."""
+    mask = to_grayscale(img).point(lambda p: 255 if p < threshold else 0)
+    bb = mask.getbbox()
+    if bb is None:
+        return None
+    W, H = img.size
+    return (max(0, bb[0]-pad), max(0, bb[1]-pad), min(W, bb[2]+pad), min(H, bb[3]+pad))
+
+def fit_pixel_budget(img: Image.Image, min_pixels: int, max_pixels: int, multiple: int = 28) -> Image.Image:
+    """
+    Resize so w*h lands in [min_pixels, max_pixels] with both sides rounded to `multiple`
+    (Qwen2-VL: 14px patches merged 2x2 → one visual token per 28x28 block).
+    """
+    w, h = img.size
+    area = w * h
+    scale = 1.0
+    if max_pixels and area > max_pixels:
+        scale = math.sqrt(max_pixels / area)
+    elif min_pixels and area < min_pixels:
+        scale = math.sqrt(min_pixels / area)
+    m = max(1, int(multiple))
+    nw = max(m, int(round(w * scale / m)) * m)
+    nh = max(m, int(round(h * scale / m)) * m)
+    if max_pixels:
+        while nw * nh > max_pixels and (nw > m or nh > m):
+            if nw >= nh: nw -= m
+            else: nh -= m
+    if (nw, nh) == (w, h):
+        return img
+    return img.resize((nw, nh), Image.LANCZOS)
@@ -8,73 +8,183 @@ def has_pdftocairo() -> bool:
     # On Windows + conda, pdftocairo lives under <env>\Library\bin
     return shutil.which("pdftocairo") is not None
 
-def _call_pdftocairo_svg_png(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int) -> Dict[str, Any]:
-    """Export per-page SVG and PNG via pdftocairo. Returns manifest-like info."""
+def pdf_page_count(pdf_path: str) -> int:
+    """Page count via PyMuPDF, else poppler's pdfinfo; 0 if neither can tell."""
+    try:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception:
+        pass
+    if shutil.which("pdfinfo"):
+        try:
+            out = subprocess.run(["pdfinfo", pdf_path], capture_output=True, text=True).stdout
+            for line in out.splitlines():
+                if line.startswith("Pages:"):
+                    return int(line.split(":", 1)[1])
+        except Exception:
+            pass
+    return 0
+
+def _pdftocairo_page(pdf_path: str, page: int, out_svg_dir: str, out_png_dir: str, dpi: int, gray: bool = False) -> None:
+    # one page per call: -singlefile keeps the name page-N.png regardless of document length
+    subprocess.check_call(["pdftocairo", "-svg", "-f", str(page), "-l", str(page), pdf_path,
+                           str(Path(out_svg_dir) / f"page-{page}.svg")])
+    subprocess.check_call(["pdftocairo", "-png", *(["-gray"] if gray else []), "-singlefile", "-r", str(dpi),
+                           "-f", str(page), "-l", str(page), pdf_path, str(Path(out_png_dir) / f"page-{page}")])
+
+def _call_pdftocairo_svg_png(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int, workers: int = 1,
+                             gray: bool = False) -> Dict[str, Any]:
+    """Export per-page SVG and PNG via pdftocairo, one process per page, `workers` at a time."""
     Path(out_svg_dir).mkdir(parents=True, exist_ok=True)
     Path(out_png_dir).mkdir(parents=True, exist_ok=True)
 
-    # SVG
-    # Writes page-1.svg, page-2.svg, ...
-    svg_cmd = ["pdftocairo", "-svg", pdf_path, str(Path(out_svg_dir) / "page")]
-    # PNG
-    # Writes page-1.png, ...
-    png_cmd = ["pdftocairo", "-png", "-r", str(dpi), pdf_path, str(Path(out_png_dir) / "page")]
-
-    subprocess.check_call(svg_cmd)
-    subprocess.check_call(png_cmd)
-
-    # pdftocairo doesn't return sizes; we gather later in caller
-    return {"engine": "pdftocairo"}
-
-def _export_with_pymupdf(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int) -> Dict[str, Any]:
-    """Fallback using PyMuPDF: render SVG + PNG per page."""
+    n_pages = pdf_page_count(pdf_path)
+    if n_pages <= 0:
+        # unknown length: whole-document calls (writes page-1.svg / page-1.png, ...)
+        subprocess.check_call(["pdftocairo", "-svg", pdf_path, str(Path(out_svg_dir) / "page")])
+        subprocess.check_call(["pdftocairo", "-png", *(["-gray"] if gray else []), "-r", str(dpi), pdf_path,
+                               str(Path(out_png_dir) / "page")])
+        return {"engine": "pdftocairo"}
+
+    # threads are enough: the work happens in the pdftocairo subprocesses
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as ex:
+        futs = [ex.submit(_pdftocairo_page, pdf_path, p, out_svg_dir, out_png_dir, dpi, gray) for p in range(1, n_pages + 1)]
+        for f in futs:
+            f.result()   # re-raise the first failure
+    return {"engine": "pdftocairo", "pages": n_pages}
+
+def _pymupdf_pages(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int, pages: List[int],
+                   gray: bool = False) -> int:
+    """Render a subset of pages (1-based); each worker process opens its own document."""
     import fitz  # PyMuPDF
 
-    Path(out_svg_dir).mkdir(parents=True, exist_ok=True)
-    Path(out_png_dir).mkdir(parents=True, exist_ok=True)
-
     doc = fitz.open(pdf_path)
     zoom = dpi / 72.0
     mat = fitz.Matrix(zoom, zoom)
-
-    for i, page in enumerate(doc, start=1):
+    for i in pages:
+        page = doc[i - 1]
         # PNG raster
-        pix = page.get_pixmap(matrix=mat, alpha=False)
+        pix = page.get_pixmap(matrix=mat, alpha=False, colorspace=fitz.csGRAY if gray else fitz.csRGB)
         png_path = Path(out_png_dir) / f"page-{i}.png"
         pix.save(png_path.as_posix())
+        pix = None
 
         # SVG vector-ish (PyMuPDF’s SVG writer). May rasterize some content but preserves vectors often.
         svg_str = page.get_svg_image(matrix=fitz.Matrix(1, 1))  # independent of dpi
         svg_path = Path(out_svg_dir) / f"page-{i}.svg"
         svg_path.write_text(svg_str, encoding="utf-8")
+    doc.close()
+    return len(pages)
 
-    return {"engine": "pymupdf", "pages": len(doc)}
+def _export_with_pymupdf(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int, workers: int = 1,
+                         gray: bool = False) -> Dict[str, Any]:
+    """Fallback using PyMuPDF: render SVG + PNG per page, pages split over `workers` processes."""
+    Path(out_svg_dir).mkdir(parents=True, exist_ok=True)
+    Path(out_png_dir).mkdir(parents=True, exist_ok=True)
 
-def export_svg_and_png(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int = 900) -> Dict[str, Any]:
+    n_pages = pdf_page_count(pdf_path)
+    pages = list(range(1, n_pages + 1))
+    workers = max(1, min(int(workers), n_pages))
+    if workers <= 1:
+        _pymupdf_pages(pdf_path, out_svg_dir, out_png_dir, dpi, pages, gray)
+    else:
+        # interleaved shards so heavy and light sheets spread evenly
+        from concurrent.futures import ProcessPoolExecutor
+        shards = [pages[k::workers] for k in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(_pymupdf_pages, [pdf_path] * workers, [out_svg_dir] * workers, [out_png_dir] * workers,
+                        [dpi] * workers, shards, [gray] * workers))
+
+    return {"engine": "pymupdf", "pages": n_pages}
+
+def _scan_pages(pdf_path: str, dpi: int, min_chars: int, text_out_dir: Optional[str], pages: List[int]) -> List[Dict[str, Any]]:
+    """
+    One document open for a shard of pages: pixel size, drawing/text/image operator
+    counts and (optionally) the per-page text-span JSON used by the labels stage.
+    """
+    import fitz  # PyMuPDF
+    import math
+    from src.parsers.svg_parse_text import fitz_page_text_items
+    from src.utils.io import write_json
+
+    out = []
+    scale = dpi / 72.0
+    with fitz.open(pdf_path) as doc:
+        for i in pages:
+            page = doc[i - 1]
+            r = page.rect
+            items = fitz_page_text_items(page, dpi=dpi, min_chars=min_chars)
+            rec = {
+                "page": i,
+                # same round-up as the renderers' pixmap size
+                "size": [int(math.ceil(r.width * scale - 1e-3)), int(math.ceil(r.height * scale - 1e-3))],
+                "n_drawings": len(page.get_cdrawings()) if hasattr(page, "get_cdrawings") else len(page.get_drawings()),
+                "n_text": len(items),
+                "n_images": len(page.get_images(full=False)),
+            }
+            if text_out_dir:
+                tp = Path(text_out_dir) / f"page-{i}.json"
+                write_json(items, tp)
+                rec["text_json"] = tp.as_posix()
+                rec["text_ppi"] = dpi   # span bboxes are PNG pixels at this dpi
+            out.append(rec)
+    return out
+
+def scan_pdf_pages(pdf_path: str, dpi: int, min_chars: int = 2, text_out_dir: Optional[str] = None,
+                   workers: int = 1) -> Dict[int, Dict[str, Any]]:
+    """Per-page stats (+ text JSON) for the whole PDF, pages sharded over `workers` processes."""
+    n_pages = pdf_page_count(pdf_path)
+    pages = list(range(1, n_pages + 1))
+    workers = max(1, min(int(workers), n_pages))
+    if workers <= 1:
+        recs = _scan_pages(pdf_path, dpi, min_chars, text_out_dir, pages)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        shards = [pages[k::workers] for k in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            recs = [r for part in ex.map(_scan_pages, [pdf_path] * workers, [dpi] * workers, [min_chars] * workers,
+                                         [text_out_dir] * workers, shards) for r in part]
+    return {r["page"]: r for r in recs}
+
+def export_svg_and_png(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: int = 900, workers: int = 1,
+                       text_out_dir: Optional[str] = None, min_chars: int = 2, gray: bool = False,
+                       min_drawings: int = 8) -> Dict[str, Any]:
     """
-    Export each page to SVG and high-DPI PNG.
+    Export each page to SVG and high-DPI PNG (8-bit gray when `gray`), up to `workers` pages at a time.
     Tries pdftocairo first; falls back to PyMuPDF. Returns a manifest dict with per-page info.
+    Page sizes and the vector heuristic come from one PyMuPDF pass (which also writes
+    text spans to text_out_dir when given); without PyMuPDF the SVG/PNG files are sniffed.
+    A page is vector-like when it has >= min_drawings drawing ops: a text layer alone (OCR'd
+    scans) or a lone border rectangle does not count.
     """
     pdf_path = str(pdf_path)
     out_svg_dir = str(out_svg_dir)
     out_png_dir = str(out_png_dir)
 
-    manifest: Dict[str, Any] = {"pdf": pdf_path, "dpi": dpi, "pages": []}
+    manifest: Dict[str, Any] = {"pdf": pdf_path, "dpi": dpi, "workers": int(workers),
+                                "color": "gray" if gray else "rgb", "pages": []}
 
     # Try pdftocairo; fallback to PyMuPDF if missing or fails
     used_engine = None
     if has_pdftocairo():
         try:
-            _call_pdftocairo_svg_png(pdf_path, out_svg_dir, out_png_dir, dpi)
+            _call_pdftocairo_svg_png(pdf_path, out_svg_dir, out_png_dir, dpi, workers=workers, gray=gray)
             used_engine = "pdftocairo"
         except Exception as e:
             used_engine = f"pdftocairo_failed:{e.__class__.__name__}"
     if used_engine is None or used_engine.startswith("pdftocairo_failed"):
-        info = _export_with_pymupdf(pdf_path, out_svg_dir, out_png_dir, dpi)
+        info = _export_with_pymupdf(pdf_path, out_svg_dir, out_png_dir, dpi, workers=workers, gray=gray)
         used_engine = info.get("engine", "pymupdf")
 
+    # Per-page stats in one PyMuPDF pass (drawing/text/image op counts, pixel size, text spans)
+    try:
+        scans = scan_pdf_pages(pdf_path, dpi, min_chars=min_chars, text_out_dir=text_out_dir, workers=workers)
+    except Exception:
+        scans = {}
+
     # Build per-page metadata
-    # We’ll detect "vector-ish" pages by checking SVG file size and whether it contains at least one <path> or <text>.
     svg_root = Path(out_svg_dir)
     png_root = Path(out_png_dir)
 
@@ -85,30 +195,39 @@ def export_svg_and_png(pdf_path: str, out_svg_dir: str, out_png_dir: str, dpi: i
         if not png_p.exists():  # stop when PNG missing; both should be in sync
             break
 
-        # Basic vector heuristic
-        vector = False
-        if svg_p.exists():
+        scan = scans.get(page_idx)
+        if scan is not None:
+            vector = scan["n_drawings"] >= max(1, int(min_drawings))
+            W, H = scan["size"]
+        else:
+            # no PyMuPDF: sniff the SVG for vector content, read the PNG header for the size
+            vector = False
+            if svg_p.exists():
+                try:
+                    s = svg_p.read_text(encoding="utf-8", errors="ignore")
+                    if ("<path" in s) or ("<text" in s) or ("<line" in s) or ("<polyline" in s):
+                        vector = True
+                except Exception:
+                    pass
             try:
-                s = svg_p.read_text(encoding="utf-8", errors="ignore")
-                if ("<path" in s) or ("<text" in s) or ("<line" in s) or ("<polyline" in s):
-                    vector = True
+                from PIL import Image
+                W, H = Image.open(png_p).size
             except Exception:
-                pass
-
-        # Get image size (lazy: PIL read)
-        try:
-            from PIL import Image
-            W, H = Image.open(png_p).size
-        except Exception:
-            W, H = None, None
+                W, H = None, None
 
-        manifest["pages"].append({
+        rec = {
             "page": page_idx,
             "svg": svg_p.as_posix() if svg_p.exists() else None,
             "png": png_p.as_posix(),
             "vector_like": bool(vector),
             "size": [W, H],
-        })
+        }
+        if scan is not None:
+            rec.update({k: scan[k] for k in ("n_drawings", "n_text", "n_images")})
+            if scan.get("text_json"):
+                rec["text_json"] = scan["text_json"]
+                rec["text_ppi"] = scan["text_ppi"]
+        manifest["pages"].append(rec)
         page_idx += 1
 
     manifest["engine"] = used_engine
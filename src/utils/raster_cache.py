@@ -0,0 +1,130 @@
+# src/utils/raster_cache.py
+# decode-once page rasters: raw/raster/<pdf>/page-N.{gray,rgb,bits}.npy, read back as read-only memmaps
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+import os
+import numpy as np
+
+_ARRAYS = {"rgb": ("gray", "rgb"), "gray": ("gray",), "bilevel": ("bits",)}
+
+def raster_opts(cfg) -> Dict[str, Any]:
+    rc = (getattr(cfg.runtime, "raster_cache", {}) or {})
+    mode = str(rc.get("mode", "rgb"))
+    if mode not in _ARRAYS:
+        mode = "rgb"   # colour render: the VLMs see what the drawing shows (phase / colour coding)
+    return {"enable": bool(rc.get("enable", True)), "mode": mode,
+            "threshold": int(rc.get("bilevel_threshold", 160))}
+
+def raster_paths(page_png: str | Path) -> Dict[str, Path]:
+    """raw/png/<pdf>/page-N.png → raw/raster/<pdf>/page-N.{gray,rgb,bits}.npy (derived, so any stage can find them)."""
+    p = Path(page_png)
+    root = p.parent.parent.parent / "raster" / p.parent.name
+    return {k: root / f"{p.stem}.{k}.npy" for k in ("gray", "rgb", "bits")}
+
+class Bilevel(NamedTuple):
+    """1 bit/px page: rows packed with np.packbits (1 = ink), `width` unpadded columns."""
+    bits: np.ndarray
+    width: int
+
+    @property
+    def shape(self):
+        return (self.bits.shape[0], self.width)
+
+    def window(self, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+        """uint8 0/1 ink mask of [y1:y2, x1:x2]; only those rows / bytes are unpacked."""
+        x2 = min(x2, self.width)
+        b0 = x1 // 8
+        row = np.unpackbits(self.bits[y1:y2, b0:(x2 + 7) // 8], axis=1)
+        return np.ascontiguousarray(row[:, x1 - 8 * b0:x2 - 8 * b0])
+
+def _fresh(npy: Path, png: Path) -> bool:
+    return npy.exists() and npy.stat().st_mtime >= png.stat().st_mtime
+
+def _save(arr: np.ndarray, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(arr))
+    os.replace(tmp, path)   # readers never see a half-written array
+
+def build_page_raster(page_png: str, mode: str = "rgb", threshold: int = 160) -> Dict[str, Any]:
+    """
+    Decode one page PNG once and store it uncompressed; skipped when the arrays are newer
+    than the PNG. mode rgb keeps gray + RGB, gray keeps gray, bilevel keeps only the packed
+    ink bits (gray < threshold), 1/24 of the RGB size.
+    """
+    from PIL import Image
+    png = Path(page_png)
+    paths = raster_paths(png)
+    want = _ARRAYS[mode]
+    with Image.open(png) as im:
+        W, H = im.size
+        if not all(_fresh(paths[k], png) for k in want):
+            paths["gray"].parent.mkdir(parents=True, exist_ok=True)
+            if mode == "rgb":
+                img = im.convert("RGB")
+                _save(np.asarray(img), paths["rgb"])
+                _save(np.asarray(img.convert("L")), paths["gray"])
+                del img
+            else:
+                gray = np.asarray(im.convert("L"))   # no-op copy for the gray PNGs these modes render
+                if mode == "gray":
+                    _save(gray, paths["gray"])
+                else:
+                    _save(np.packbits(gray < threshold, axis=1), paths["bits"])
+                del gray
+    rec: Dict[str, Any] = {"mode": mode, "shape": [H, W]}
+    rec.update({k: paths[k].as_posix() for k in want})
+    return rec
+
+def _build_many(pngs: List[str], mode: str, threshold: int) -> List[Dict[str, Any]]:
+    return [build_page_raster(p, mode, threshold) for p in pngs]
+
+def build_pdf_rasters(pngs: List[str], mode: str = "rgb", threshold: int = 160, workers: int = 1) -> List[Dict[str, Any]]:
+    """build_page_raster for every page, pages split over `workers` processes; results in input order."""
+    workers = max(1, min(int(workers), len(pngs)))
+    if workers <= 1:
+        return _build_many(pngs, mode, threshold)
+    shards = [pngs[k::workers] for k in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        parts = list(ex.map(_build_many, shards, [mode] * workers, [threshold] * workers))
+    out: List[Dict[str, Any]] = [None] * len(pngs)
+    for k, part in enumerate(parts):
+        out[k::workers] = part
+    return out
+
+_MAPS: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+_MAPS_MAX = 8   # open memmaps (file handles); the OS page cache does the real caching
+
+def _open(path: Path) -> Optional[np.ndarray]:
+    if not path.exists():
+        return None
+    key = (str(path), path.stat().st_mtime_ns)   # a rebuilt array (os.replace) is a new file
+    arr = _MAPS.get(key)
+    if arr is not None:
+        _MAPS.move_to_end(key)
+        return arr
+    arr = np.load(path, mmap_mode="r")
+    _MAPS[key] = arr
+    while len(_MAPS) > _MAPS_MAX:
+        _MAPS.popitem(last=False)
+    return arr
+
+def page_gray(page_png: str | Path) -> Optional[np.ndarray]:
+    """Read-only HxW uint8 memmap of the page, or None if the cache was not built."""
+    return _open(raster_paths(page_png)["gray"])
+
+def page_rgb(page_png: str | Path) -> Optional[np.ndarray]:
+    """Read-only HxWx3 uint8 memmap of the page, or None if the cache was not built (or mode is not rgb)."""
+    return _open(raster_paths(page_png)["rgb"])
+
+def page_bits(page_png: str | Path) -> Optional[Bilevel]:
+    """Packed 1-bit page (bilevel mode), or None."""
+    bits = _open(raster_paths(page_png)["bits"])
+    if bits is None:
+        return None
+    from PIL import Image
+    with Image.open(page_png) as im:   # header only: the unpadded width
+        return Bilevel(bits, im.size[0])
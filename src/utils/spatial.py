@@ -0,0 +1,89 @@
+# src/utils/spatial.py
+# uniform-grid index over page text bboxes: rect-intersection and radius queries
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+from src.utils.io import read_json
+
+class TextIndex:
+    """
+    Buckets every item's bbox into the grid cells it overlaps (for rect queries)
+    and its center into one cell (for radius queries). Queries return item indices
+    in ascending order, so callers see items in the same order as a linear scan.
+    """
+    def __init__(self, items: List[Dict[str, Any]], cell: float = 256.0):
+        self.items = items
+        self.cell = float(cell)
+        b = np.array([it["bbox"] for it in items], dtype=np.float64).reshape(-1, 4)
+        self.bbox = b
+        self.cx = (b[:, 0] + b[:, 2]) / 2.0
+        self.cy = (b[:, 1] + b[:, 3]) / 2.0
+        self._rect: Dict[Tuple[int, int], List[int]] = {}
+        self._center: Dict[Tuple[int, int], List[int]] = {}
+        c = self.cell
+        for i, (x1, y1, x2, y2) in enumerate(b):
+            for gx in range(int(np.floor(x1 / c)), int(np.floor(x2 / c)) + 1):
+                for gy in range(int(np.floor(y1 / c)), int(np.floor(y2 / c)) + 1):
+                    self._rect.setdefault((gx, gy), []).append(i)
+            self._center.setdefault((int(np.floor(self.cx[i] / c)), int(np.floor(self.cy[i] / c))), []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _gather(self, table, x1: float, y1: float, x2: float, y2: float) -> np.ndarray:
+        c = self.cell
+        idx: List[int] = []
+        for gx in range(int(np.floor(x1 / c)), int(np.floor(x2 / c)) + 1):
+            for gy in range(int(np.floor(y1 / c)), int(np.floor(y2 / c)) + 1):
+                idx.extend(table.get((gx, gy), ()))
+        return np.unique(np.asarray(idx, dtype=np.int64))
+
+    def query_rect(self, rect: Sequence[float], min_overlap_px: float = 1.0) -> List[int]:
+        """Items whose bbox overlaps rect by >= min_overlap_px on both axes (same test as svg_parse_text.intersect)."""
+        if not self.items:
+            return []
+        x1, y1, x2, y2 = (float(v) for v in rect[:4])
+        cand = self._gather(self._rect, x1, y1, x2, y2)
+        if cand.size == 0:
+            return []
+        b = self.bbox[cand]
+        ox = np.minimum(b[:, 2], x2) - np.maximum(b[:, 0], x1)
+        oy = np.minimum(b[:, 3], y2) - np.maximum(b[:, 1], y1)
+        return cand[(ox >= min_overlap_px) & (oy >= min_overlap_px)].tolist()
+
+    def query_radius(self, xy: Sequence[float], radius: float) -> List[int]:
+        """Items whose bbox center lies within `radius` of xy (Chebyshev / L-inf distance)."""
+        if not self.items:
+            return []
+        x0, y0 = float(xy[0]), float(xy[1])
+        r = float(radius)
+        cand = self._gather(self._center, x0 - r, y0 - r, x0 + r, y0 + r)
+        if cand.size == 0:
+            return []
+        ok = (np.abs(self.cx[cand] - x0) <= r) & (np.abs(self.cy[cand] - y0) <= r)
+        return cand[ok].tolist()
+
+    def texts(self, idx: List[int]) -> List[str]:
+        return [self.items[i]["text"] for i in idx]
+
+_CACHE: "OrderedDict[Tuple[str, float], TextIndex]" = OrderedDict()
+_CACHE_MAX = 64
+
+def load_page_text_index(path: str | Path, cell: float = 256.0) -> TextIndex:
+    """TextIndex for a vector_text/<pdf>/page-N.json (empty if missing); memoized on (path, mtime)."""
+    p = Path(path)
+    if not p.exists():
+        return TextIndex([], cell)
+    key = (str(p.resolve()), p.stat().st_mtime)
+    ix = _CACHE.get(key)
+    if ix is None or ix.cell != float(cell):
+        ix = TextIndex(read_json(p), cell)
+        _CACHE[key] = ix
+        while len(_CACHE) > _CACHE_MAX:
+            _CACHE.popitem(last=False)
+    else:
+        _CACHE.move_to_end(key)
+    return ix
@@ -0,0 +1,135 @@
+# src/vision/cache.py
+# content-addressed on-disk memo for VLM/OCR outputs, shared across RUN_ID workspaces
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Optional
+import json, os, threading
+
+from src.utils.hashing import sha1_text
+
+class InferenceCache:
+    """
+    One small JSON file per key under <root>/<key[:2]>/<key>.json.
+    Keys hash (model id, dtype, prompt, image content, max_new_tokens), so a new
+    RUN_ID or a re-upload of the same drawing hits the same entries.
+    Hits touch the file mtime; once the total exceeds max_mb the oldest entries are
+    evicted down to ~90% of the budget.
+    """
+    def __init__(self, root: str | Path, max_mb: float = 2048, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = int(float(max_mb) * (1 << 20))
+        self.enabled = bool(enabled)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_id: str, dtype: str, prompt: str, image_hash: str | None = None,
+                 max_new_tokens: int = 0, variant: str = "") -> str:
+        parts = [str(model_id), str(dtype), sha1_text(prompt or ""), image_hash or "", int(max_new_tokens)]
+        if variant:
+            parts.append(str(variant))   # decoding changes that can alter the answer
+        return sha1_text(json.dumps(parts))
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns {"value": ...} on a hit, None on a miss (so cached None results still count as hits)."""
+        if not self.enabled:
+            return None
+        p = self._path(key)
+        try:
+            payload = json.loads(p.read_text(encoding="utf-8"))
+            os.utime(p, None)
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        p = self._path(key)
+        data = json.dumps({"value": value}).encode("utf-8")
+        with self._lock:
+            try:
+                p.parent.mkdir(parents=True, exist_ok=True)
+                old = p.stat().st_size if p.exists() else 0
+                tmp = p.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, p)
+            except Exception:
+                return
+            self.writes += 1
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - old
+            if self.max_bytes > 0 and self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for p in self.root.glob("*/*.json"):
+            try:
+                total += p.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        entries = []
+        for p in self.root.glob("*/*.json"):
+            try:
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+            except OSError:
+                pass
+        entries.sort()
+        target = int(self.max_bytes * 0.9)
+        total = sum(e[1] for e in entries)
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+                self.evicted += 1
+            except OSError:
+                pass
+        self._size = total
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "evicted": self.evicted}
+
+    def merge_stats(self, delta: Dict[str, int]) -> None:
+        """Add counters reported by another process writing the same cache root."""
+        for k in ("hits", "misses", "writes", "evicted"):
+            setattr(self, k, getattr(self, k) + int(delta.get(k, 0)))
+        self._size = None   # other writers changed the total; rescan on next put
+
+    def stats_str(self) -> str:
+        n = self.hits + self.misses
+        rate = (100.0 * self.hits / n) if n else 0.0
+        return f"hits={self.hits} misses={self.misses} ({rate:.0f}% hit) writes={self.writes} evicted={self.evicted}"
+
+_CACHES: Dict[str, InferenceCache] = {}
+
+def get_inference_cache(cfg) -> InferenceCache:
+    """Process-wide cache per root; disabled (no-op) when vision.cache.enable is false."""
+    cc = (getattr(cfg, "vision", {}) or {}).get("cache", {}) or {}
+    root = str(getattr(cfg.paths, "inference_cache", "") or (Path(cfg.paths.data_root) / "_cache" / "inference"))
+    enabled = bool(cc.get("enable", True))
+    c = _CACHES.get(root)
+    if c is None:
+        c = _CACHES[root] = InferenceCache(root, max_mb=float(cc.get("max_mb", 2048)), enabled=enabled)
+    c.enabled = enabled
+    return c
+
+def model_id(local_path: str) -> str:
+    return Path(str(local_path)).name
@@ -2,8 +2,9 @@
 from __future__ import annotations
 from typing import List
 from PIL import Image
-from transformers import AutoProcessor, VisionEncoderDecoderModel
 import torch, re
+from src.vision.registry import load_ocr, resolve_precision
+from src.vision.generation import timed_generate
 
 def donut_read_table(cfg, image_path: str, max_new_tokens=256) -> List[List[str]] | None:
     """Very rough 'table' via text tokens; returns rows split heuristically."""
@@ -13,14 +14,15 @@ def donut_read_table(cfg, image_path: str, max_new_tokens=256) -> List[List[str]
         return None
     if not local: return None
 
-    processor = AutoProcessor.from_pretrained(local, trust_remote_code=True)
-    model = VisionEncoderDecoderModel.from_pretrained(local, trust_remote_code=True)
-    model.eval()
+    precision = resolve_precision(cfg)
+    processor, model = load_ocr(local, dtype=precision)
 
     img = Image.open(image_path).convert("RGB")
     pixel_values = processor(images=img, return_tensors="pt").pixel_values
-    with torch.no_grad():
-        out_ids = model.generate(pixel_values, max_new_tokens=max_new_tokens, do_sample=False)
+    if precision in ("bfloat16", "float16"):
+        pixel_values = pixel_values.to(model.dtype)
+    out_ids = timed_generate(model, {"pixel_values": pixel_values}, precision,
+                             max_new_tokens=max_new_tokens, do_sample=False)
     text = processor.batch_decode(out_ids, skip_special_tokens=True)[0]
 
     # Split lines -> cells; crude but works for legend blocks with separators.
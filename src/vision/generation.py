@@ -0,0 +1,53 @@
+# src/vision/generation.py
+# shared generate() wrapper: per-precision-mode token throughput
+from __future__ import annotations
+from typing import Any, Dict
+import time
+
+_STATS: Dict[str, Dict[str, float]] = {}
+
+def timed_generate(model, inputs: Dict[str, Any], mode: str = "float32", **gen_kwargs):
+    """
+    model.generate(**inputs, **gen_kwargs) under no_grad, recording new tokens and
+    wall time under `mode` (float32 / bfloat16 / float16 / int8).
+    """
+    import torch
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        out_ids = model.generate(**inputs, **gen_kwargs)
+    dt = time.perf_counter() - t0
+
+    # decoder-only models echo the prompt; encoder-decoders start from one BOS token
+    ids = inputs.get("input_ids")
+    prompt_len = int(ids.shape[1]) if ids is not None else 1
+    record_gen(mode, max(0, int(out_ids.shape[1]) - prompt_len) * int(out_ids.shape[0]), dt)
+    return out_ids
+
+def record_gen(mode: str, new_tokens: int, seconds: float) -> None:
+    """Account one decoding call made outside timed_generate (e.g. a hand-rolled loop)."""
+    st = _STATS.setdefault(mode, {"calls": 0, "tokens": 0, "seconds": 0.0})
+    st["calls"] += 1
+    st["tokens"] += int(new_tokens)
+    st["seconds"] += seconds
+
+def gen_stats() -> Dict[str, Dict[str, float]]:
+    out = {}
+    for mode, st in _STATS.items():
+        tps = st["tokens"] / st["seconds"] if st["seconds"] > 0 else 0.0
+        out[mode] = {**st, "tokens_per_s": round(tps, 2)}
+    return out
+
+def gen_stats_str() -> str:
+    parts = [f"{m}: {s['tokens']} tok in {s['seconds']:.1f}s ({s['tokens_per_s']} tok/s, {s['calls']} calls)"
+             for m, s in gen_stats().items()]
+    return " | ".join(parts) if parts else "no generate() calls"
+
+def merge_gen_stats(other: Dict[str, Dict[str, float]]) -> None:
+    """Fold gen_stats() from another process (inference pool worker) into this one."""
+    for mode, o in other.items():
+        st = _STATS.setdefault(mode, {"calls": 0, "tokens": 0, "seconds": 0.0})
+        for k in ("calls", "tokens", "seconds"):
+            st[k] += o.get(k, 0)
+
+def reset_gen_stats() -> None:
+    _STATS.clear()
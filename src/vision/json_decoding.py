@@ -0,0 +1,248 @@
+# src/vision/json_decoding.py
+# JSON-aware generate(): stop once the top-level object closes, mask tokens that can't continue JSON
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import re
+
+_WS = " \t\r\n"
+_NUM_CHARS = set("0123456789+-.eE")
+_NUM_RE = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$")
+_LITERALS = {"t": "true", "f": "false", "n": "null"}
+
+class JsonScanner:
+    """
+    Incremental validator for a JSON object prefix. feed() returns False as soon as
+    the text can no longer be the start of a valid object; `done` flips once the
+    top-level object closes (anything after it is ignored). With lenient=True any
+    preamble before the first "{" (e.g. a ```json fence) is skipped.
+    """
+    __slots__ = ("stack", "mode", "is_key", "esc", "uni", "buf", "lit", "lenient")
+
+    def __init__(self, lenient: bool = False):
+        self.lenient = lenient
+        self.stack: List[str] = []
+        self.mode = "start"
+        self.is_key = False
+        self.esc = False
+        self.uni = 0
+        self.buf = ""
+        self.lit = ""
+
+    def copy(self) -> "JsonScanner":
+        c = JsonScanner.__new__(JsonScanner)
+        c.stack = list(self.stack)
+        c.lenient = self.lenient
+        c.mode, c.is_key, c.esc, c.uni, c.buf, c.lit = self.mode, self.is_key, self.esc, self.uni, self.buf, self.lit
+        return c
+
+    @property
+    def done(self) -> bool:
+        return self.mode == "done"
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if not self._step(ch):
+                return False
+        return True
+
+    def _after_value(self) -> None:
+        self.mode = "comma_or_end" if self.stack else "done"
+
+    def _open(self, ch: str) -> None:
+        self.stack.append(ch)
+        self.mode = "key_or_end" if ch == "{" else "value_or_end"
+
+    def _value(self, ch: str) -> bool:
+        if ch in "{[":
+            self._open(ch)
+        elif ch == '"':
+            self.mode, self.is_key = "string", False
+        elif ch == "-" or ch.isdigit():
+            self.mode, self.buf = "number", ch
+        elif ch in _LITERALS:
+            self.mode, self.lit = "literal", _LITERALS[ch][1:]
+        else:
+            return False
+        return True
+
+    def _step(self, ch: str) -> bool:
+        m = self.mode
+        if m == "done":
+            return True
+        if m == "string":
+            if self.uni:
+                if ch not in "0123456789abcdefABCDEF":
+                    return False
+                self.uni -= 1
+            elif self.esc:
+                if ch == "u":
+                    self.uni = 4
+                elif ch not in '"\\/bfnrt':
+                    return False
+                self.esc = False
+            elif ch == "\\":
+                self.esc = True
+            elif ch == '"':
+                if self.is_key:
+                    self.mode = "colon"
+                else:
+                    self._after_value()
+            elif ch in "\n\r":
+                return False
+            return True
+        if m == "number":
+            if ch in _NUM_CHARS:
+                self.buf += ch
+                return True
+            if not _NUM_RE.match(self.buf):
+                return False
+            self._after_value()
+            return self._step(ch)
+        if m == "literal":
+            if not self.lit or ch != self.lit[0]:
+                return False
+            self.lit = self.lit[1:]
+            if not self.lit:
+                self._after_value()
+            return True
+        if ch in _WS:
+            return True
+        if m == "start":
+            if ch != "{":
+                return self.lenient
+            self._open(ch)
+            return True
+        if m == "key_or_end" and ch == "}":
+            return self._close(ch)
+        if m in ("key_or_end", "key"):
+            if ch != '"':
+                return False
+            self.mode, self.is_key = "string", True
+            return True
+        if m == "colon":
+            if ch != ":":
+                return False
+            self.mode = "value"
+            return True
+        if m == "value_or_end" and ch == "]":
+            return self._close(ch)
+        if m in ("value", "value_or_end"):
+            return self._value(ch)
+        if m == "comma_or_end":
+            if ch == ",":
+                self.mode = "key" if self.stack[-1] == "{" else "value"
+                return True
+            if ch in "}]":
+                return self._close(ch)
+        return False
+
+    def _close(self, ch: str) -> bool:
+        if not self.stack or {"}": "{", "]": "["}[ch] != self.stack[-1]:
+            return False
+        self.stack.pop()
+        self._after_value()
+        return True
+
+class _Tracker:
+    """Per-row scanners synced to the generated suffix of input_ids (shared by stopper and masker)."""
+    def __init__(self, tokenizer, prompt_len: int, lenient: bool = False):
+        self.tok = tokenizer
+        self.prompt_len = int(prompt_len)
+        self.lenient = lenient
+        self.special = set(getattr(tokenizer, "all_special_ids", []) or [])
+        self.rows: List[JsonScanner] = []
+        self.fed: List[int] = []
+        self.ok: List[bool] = []
+        self._text: Dict[int, str] = {}
+
+    def text(self, tid: int) -> str:
+        s = self._text.get(tid)
+        if s is None:
+            s = "" if tid in self.special else self.tok.decode([tid], skip_special_tokens=True)
+            self._text[tid] = s
+        return s
+
+    def sync(self, input_ids) -> None:
+        n = int(input_ids.shape[0])
+        while len(self.rows) < n:
+            self.rows.append(JsonScanner(self.lenient)); self.fed.append(0); self.ok.append(True)
+        gen = input_ids[:, self.prompt_len:].tolist()
+        for i, ids in enumerate(gen):
+            for tid in ids[self.fed[i]:]:
+                if self.ok[i] and not self.rows[i].done:
+                    self.ok[i] = self.rows[i].feed(self.text(tid))
+            self.fed[i] = len(ids)
+
+def _criteria_classes():
+    from transformers import StoppingCriteria, LogitsProcessor
+
+    class JsonStop(StoppingCriteria):
+        """Stop each row once its top-level JSON object is closed; invalid rows run to max_new_tokens."""
+        def __init__(self, tracker: _Tracker):
+            self.tr = tracker
+
+        def __call__(self, input_ids, scores, **kwargs):
+            import torch
+            self.tr.sync(input_ids)
+            flags = [r.done for r in self.tr.rows]
+            return torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+
+    class JsonMask(LogitsProcessor):
+        """
+        Among the top_k candidates keep only tokens that extend a valid JSON prefix
+        (special tokens only after the object closes). If none of them fit, the row
+        is left unconstrained rather than forced onto a low-probability token.
+        """
+        def __init__(self, tracker: _Tracker, top_k: int = 8):
+            self.tr = tracker
+            self.top_k = max(1, int(top_k))
+
+        def __call__(self, input_ids, scores):
+            import torch
+            self.tr.sync(input_ids)
+            k = min(self.top_k, scores.shape[-1])
+            top = torch.topk(scores, k, dim=-1).indices.tolist()
+            for i, cands in enumerate(top):
+                st = self.tr.rows[i]
+                if st.done or not self.tr.ok[i]:
+                    continue
+                keep = [c for c in cands if c not in self.tr.special and st.copy().feed(self.tr.text(c))]
+                if not keep:
+                    continue
+                row = torch.full_like(scores[i], float("-inf"))
+                row[keep] = scores[i, keep]
+                scores[i] = row
+            return scores
+
+    return JsonStop, JsonMask
+
+def json_decoding_opts(cfg) -> Dict[str, Any]:
+    jd = ((getattr(cfg, "vision", {}) or {}).get("json_decoding", {}) or {})
+    return {
+        "early_stop": bool(jd.get("early_stop", True)),
+        "constrain": bool(jd.get("constrain", True)),
+        "top_k": int(jd.get("top_k", 8)),
+    }
+
+def json_variant(opts: Optional[Dict[str, Any]]) -> str:
+    """Cache-key tag: constrained decoding can change the answer, early stop alone cannot."""
+    return "json-constrained" if opts and opts.get("constrain") else ""
+
+def json_generate_kwargs(processor, inputs: Dict[str, Any], opts: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """stopping_criteria / logits_processor kwargs for model.generate(); {} when disabled."""
+    if not opts or not (opts.get("early_stop") or opts.get("constrain")):
+        return {}
+    from transformers import StoppingCriteriaList, LogitsProcessorList
+    JsonStop, JsonMask = _criteria_classes()
+    tok = getattr(processor, "tokenizer", processor)
+    # constrained rows must open with "{"; early-stop alone tolerates a preamble
+    tracker = _Tracker(tok, int(inputs["input_ids"].shape[1]), lenient=not opts.get("constrain"))
+    kw: Dict[str, Any] = {"stopping_criteria": StoppingCriteriaList([JsonStop(tracker)])}
+    if opts.get("constrain"):
+        kw["logits_processor"] = LogitsProcessorList([JsonMask(tracker, opts.get("top_k", 8))])
+    return kw
+
+def decode_new(processor, inputs: Dict[str, Any], out_ids) -> List[str]:
+    """Decode only the generated tokens (the echoed prompt may itself contain braces)."""
+    n = int(inputs["input_ids"].shape[1])
+    return processor.batch_decode(out_ids[:, n:], skip_special_tokens=True, clean_up_tokenization_spaces=False)
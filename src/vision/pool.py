@@ -0,0 +1,106 @@
+# src/vision/pool.py
+# multi-process inference pool: N workers, bounded torch threads, shared mmap'd weights
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+import atexit, multiprocessing as mp, os
+
+from src.vision.cache import get_inference_cache
+from src.vision.generation import gen_stats, merge_gen_stats, reset_gen_stats
+
+_WORKER_CFG = None
+
+def pool_opts(cfg) -> Dict[str, Any]:
+    """runtime.workers processes (vision.pool.enable), each with threads_per_worker torch threads (0 = cores / workers)."""
+    pc = (getattr(cfg, "vision", {}) or {}).get("pool", {}) or {}
+    workers = int((getattr(cfg, "runtime", {}) or {}).get("workers", 1) or 1)
+    if not pc.get("enable", True):
+        workers = 1
+    threads = int(pc.get("threads_per_worker", 0) or 0)
+    if threads <= 0:
+        threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    return {"workers": max(1, workers), "threads": threads, "min_jobs": int(pc.get("min_jobs", 4))}
+
+def _init_worker(cfg_dict: Dict[str, Any], threads: int) -> None:
+    global _WORKER_CFG
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    import torch
+    from omegaconf import OmegaConf
+    from src.vision.registry import get_registry
+    torch.set_num_threads(threads)
+    _WORKER_CFG = OmegaConf.create(cfg_dict)
+    get_registry(_WORKER_CFG)   # RAM budget + mmap_weights for this worker's models
+
+def _run_job(fn: Callable, job: Any) -> Tuple[Any, Dict[str, int], Dict[str, Dict[str, float]]]:
+    # returns the result plus this job's cache / throughput counters for the parent's logs
+    cache = get_inference_cache(_WORKER_CFG)
+    before = cache.stats()
+    reset_gen_stats()
+    out = fn(_WORKER_CFG, job)
+    after = cache.stats()
+    return out, {k: after[k] - before[k] for k in after}, gen_stats()
+
+class InferencePool:
+    """
+    ProcessPoolExecutor (spawn) whose workers keep their ModelRegistry between jobs,
+    so each worker loads a model once per run. With vision.registry.mmap_weights the
+    safetensors files are mapped read-only and the page cache is shared by all workers.
+    """
+    def __init__(self, cfg, workers: int, threads: int):
+        from omegaconf import OmegaConf
+        self.workers = workers
+        self.threads = threads
+        cfg_dict = OmegaConf.to_container(cfg, resolve=True)
+        self._ex = ProcessPoolExecutor(
+            max_workers=workers, mp_context=mp.get_context("spawn"),
+            initializer=_init_worker, initargs=(cfg_dict, threads),
+        )
+
+    def map(self, fn: Callable, jobs: List[Any]) -> List[Tuple[Any, Dict[str, int], Dict]]:
+        # executor.map hands jobs out one at a time and yields results in submission order
+        return list(self._ex.map(_run_job, [fn] * len(jobs), jobs))
+
+    def shutdown(self) -> None:
+        self._ex.shutdown(wait=True, cancel_futures=True)
+
+_POOL: InferencePool | None = None
+
+def get_pool(cfg) -> InferencePool | None:
+    """Process-wide pool (reused across stages so workers keep their models); None when workers <= 1."""
+    global _POOL
+    o = pool_opts(cfg)
+    if o["workers"] <= 1:
+        return None
+    if _POOL is not None and (_POOL.workers, _POOL.threads) != (o["workers"], o["threads"]):
+        _POOL.shutdown()
+        _POOL = None
+    if _POOL is None:
+        _POOL = InferencePool(cfg, o["workers"], o["threads"])
+    return _POOL
+
+def shutdown_pool() -> None:
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown()
+        _POOL = None
+
+atexit.register(shutdown_pool)
+
+def run_inference_jobs(cfg, fn: Callable, jobs: List[Any]) -> List[Any]:
+    """
+    fn(cfg, job) -> result for every job, results in job order. Sharded across the
+    worker pool when runtime.workers > 1 and there are at least vision.pool.min_jobs
+    jobs; otherwise runs in this process. fn must be a module-level function.
+    """
+    if _WORKER_CFG is not None or len(jobs) < max(2, pool_opts(cfg)["min_jobs"]):
+        return [fn(cfg, j) for j in jobs]   # inside a worker, or not worth the IPC
+    pool = get_pool(cfg)
+    if pool is None:
+        return [fn(cfg, j) for j in jobs]
+    cache = get_inference_cache(cfg)
+    results = []
+    for out, cache_delta, gen_delta in pool.map(fn, jobs):
+        cache.merge_stats(cache_delta)
+        merge_gen_stats(gen_delta)
+        results.append(out)
+    return results
@@ -0,0 +1,118 @@
+# src/vision/prefix_cache.py
+# prefill a prompt prefix shared by every call once, then decode each tile from its KV cache
+from __future__ import annotations
+from typing import Any, Dict, Iterable
+import copy, time
+
+from src.vision.generation import record_gen
+
+def _rope_index_fn(model):
+    # Qwen2-VL mrope helper moved from the LM head class to the inner model in newer transformers
+    fn = getattr(model, "get_rope_index", None)
+    if fn is None:
+        fn = getattr(getattr(model, "model", None), "get_rope_index", None)
+    return fn
+
+class PrefixKV:
+    """
+    Greedy decoding that resumes from a precomputed KV cache for the leading prompt
+    tokens. The prefix is taken from the first prompt seen and ends right before its
+    first image (vision_start) token, so the system text and any static user text
+    placed before the image are prefilled once per run.
+
+    generate() returns None (caller falls back to model.generate) for batched inputs,
+    prompts whose leading tokens differ from the cached prefix, or models without an
+    mrope index helper.
+    """
+    def __init__(self, model, mode: str = "float32"):
+        self.model = model
+        self.mode = mode
+        self.prefix_ids = None
+        self.cache = None
+        self.reused = 0
+        self.fallbacks = 0
+        self._rope = _rope_index_fn(model)
+        self._vision_start = getattr(getattr(model, "config", None), "vision_start_token_id", None)
+
+    @property
+    def prefix_len(self) -> int:
+        return 0 if self.prefix_ids is None else int(self.prefix_ids.shape[0])
+
+    def _build(self, row) -> bool:
+        import torch
+        if self._vision_start is None:
+            return False
+        hits = (row == self._vision_start).nonzero()
+        P = int(hits[0].item()) if len(hits) else 0
+        if P < 2:
+            return False
+        prefix = row[:P].unsqueeze(0)
+        pos = torch.arange(P, device=row.device).view(1, 1, P).expand(3, 1, P)
+        with torch.no_grad():
+            out = self.model(input_ids=prefix, attention_mask=torch.ones_like(prefix), position_ids=pos,
+                             use_cache=True, cache_position=torch.arange(P, device=row.device))
+        self.prefix_ids = row[:P].clone()
+        self.cache = out.past_key_values
+        return True
+
+    def _fresh_cache(self):
+        if hasattr(self.cache, "crop"):
+            self.cache.crop(self.prefix_len)   # DynamicCache: drop the previous tile's tokens in place
+            return self.cache
+        return copy.deepcopy(self.cache)       # legacy tuples are never mutated, but copy to be safe
+
+    def generate(self, inputs: Dict[str, Any], max_new_tokens: int, eos_ids: Iterable[int],
+                 logits_processor=None, stopping_criteria=None):
+        import torch
+        ids = inputs["input_ids"]
+        if int(ids.shape[0]) != 1 or self._rope is None:
+            return None
+        row = ids[0]
+        if self.cache is None and not self._build(row):
+            return None
+        P, L = self.prefix_len, int(row.shape[0])
+        if L <= P or not torch.equal(row[:P], self.prefix_ids):
+            self.fallbacks += 1
+            return None
+
+        t0 = time.perf_counter()
+        attn = inputs.get("attention_mask")
+        if attn is None:
+            attn = torch.ones_like(ids)
+        pos, deltas = self._rope(input_ids=ids, image_grid_thw=inputs.get("image_grid_thw"), attention_mask=attn)
+        extra = {k: v for k, v in inputs.items() if k not in ("input_ids", "attention_mask")}
+        eos = set(int(e) for e in eos_ids)
+
+        with torch.no_grad():
+            out = self.model(input_ids=ids[:, P:], attention_mask=attn, position_ids=pos[:, :, P:],
+                             past_key_values=self._fresh_cache(), use_cache=True,
+                             cache_position=torch.arange(P, L, device=ids.device), **extra)
+            seq = ids
+            for step in range(int(max_new_tokens)):
+                logits = out.logits[:, -1, :]
+                if logits_processor is not None:
+                    logits = logits_processor(seq, logits)
+                nxt = logits.argmax(-1, keepdim=True)
+                seq = torch.cat([seq, nxt], dim=1)
+                if int(nxt) in eos or step == int(max_new_tokens) - 1:
+                    break
+                if stopping_criteria is not None and bool(torch.as_tensor(stopping_criteria(seq, logits)).all()):
+                    break
+                cur = int(seq.shape[1]) - 1
+                attn = torch.cat([attn, attn.new_ones((1, 1))], dim=1)
+                p = (deltas.view(-1)[0] + cur).view(1, 1, 1).expand(3, 1, 1)
+                out = self.model(input_ids=nxt, attention_mask=attn, position_ids=p,
+                                 past_key_values=out.past_key_values, use_cache=True,
+                                 cache_position=torch.tensor([cur], device=ids.device))
+
+        self.reused += 1
+        record_gen(self.mode, int(seq.shape[1]) - L, time.perf_counter() - t0)
+        return seq
+
+def eos_token_ids(model, processor) -> list:
+    eos = getattr(getattr(model, "generation_config", None), "eos_token_id", None)
+    if eos is None:
+        eos = getattr(getattr(processor, "tokenizer", processor), "eos_token_id", None)
+    if eos is None:
+        return []
+    return list(eos) if isinstance(eos, (list, tuple)) else [eos]
@@ -0,0 +1,44 @@
+# src/vision/preprocess.py
+# tile → VLM image: ink-aware pre-crop + visual-token (pixel) budget
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+from PIL import Image
+
+from src.utils.image import ensure_rgb, ink_bbox, fit_pixel_budget
+
+def vision_image_opts(cfg) -> Dict[str, Any]:
+    """Plain dict of vision.image knobs (safe to pass to helpers without cfg)."""
+    vi = ((getattr(cfg, "vision", {}) or {}).get("image", {}) or {})
+    return {
+        "ink_crop": bool(vi.get("ink_crop", True)),
+        "ink_threshold": int(vi.get("ink_threshold", 200)),
+        "ink_pad_px": int(vi.get("ink_pad_px", 8)),
+        "min_pixels": int(vi.get("min_pixels", 0) or 0),
+        "max_pixels": int(vi.get("max_pixels", 0) or 0),
+        "table_max_pixels": int(vi.get("table_max_pixels", 0) or 0),
+    }
+
+def prepare_vlm_image(img: Image.Image, opts: Dict[str, Any] | None) -> Tuple[Image.Image, Tuple[int,int,int,int]]:
+    """
+    Trim white margins (if enabled) and downsample into the pixel budget.
+    Returns (image, crop_box) where crop_box is the kept region in the input
+    image's own pixel coordinates — add the tile origin to map back to the page.
+    """
+    img = ensure_rgb(img)
+    W, H = img.size
+    box = (0, 0, W, H)
+    if not opts:
+        return img, box
+    if opts.get("ink_crop"):
+        bb = ink_bbox(img, threshold=opts.get("ink_threshold", 200), pad=opts.get("ink_pad_px", 8))
+        if bb is not None and bb != box:
+            img = img.crop(bb)
+            box = bb
+    if opts.get("min_pixels") or opts.get("max_pixels"):
+        img = fit_pixel_budget(img, opts.get("min_pixels", 0), opts.get("max_pixels", 0))
+    return img, box
+
+def page_box(tile_bbox, crop_box) -> list:
+    """Map a crop box inside a tile back to page pixel coordinates."""
+    x0, y0 = tile_bbox[0], tile_bbox[1]
+    return [x0 + crop_box[0], y0 + crop_box[1], x0 + crop_box[2], y0 + crop_box[3]]
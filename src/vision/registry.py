@@ -1,9 +1,277 @@
-# unified factory using configs/models.yaml
-from .clients.qwen2vl import Qwen2VL
-from .clients.minicpmv2_6 import MiniCPMV
-# add others similarly
+# src/vision/registry.py
+# unified factory using configs/models.yaml + process-wide resident model registry
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+import threading
+
+from loguru import logger
 
 def get_client(name:str, cfg):
-    if name == "qwen2_vl": return Qwen2VL(cfg)
-    if name == "minicpm_v2_6": return MiniCPMV(cfg)
+    # imported lazily: the clients pull in transformers and use the registry below
+    if name == "qwen2_vl":
+        from .clients.qwen2vl import Qwen2VL
+        return Qwen2VL(cfg)
+    if name == "minicpm_v2_6":
+        from .clients.minicpmv2_6 import MiniCPMV
+        return MiniCPMV(cfg)
     raise ValueError(f"unknown VLM {name}")
+
+# ---------- model classes ----------
+def _pick_vlm_class():
+    # Compatible head selection across transformers versions
+    try:
+        from transformers import AutoModelForImageTextToText as ModelCls
+    except Exception:
+        try:
+            from transformers import AutoModelForVision2Seq as ModelCls
+        except Exception:
+            from transformers import Qwen2VLForConditionalGeneration as ModelCls
+    return ModelCls
+
+def _pick_ocr_class():
+    from transformers import VisionEncoderDecoderModel
+    return VisionEncoderDecoderModel
+
+_MODEL_CLASSES = {"vlm": _pick_vlm_class, "ocr": _pick_ocr_class}
+
+# ---------- precision ----------
+PRECISION_MODES = ("float32", "bfloat16", "float16", "int8")
+_PRECISION_ALIASES = {
+    "fp32": "float32", "float": "float32", "32": "float32",
+    "bf16": "bfloat16",
+    "fp16": "float16", "half": "float16", "16": "float16",
+    "qint8": "int8", "dynamic_int8": "int8", "int8_dynamic": "int8",
+}
+
+def normalize_precision(prec: str | None, device: str = "cpu") -> str:
+    """Map PRECISION aliases onto a supported mode; float16 on CPU runs as bfloat16."""
+    p = str(prec or "float32").strip().lower()
+    p = _PRECISION_ALIASES.get(p, p)
+    if p not in PRECISION_MODES:
+        p = "float32"
+    if p == "float16" and str(device).startswith("cpu"):
+        p = "bfloat16"   # CPU kernels for fp16 matmul are missing/slow
+    if p == "int8" and not str(device).startswith("cpu"):
+        p = "float16"    # dynamic quantization is CPU-only
+    return p
+
+def resolve_precision(cfg, device: str = "cpu") -> str:
+    """
+    cfg.runtime.precision (PRECISION env via base.yaml), else cfg.env.PRECISION, normalized for
+    the device the model is loaded on (load_vlm / load_ocr default to cpu), so the mode used in
+    cache keys and gen stats is the one the registry actually loads.
+    """
+    runtime = getattr(cfg, "runtime", {}) or {}
+    prec = runtime.get("precision") or (getattr(cfg, "env", {}) or {}).get("PRECISION")
+    return normalize_precision(prec, device)
+
+def _torch_dtype(name: str):
+    import torch
+    # int8 loads float32 weights, then quantizes the Linear layers
+    return {"bfloat16": torch.bfloat16, "float16": torch.float16}.get(name, torch.float32)
+
+def _quantize_dynamic_int8(model):
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+_ST_DTYPES = {"F32": "float32", "F16": "float16", "BF16": "bfloat16", "I64": "int64", "I32": "int32",
+              "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool", "F64": "float64"}
+
+def _mmap_safetensors(local_path: str) -> Dict[str, Any]:
+    """
+    Tensors viewing read-only MAP_SHARED mappings of every *.safetensors file, so
+    processes loading the same checkpoint share its pages instead of copying it.
+    """
+    import json, struct
+    import numpy as np
+    import torch
+    from pathlib import Path
+    out: Dict[str, Any] = {}
+    for f in sorted(Path(local_path).glob("*.safetensors")):
+        with open(f, "rb") as fh:
+            (hlen,) = struct.unpack("<Q", fh.read(8))
+            header = json.loads(fh.read(hlen))
+        buf = np.memmap(f, dtype=np.uint8, mode="r", offset=8 + hlen)
+        for name, meta in header.items():
+            if name == "__metadata__" or meta["dtype"] not in _ST_DTYPES:
+                continue
+            s, e = meta["data_offsets"]
+            dt = getattr(torch, _ST_DTYPES[meta["dtype"]])
+            raw = torch.frombuffer(buf, dtype=torch.uint8, count=e - s, offset=s) if e > s else torch.empty(0, dtype=torch.uint8)
+            out[name] = raw.view(dt).reshape(meta["shape"])
+    return out
+
+def _checkpoint_names(model, key: str):
+    """Candidate parameter names for a checkpoint key: the model's own key conversion first
+    (e.g. Qwen2-VL: checkpoint model.* / visual.* → model.language_model.* / model.visual.*)."""
+    import re
+    names = []
+    for pattern, repl in (getattr(model, "_checkpoint_conversion_mapping", None) or {}).items():
+        new, n = re.subn(pattern, repl, key)
+        if n:
+            names.append(new)
+            break
+    return names + [key, f"model.{key}", key.removeprefix("model.")]
+
+def _assign_mmap_weights(model, local_path: str) -> Tuple[int, int]:
+    """
+    Swap parameters for mmap-backed tensors where name, shape and dtype match; returns
+    (tensors, bytes) now shared. from_pretrained has already built a private copy: it is
+    the peak, and only the swapped tensors' copies are freed afterwards.
+    """
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # frombuffer warns about read-only buffers; weights are never written
+        mapped = _mmap_safetensors(local_path)
+    own = model.state_dict()
+    sd = {}
+    for k, t in mapped.items():
+        for name in _checkpoint_names(model, k):
+            if name in own and own[name].shape == t.shape and own[name].dtype == t.dtype:
+                sd[name] = t
+                break
+    if sd:
+        model.load_state_dict(sd, strict=False, assign=True)
+        if hasattr(model, "tie_weights"):
+            model.tie_weights()   # re-point lm_head at the (now mapped) embeddings
+    return len(sd), sum(t.numel() * t.element_size() for t in sd.values())
+
+def _model_nbytes(model) -> int:
+    """
+    Resident weight bytes, each storage once (tied weights, mmap views). quantize_dynamic
+    moves Linear weights into packed params that are neither parameters nor buffers:
+    they only show up in state_dict, as a (qint8 weight, bias) tuple.
+    """
+    import torch
+    seen, n = set(), 0
+    todo = list(model.parameters()) + list(model.buffers()) + list(model.state_dict().values())
+    while todo:
+        t = todo.pop()
+        if isinstance(t, (tuple, list)):
+            todo.extend(t)
+            continue
+        if not torch.is_tensor(t):
+            continue   # e.g. the packed params' dtype entry
+        key = (t.data_ptr(), t.dtype, t.numel())
+        if key not in seen:
+            seen.add(key)
+            n += t.numel() * t.element_size()
+    return n
+
+# ---------- registry ----------
+@dataclass
+class ModelHandle:
+    key: Tuple[str, str, str, str]   # (kind, local_path, dtype, device)
+    processor: Any
+    model: Any
+    nbytes: int
+
+class ModelRegistry:
+    """
+    Loads each (model, dtype, device) once per process and hands out the shared
+    processor/model pair. Least-recently-used models are evicted when the resident
+    total would exceed ram_budget_gb (0 = unbounded). The handle in use is never evicted.
+    """
+    def __init__(self, ram_budget_gb: float = 0.0, mmap_weights: bool = False):
+        self.ram_budget_bytes = int(float(ram_budget_gb) * (1 << 30))
+        self.mmap_weights = mmap_weights
+        self._handles: "OrderedDict[Tuple[str,str,str,str], ModelHandle]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+
+    def set_budget(self, ram_budget_gb: float) -> None:
+        with self._lock:
+            self.ram_budget_bytes = int(float(ram_budget_gb) * (1 << 30))
+            self._evict(keep=None)
+
+    def resident_bytes(self) -> int:
+        return sum(h.nbytes for h in self._handles.values())
+
+    def get(self, local_path: str, kind: str = "vlm", dtype: str = "float32", device: str = "cpu") -> ModelHandle:
+        key = (kind, str(local_path), normalize_precision(dtype, device), str(device))
+        with self._lock:
+            h = self._handles.get(key)
+            if h is not None:
+                self._handles.move_to_end(key)
+                self.hits += 1
+                return h
+            h = self._load(key)
+            self._handles[key] = h
+            self.loads += 1
+            self._evict(keep=key)
+            return h
+
+    def evict(self, local_path: str | None = None) -> int:
+        """Drop one model (all dtypes/devices) or, with no argument, everything."""
+        with self._lock:
+            keys = [k for k in self._handles if local_path is None or k[1] == str(local_path)]
+            for k in keys:
+                del self._handles[k]
+            if keys:
+                import gc
+                gc.collect()
+            return len(keys)
+
+    def _evict(self, keep) -> None:
+        if self.ram_budget_bytes <= 0:
+            return
+        dropped = False
+        while self.resident_bytes() > self.ram_budget_bytes:
+            victim = next((k for k in self._handles if k != keep), None)
+            if victim is None:
+                break
+            logger.info(f"[registry] evicting {victim[1]} ({victim[2]}) to stay under RAM budget")
+            del self._handles[victim]
+            dropped = True
+        if dropped:
+            import gc
+            gc.collect()
+
+    def _load(self, key) -> ModelHandle:
+        from transformers import AutoProcessor
+        kind, local_path, dtype, device = key
+        processor = AutoProcessor.from_pretrained(local_path, trust_remote_code=True)
+        ModelCls = _MODEL_CLASSES[kind]()
+        kwargs: Dict[str, Any] = {"torch_dtype": _torch_dtype(dtype), "trust_remote_code": True}
+        if kind == "vlm":
+            kwargs["device_map"] = None
+        model = ModelCls.from_pretrained(local_path, **kwargs)
+        if self.mmap_weights and dtype != "int8" and str(device).startswith("cpu"):
+            n, shared = _assign_mmap_weights(model, local_path)
+            expected = _model_nbytes(model)
+            msg = (f"[registry] {local_path}: {n} tensors mapped read-only from safetensors "
+                   f"({shared / (1 << 20):.0f} of {expected / (1 << 20):.0f} MiB shared)")
+            if shared < 0.9 * expected:
+                # names or dtypes did not line up (e.g. checkpoint stored in another precision)
+                logger.warning(msg + "; the rest stays a private copy")
+            else:
+                logger.info(msg)
+        if dtype == "int8":
+            model = _quantize_dynamic_int8(model)
+        elif device and device != "cpu":
+            model = model.to(device)
+        model.eval()
+        return ModelHandle(key=key, processor=processor, model=model, nbytes=_model_nbytes(model))
+
+_REGISTRY = ModelRegistry()
+
+def get_registry(cfg=None) -> ModelRegistry:
+    """Process-wide registry; passing cfg applies vision.registry.ram_budget_gb / mmap_weights."""
+    if cfg is not None:
+        reg_cfg = (getattr(cfg, "vision", {}) or {}).get("registry", {}) or {}
+        _REGISTRY.mmap_weights = bool(reg_cfg.get("mmap_weights", False))
+        budget = float(reg_cfg.get("ram_budget_gb", 0) or 0)
+        if int(budget * (1 << 30)) != _REGISTRY.ram_budget_bytes:
+            _REGISTRY.set_budget(budget)
+    return _REGISTRY
+
+def load_vlm(local_path: str, dtype: str = "float32", device: str = "cpu"):
+    h = _REGISTRY.get(local_path, kind="vlm", dtype=dtype, device=device)
+    return h.processor, h.model
+
+def load_ocr(local_path: str, dtype: str = "float32", device: str = "cpu"):
+    h = _REGISTRY.get(local_path, kind="ocr", dtype=dtype, device=device)
+    return h.processor, h.model
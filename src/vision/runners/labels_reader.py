@@ -7,7 +7,16 @@ from rapidfuzz import fuzz
 
 from src.utils.io import write_json, read_json, ensure_dir
 from src.utils.logging import setup_logging
-from src.parsers.svg_parse_text import parse_pdf_text_fitz, parse_svg_text, intersect
+from src.parsers.svg_parse_text import parse_pdf_text_fitz, parse_svg_text
+from src.utils.hashing import image_digest
+from src.utils.spatial import TextIndex, load_page_text_index
+from src.ingest.tiler import tile_image, materialize_tile, set_crop_cache_mb
+from src.vision.registry import get_registry, load_vlm, load_ocr, resolve_precision
+from src.vision.generation import timed_generate, gen_stats_str
+from src.vision.cache import InferenceCache, get_inference_cache, model_id
+from src.vision.json_decoding import json_decoding_opts, json_generate_kwargs, json_variant, decode_new
+from src.vision.pool import run_inference_jobs
+from src.vision.preprocess import vision_image_opts, prepare_vlm_image
 
 # --- tiny VLM utility (Qwen2-VL preferred) ---
 def _select_vlm(cfg):
@@ -19,50 +28,55 @@ def _select_vlm(cfg):
             return key, meta["local_path"]
     return None, None
 
-def _vlm_labels_from_image(local_path: str, img_path: str, max_new_tokens=128) -> List[str]:
-    """Ask the VLM to output JSON: {"labels": ["...","..."]}"""
-    from transformers import AutoProcessor
-    import torch, json as pyjson
-
-    processor = AutoProcessor.from_pretrained(local_path, trust_remote_code=True)
+_LABELS_PROMPT = (
+    'Extract short textual labels visible in this image (device names, port tags, phases, ratings). '
+    'Return only strict JSON like {"labels":["L1","L2","MCCB","TPN 125A"]} with no extra text.'
+)
+_OCR_PROMPT = "donut:words"  # cache-key stand-in; Donut runs without a text prompt
 
-    # model class fallback chain
-    ModelCls = None
-    try:
-        from transformers import AutoModelForImageTextToText as ModelCls
-    except Exception:
+def _parse_labels_json(out: str) -> List[str]:
+    import json as pyjson
+    s = out.find("{"); e = out.rfind("}")
+    if s!=-1 and e!=-1:
         try:
-            from transformers import AutoModelForVision2Seq as ModelCls
+            obj = pyjson.loads(out[s:e+1])
+            labels = obj.get("labels", [])
+            return [str(t).strip() for t in labels if str(t).strip()]
         except Exception:
-            from transformers import Qwen2VLForConditionalGeneration as ModelCls
-
-    model = ModelCls.from_pretrained(local_path, torch_dtype=torch.float32, device_map=None, trust_remote_code=True)
-    model.eval()
+            pass
+    return []
 
-    img = Image.open(img_path).convert("RGB")
-    prompt = (
-        'Extract short textual labels visible in this image (device names, port tags, phases, ratings). '
-        'Return only strict JSON like {"labels":["L1","L2","MCCB","TPN 125A"]} with no extra text.'
-    )
+def _vlm_labels_from_image(local_path: str, img_path: str, max_new_tokens=128, cache: InferenceCache | None = None,
+                           precision: str = "float32", img_opts: Dict[str, Any] | None = None,
+                           json_opts: Dict[str, Any] | None = None) -> List[str]:
+    """Ask the VLM to output JSON: {"labels": ["...","..."]}"""
+    with Image.open(img_path) as im:
+        img, _ = prepare_vlm_image(im, img_opts)
+    prompt = _LABELS_PROMPT
+
+    key = None
+    if cache is not None:
+        key = cache.make_key(model_id(local_path), precision, prompt, image_digest(img), max_new_tokens,
+                             variant=json_variant(json_opts))
+        hit = cache.get(key)
+        if hit is not None:
+            return list(hit["value"])
+
+    processor, model = load_vlm(local_path, dtype=precision)
     messages = [{
         "role":"user",
         "content":[{"type":"image","image":img},{"type":"text","text":prompt}],
     }]
     text = processor.apply_chat_template(messages, add_generation_prompt=True)
     inputs = processor(text=[text], images=[img], return_tensors="pt")
-    out_ids = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
-    out = processor.batch_decode(out_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)[0]
+    out_ids = timed_generate(model, inputs, precision, max_new_tokens=max_new_tokens, do_sample=False,
+                             **json_generate_kwargs(processor, inputs, json_opts))
+    out = decode_new(processor, inputs, out_ids)[0]
 
-    s = out.find("{"); e = out.rfind("}")
-    if s!=-1 and e!=-1:
-        try:
-            obj = pyjson.loads(out[s:e+1])
-            labels = obj.get("labels", [])
-            labels = [str(t).strip() for t in labels if str(t).strip()]
-            return labels
-        except Exception:
-            pass
-    return []
+    labels = _parse_labels_json(out)
+    if key:
+        cache.put(key, labels)
+    return labels
 
 # --- OCR fallback (Donut base; best-effort) ---
 def _select_ocr_model_path(cfg) -> str | None:
@@ -89,34 +103,78 @@ def _select_ocr_model_path(cfg) -> str | None:
             pass
     return None
 
-def _ocr_labels_from_image(local_path: str, img_path: str, max_new_tokens=64) -> List[str]:
+def _words_from_ocr_text(text: str) -> List[str]:
+    import re
+    # tokenize to candidate "labels"
+    words = [w.strip(",.;:()[]{}") for w in re.split(r"[\s/|]+", text)]
+    words = [w for w in words if w and len(w) >= 2]
+    # keep alnum & -+% only
+    words = [w for w in words if re.fullmatch(r"[A-Za-z0-9\-+%]+", w)]
+    # simple post rules to capture common tags like TB1-4, L1/L2, 100A
+    return list(dict.fromkeys(words))[:30]
+
+def _ocr_labels_from_images(local_path: str, images: List[str | Image.Image], max_new_tokens=64, batch_size=8,
+                            cache: InferenceCache | None = None, precision: str = "float32") -> List[List[str]]:
     """
-    Very lightweight OCR-ish fallback using Donut base.
-    We do NOT assume a dataset-specific prompt; just ask for words we can read.
+    Batched Donut pass over many tiles (paths or PIL images): Donut resizes every image
+    to one fixed input size, so tiles stack into a single encoder/decoder call per batch.
+    Cache hits are answered without touching the model; only misses fill batches.
+    Returns one word list per input (empty on failure).
     """
-    try:
-        from transformers import AutoProcessor, VisionEncoderDecoderModel
-        import torch, re
-        processor = AutoProcessor.from_pretrained(local_path, trust_remote_code=True)
-        model = VisionEncoderDecoderModel.from_pretrained(local_path, trust_remote_code=True)
-        model.eval()
-
-        img = Image.open(img_path).convert("RGB")
-        # crude: treat this as captioning -> split tokens
-        pixel_values = processor(images=img, return_tensors="pt").pixel_values
-        with torch.no_grad():
-            out_ids = model.generate(pixel_values, max_new_tokens=max_new_tokens, do_sample=False)
-        text = processor.batch_decode(out_ids, skip_special_tokens=True)[0]
-
-        # tokenize to candidate "labels"
-        words = [w.strip(",.;:()[]{}") for w in re.split(r"[\s/|]+", text)]
-        words = [w for w in words if w and len(w) >= 2]
-        # keep alnum & -+% only
-        words = [w for w in words if re.fullmatch(r"[A-Za-z0-9\-+%]+", w)]
-        # simple post rules to capture common tags like TB1-4, L1/L2, 100A
-        return list(dict.fromkeys(words))[:30]
-    except Exception:
-        return []
+    out: List[List[str]] = [[] for _ in images]
+    if not images:
+        return out
+    bs = max(1, int(batch_size))
+    mid = model_id(local_path)
+
+    def _run(buf):
+        # buf: [(index, image, cache_key)]
+        try:
+            processor, model = load_ocr(local_path, dtype=precision)
+            # crude: treat this as captioning -> split tokens
+            pixel_values = processor(images=[b[1] for b in buf], return_tensors="pt").pixel_values
+            if precision in ("bfloat16", "float16"):
+                pixel_values = pixel_values.to(model.dtype)
+            out_ids = timed_generate(model, {"pixel_values": pixel_values}, precision,
+                                     max_new_tokens=max_new_tokens, do_sample=False)
+            texts = processor.batch_decode(out_ids, skip_special_tokens=True)
+        except Exception:
+            return
+        for (i, _, key), text in zip(buf, texts):
+            out[i] = _words_from_ocr_text(text)
+            if key:
+                cache.put(key, out[i])
+
+    buf = []
+    for i, p in enumerate(images):
+        try:
+            img = p.convert("RGB") if isinstance(p, Image.Image) else Image.open(p).convert("RGB")
+        except Exception:
+            continue
+        key = None
+        if cache is not None:
+            key = cache.make_key(mid, precision, _OCR_PROMPT, image_digest(img), max_new_tokens)
+            hit = cache.get(key)
+            if hit is not None:
+                out[i] = list(hit["value"])
+                continue
+        buf.append((i, img, key))
+        if len(buf) >= bs:
+            _run(buf); buf = []
+    if buf:
+        _run(buf)
+    return out
+
+# --- inference-pool jobs (module-level so worker processes can import them) ---
+def _ocr_job(cfg, job: Dict[str, Any]) -> List[List[str]]:
+    # tiles are cropped in memory from the page raster, in whichever process runs the job
+    images = [tile_image(t) for t in job["tiles"]]
+    return _ocr_labels_from_images(job["local_path"], images, batch_size=len(images),
+                                   cache=get_inference_cache(cfg), precision=job["precision"])
+
+def _vlm_labels_job(cfg, job: Dict[str, Any]) -> List[str]:
+    return _vlm_labels_from_image(job["local_path"], job["path"], cache=get_inference_cache(cfg),
+                                  precision=job["precision"], img_opts=job["img_opts"], json_opts=job["json_opts"])
 
 # --- main vector text pass ---
 def build_vector_text_index(cfg) -> Dict[str, Any]:
@@ -140,19 +198,29 @@ def build_vector_text_index(cfg) -> Dict[str, Any]:
             page = int(meta["page"])
             svg_path = meta.get("svg")
             items = []
-            src = None
+            src, ppi = None, None
 
             if svg_path and Path(svg_path).exists():
-                items = parse_svg_text(svg_path, min_chars=cfg.labels.min_vec_chars)
-                src = "svg"
+                items = parse_svg_text(svg_path, min_chars=cfg.labels.min_vec_chars,
+                                       engine=str(getattr(cfg.labels, "svg_text_parser", "stream")))
+                src, ppi = "svg", 96   # SVG user units (CSS px)
 
             if not items:
-                items = parse_pdf_text_fitz(pdf_path, page, dpi=cfg.runtime.dpi, min_chars=cfg.labels.min_vec_chars)
+                # spans extracted at ingest (same PyMuPDF pass as the manifest); reopen the PDF only if absent
+                text_json = meta.get("text_json")
+                if text_json and Path(text_json).exists():
+                    items = read_json(text_json)
+                    ppi = meta.get("text_ppi", m.get("dpi", cfg.runtime.dpi))
+                else:
+                    items = parse_pdf_text_fitz(pdf_path, page, dpi=cfg.runtime.dpi, min_chars=cfg.labels.min_vec_chars)
+                    ppi = cfg.runtime.dpi
                 src = "pymupdf"
 
             page_out = out_root / pdf_name / f"page-{page}.json"
             write_json(items, page_out)
-            idx_pages.append({"page": page, "path": str(page_out), "count": len(items), "source": src})
+            # ppi: units per inch of the bboxes (PNG pixels when it equals the render dpi)
+            idx_pages.append({"page": page, "path": str(page_out), "count": len(items), "source": src,
+                              "ppi": int(ppi)})
 
         index[pdf_name] = idx_pages
         log.info(f"[vector_text] {pdf_name}: "
@@ -168,7 +236,7 @@ def run_labels_reader(cfg):
     Build per-tile labels:
       - collect all vector text intersecting the tile bbox
       - *fallbacks*:
-          * if page vector text is scarce and cfg.ocr.enable -> OCR tiles (Donut)
+          * if page vector text is scarce and cfg.ocr.enable -> OCR tiles (Donut, batched after the vector pass)
           * else if cfg.labels.use_vlm_on_micro -> VLM per tile (capped)
       - merge & deduplicate (fuzzy)
     """
@@ -188,9 +256,14 @@ def run_labels_reader(cfg):
     ocr_enabled = bool(getattr(cfg, "ocr", {}).get("enable", False))
     min_vec_threshold = int(getattr(cfg, "ocr", {}).get("min_vec_text_threshold", 20))
     ocr_model_path = _select_ocr_model_path(cfg) if ocr_enabled else None
+    get_registry(cfg)  # apply RAM budget before the first load
+    cache = get_inference_cache(cfg)
+    precision = resolve_precision(cfg)
+    img_opts = vision_image_opts(cfg)
+    json_opts = json_decoding_opts(cfg)
 
     if use_vlm:
-        log.info(f"[labels] VLM enabled for micro tiles: {vlm_name}")
+        log.info(f"[labels] VLM enabled for micro tiles: {vlm_name} ({precision})")
     else:
         log.info("[labels] VLM disabled for micro tiles.")
 
@@ -201,19 +274,20 @@ def run_labels_reader(cfg):
 
     tiles = read_json(tile_index_path)
     micro_tiles = [t for t in tiles if t["scale"] == "micro"]
+    set_crop_cache_mb(cfg.runtime.tile.get("crop_cache_mb", 256))
 
     out_root_tiles = Path(cfg.paths.processed) / "labels" / "tiles"
     out_root_tiles.mkdir(parents=True, exist_ok=True)
 
-    # Load all per-page vector text into memory (per pdf)
-    cache_vec: Dict[str, Dict[int, List[Dict[str, Any]]]] = {}
+    # Load all per-page vector text into memory (per pdf), grid-indexed for tile queries
+    cache_vec: Dict[str, Dict[int, TextIndex]] = {}
     page_vec_counts: Dict[str, Dict[int, int]] = {}
     for pdf_name, pages in vec_idx.items():
         cache_vec[pdf_name] = {}
         page_vec_counts[pdf_name] = {}
         for pinfo in pages:
             pg = int(pinfo["page"])
-            cache_vec[pdf_name][pg] = read_json(pinfo["path"])
+            cache_vec[pdf_name][pg] = load_page_text_index(pinfo["path"])
             page_vec_counts[pdf_name][pg] = int(pinfo.get("count", len(cache_vec[pdf_name][pg])))
 
     def merge_dedup(vec_labels: List[str], fx_labels: List[str]) -> List[str]:
@@ -228,30 +302,50 @@ def run_labels_reader(cfg):
 
     vlm_budget = int(getattr(cfg.labels, "max_tiles_vlm", 120))
     vlm_used = 0
-    per_tile_records = []
+    ocr_batch = int(getattr(cfg, "ocr", {}).get("batch_size", 8))
 
+    # pass 1: vector text per tile; queue OCR tiles and (capped) VLM tiles
+    pending = []    # (tile, vec_in_tile, vec_labels, fallback_labels)
+    ocr_queue = []  # indices into pending
+    vlm_queue = []  # indices into pending
     for t in micro_tiles:
         pdf = t["pdf"]; page = int(t["page"]); bbox = t["bbox"]
-        vec_items = cache_vec.get(pdf, {}).get(page, [])
-        vec_in_tile = []
-        for it in vec_items:
-            bb = it["bbox"]
-            if intersect((bb[0],bb[1],bb[2],bb[3]), (bbox[0],bbox[1],bbox[2],bbox[3]), min_overlap_px=1.0):
-                vec_in_tile.append(it)
+        vec_ix = cache_vec.get(pdf, {}).get(page)
+        vec_in_tile = [vec_ix.items[i] for i in vec_ix.query_rect(bbox, min_overlap_px=1.0)] if vec_ix else []
         vec_labels = [it["text"] for it in vec_in_tile]
 
         # decide fallback per page/tile
         fallback_labels: List[str] = []
         scarce_page_vec = page_vec_counts.get(pdf, {}).get(page, 0) < min_vec_threshold
         if ocr_enabled and ocr_model_path and (scarce_page_vec or len(vec_labels) == 0):
-            fallback_labels = _ocr_labels_from_image(ocr_model_path, t["path"])
+            ocr_queue.append(len(pending))
         elif use_vlm and (vlm_used < vlm_budget) and len(vec_labels) == 0:
-            fallback_labels = _vlm_labels_from_image(vlm_path, t["path"])
+            vlm_queue.append(len(pending))
             vlm_used += 1
-
+        pending.append((t, vec_in_tile, vec_labels, fallback_labels))
+
+    # pass 2: batched Donut runs over every queued tile, sharded over the inference pool, fanned back out
+    if ocr_queue:
+        log.info(f"[labels] OCR on {len(ocr_queue)} tiles (batch_size={ocr_batch})")
+        # tile records, not PNGs: each job crops its tiles from the page raster memmap
+        tiles = [pending[i][0] for i in ocr_queue]
+        ocr_jobs = [{"local_path": ocr_model_path, "tiles": tiles[k:k+ocr_batch], "precision": precision}
+                    for k in range(0, len(tiles), max(1, ocr_batch))]
+        ocr_words = [w for chunk in run_inference_jobs(cfg, _ocr_job, ocr_jobs) for w in chunk]
+        for i, words in zip(ocr_queue, ocr_words):
+            pending[i][3].extend(words)
+    if vlm_queue:
+        vlm_jobs = [{"local_path": vlm_path, "path": materialize_tile(pending[i][0]), "precision": precision,
+                     "img_opts": img_opts, "json_opts": json_opts} for i in vlm_queue]
+        for i, labels in zip(vlm_queue, run_inference_jobs(cfg, _vlm_labels_job, vlm_jobs)):
+            pending[i][3].extend(labels)
+
+    # pass 3: merge & write per-tile json
+    per_tile_records = []
+    for t, vec_in_tile, vec_labels, fallback_labels in pending:
+        pdf = t["pdf"]; page = int(t["page"])
         merged = merge_dedup(vec_labels, fallback_labels)
 
-        # Write per-tile json
         tile_out = out_root_tiles / pdf / f"page-{page}" / Path(t["path"]).name.replace(".png",".json")
         ensure_dir(tile_out.parent)
         rec = {
@@ -261,6 +355,7 @@ def run_labels_reader(cfg):
             "row": t["row"], "col": t["col"],
             "tile_bbox": t["bbox"],
             "tile_path": t["path"],
+            "page_png": t.get("page_png"),
             "vector_labels": vec_labels,
             "fallback_labels": fallback_labels,
             "labels_merged": merged,
@@ -272,3 +367,7 @@ def run_labels_reader(cfg):
     out_idx = Path(cfg.paths.processed) / "labels" / "tile_labels.index.json"
     write_json(per_tile_records, out_idx)
     log.info(f"[labels] wrote {len(per_tile_records)} tile label files → {out_idx}")
+    if cache.enabled:
+        log.info(f"[labels] inference cache: {cache.stats_str()}")
+    if vlm_used or ocr_queue:
+        log.info(f"[labels] throughput: {gen_stats_str()}")
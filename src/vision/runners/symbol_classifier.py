@@ -1,7 +1,8 @@
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import json, math
 
+import numpy as np
 from PIL import Image
 from rapidfuzz import fuzz
 
@@ -9,8 +10,19 @@ from src.config.loader import load_cfg
 from src.utils.io import read_json, write_json, ensure_dir
 from src.utils.logging import setup_logging
 from src.resources import load_device_catalog
-from src.parsers.svg_parse_text import intersect
+from src.utils.spatial import TextIndex, load_page_text_index
+from src.ingest.tiler import tile_image, materialize_tile, set_crop_cache_mb
 from src.schema.types import ComponentCandidate, CandidateAlt
+from src.utils.hashing import image_digest
+from src.utils.image import ink_bbox
+from src.cv.phash import dhash, ink_features, cluster_near_duplicates
+from src.vision.registry import get_registry, load_vlm, resolve_precision
+from src.vision.generation import timed_generate, gen_stats_str
+from src.vision.cache import get_inference_cache, model_id
+from src.vision.json_decoding import json_decoding_opts, json_generate_kwargs, json_variant, decode_new
+from src.vision.prefix_cache import PrefixKV, eos_token_ids
+from src.vision.pool import run_inference_jobs
+from src.vision.preprocess import vision_image_opts, prepare_vlm_image, page_box
 
 # ---------- VLM bootstrap ----------
 def _select_vlm(cfg):
@@ -19,44 +31,113 @@ def _select_vlm(cfg):
             return key, cfg.vlm[key].get("local_path")
     return None, None
 
-def _gen_with_vlm(local_path: str, system_str: str, user_str: str, image_path: str, max_new_tokens=180):
-    from transformers import AutoProcessor
-    import torch
+def _json_slice(out: str) -> str:
+    s, e = out.find("{"), out.rfind("}")
+    return out[s:e+1] if s!=-1 and e!=-1 else "{}"
+
+def _user_content(img, user_str) -> List[Dict[str, Any]]:
+    # (head, tail): static head text first so it can share the prefix KV cache
+    if isinstance(user_str, tuple):
+        head, tail = user_str
+        return [{"type":"text","text":head},{"type":"image","image":img},{"type":"text","text":tail}]
+    return [{"type":"image","image":img},{"type":"text","text":user_str}]
+
+def _split_user_tmpl(user_tmpl: str, allowed_str: str):
+    """Split the user template after {ALLOWED_TYPES}: (static head, per-tile tail template)."""
+    cut = user_tmpl.find("{ALLOWED_TYPES}")
+    if cut == -1:
+        return "", user_tmpl
+    cut += len("{ALLOWED_TYPES}")
+    return user_tmpl[:cut].replace("{ALLOWED_TYPES}", allowed_str), user_tmpl[cut:]
 
-    # Compatible head selection
-    ModelCls = None
+def _gen_with_vlm_batch(local_path: str, system_str: str, user_strs: List[Any], images: List[Any], max_new_tokens=180,
+                        precision: str = "float32", json_opts: Dict[str, Any] | None = None,
+                        prefix_kv: PrefixKV | None = None) -> List[str]:
+    """
+    One padded processor()/generate() call over several tiles (paths or prepared PIL images).
+    user_strs items are plain strings, or (head, tail) pairs placed around the image.
+    """
+    processor, model = load_vlm(local_path, dtype=precision)
+
+    imgs = [Image.open(im).convert("RGB") if isinstance(im, (str, Path)) else im for im in images]
+    texts = []
+    for img, user_str in zip(imgs, user_strs):
+        messages = [
+            {"role":"system","content":[{"type":"text","text":system_str}]},
+            {"role":"user","content":_user_content(img, user_str)},
+        ]
+        texts.append(processor.apply_chat_template(messages, add_generation_prompt=True))
+
+    batched = len(texts) > 1
+    tok = getattr(processor, "tokenizer", None) if batched else None
+    side = getattr(tok, "padding_side", None)
     try:
-        from transformers import AutoModelForImageTextToText as ModelCls
-    except Exception:
-        try:
-            from transformers import AutoModelForVision2Seq as ModelCls
-        except Exception:
-            from transformers import Qwen2VLForConditionalGeneration as ModelCls
+        if tok is not None:
+            tok.padding_side = "left"  # decoder-only: pad before the prompt
+        inputs = processor(text=texts, images=imgs, padding=batched, return_tensors="pt")
+    finally:
+        if tok is not None:
+            tok.padding_side = side    # the processor is the registry's shared instance
+    json_kw = json_generate_kwargs(processor, inputs, json_opts)
+    out_ids = None
+    if prefix_kv is not None and not batched:
+        out_ids = prefix_kv.generate(inputs, max_new_tokens, eos_token_ids(model, processor),
+                                     logits_processor=json_kw.get("logits_processor"),
+                                     stopping_criteria=json_kw.get("stopping_criteria"))
+    if out_ids is None:
+        out_ids = timed_generate(model, inputs, precision, max_new_tokens=max_new_tokens, do_sample=False, **json_kw)
+    return [_json_slice(o) for o in decode_new(processor, inputs, out_ids)]
 
-    processor = AutoProcessor.from_pretrained(local_path, trust_remote_code=True)
-    model = ModelCls.from_pretrained(local_path, device_map=None, torch_dtype=torch.float32, trust_remote_code=True)
-    model.eval()
+_PREFIX: Dict[tuple, PrefixKV] = {}
 
-    img = Image.open(image_path).convert("RGB")
+def _symbol_job(cfg, job: Dict[str, Any]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    One size-bucketed batch of tiles; runs in an inference-pool worker or in-process.
+    Returns (outputs, this job's prefix-KV counters): _PREFIX lives in whichever process
+    ran the job, so the parent sums the counters instead of reading its own _PREFIX.
+    """
+    prefix_kv = None
+    if job["prefix"]:
+        k = (job["local_path"], job["precision"])
+        if k not in _PREFIX:
+            _PREFIX[k] = PrefixKV(load_vlm(job["local_path"], dtype=job["precision"])[1], job["precision"])
+        prefix_kv = _PREFIX[k]
+        built, reused, fallbacks = prefix_kv.prefix_len > 0, prefix_kv.reused, prefix_kv.fallbacks
+    outs = _gen_with_vlm_batch(
+        local_path=job["local_path"],
+        system_str=job["system_str"],
+        user_strs=job["user_msgs"],
+        images=job["images"],
+        max_new_tokens=job["max_new_tokens"],
+        precision=job["precision"],
+        json_opts=job["json_opts"],
+        prefix_kv=prefix_kv,
+    )
+    if prefix_kv is None:
+        return outs, {}
+    return outs, {"prefills": int(not built and prefix_kv.prefix_len > 0), "prefix_len": prefix_kv.prefix_len,
+                  "reused": prefix_kv.reused - reused, "fallbacks": prefix_kv.fallbacks - fallbacks}
 
-    messages = [
-        {"role":"system","content":[{"type":"text","text":system_str}]},
-        {"role":"user","content":[{"type":"image","image":img},{"type":"text","text":user_str}]},
-    ]
-    text = processor.apply_chat_template(messages, add_generation_prompt=True)
-    inputs = processor(text=[text], images=[img], return_tensors="pt")
-    out_ids = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
-    out = processor.batch_decode(out_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)[0]
-    s, e = out.find("{"), out.rfind("}")
-    return out[s:e+1] if s!=-1 and e!=-1 else "{}"
+def _size_batches(sizes: List[tuple], batch_size: int, bucket_px: int = 64) -> List[List[int]]:
+    """
+    Group job indices by (w, h) size bucket (so padding stays small) and chunk each
+    bucket into batches of <= batch_size. batch_size <= 1 keeps the original order.
+    """
+    if batch_size <= 1:
+        return [[i] for i in range(len(sizes))]
+    step = max(1, int(bucket_px))
+    buckets: Dict[tuple, List[int]] = {}
+    for i, (w, h) in enumerate(sizes):
+        buckets.setdefault((-(-w//step), -(-h//step)), []).append(i)
+    out = []
+    for idxs in buckets.values():
+        for k in range(0, len(idxs), batch_size):
+            out.append(idxs[k:k+batch_size])
+    return out
 
 # ---------- label harvesting for meso tiles ----------
-def _labels_in_tile(vec_page_items: List[Dict[str,Any]], tile_bbox: List[int]) -> List[str]:
-    out = []
-    for it in vec_page_items:
-        bb = it["bbox"]
-        if intersect((bb[0],bb[1],bb[2],bb[3]), (tile_bbox[0],tile_bbox[1],tile_bbox[2],tile_bbox[3]), 1.0):
-            out.append(it["text"])
+def _labels_in_tile(vec_page: TextIndex | None, tile_bbox: List[int]) -> List[str]:
+    out = vec_page.texts(vec_page.query_rect(tile_bbox, 1.0)) if vec_page is not None else []
     # simple dedup
     uniq = []
     for s in out:
@@ -64,6 +145,42 @@ def _labels_in_tile(vec_page_items: List[Dict[str,Any]], tile_bbox: List[int]) -
             uniq.append(s)
     return uniq
 
+def _prep_tile(t, opts):
+    """Open a tile and apply ink crop + pixel budget; returns (image, content bbox in page px)."""
+    img, box = prepare_vlm_image(tile_image(t), opts)
+    return img, page_box(t["bbox"], box)
+
+def _dedup_clusters(scored, cfg):
+    """
+    Cluster near-identical meso tiles (dHash + ink grid of the ink-cropped symbol, so the
+    same symbol at a different offset in its tile still matches). Returns (reps, members_of):
+    representative indices into `scored` in rank order, and rep -> other member indices.
+    """
+    dd = getattr(cfg.symbols, "dedup", {}) or {}
+    if not dd.get("enable", False) or len(scored) < 2:
+        return list(range(len(scored))), {}
+    hash_size = int(dd.get("hash_size", 16))
+    hashes, feats, sizes = [], [], []
+    for _, _, t in scored:
+        im = tile_image(t)
+        box = ink_bbox(im, pad=0)
+        sym = im.crop(box) if box is not None else im
+        bb = t["bbox"]
+        tw, th = max(1, bb[2]-bb[0]), max(1, bb[3]-bb[1])
+        hashes.append(dhash(sym, hash_size))
+        # the symbol's extent relative to its tile rides along with the ink grid
+        feats.append(np.append(ink_features(sym), [sym.size[0] / tw, sym.size[1] / th]).astype(np.float32))
+        sizes.append((tw, th))
+    clusters = cluster_near_duplicates(
+        hashes, feats, groups=sizes,
+        hash_bits=hash_size * hash_size,
+        max_hamming=int(dd.get("max_hamming", 12)),
+        ink_tol=float(dd.get("ink_tol", 0.15)),
+        ink_floor=float(dd.get("ink_floor", 0.02)),
+    )
+    members_of = {cl[0]: cl[1:] for cl in clusters}
+    return sorted(members_of), members_of
+
 def classify_meso_tiles(cfg):
     log = setup_logging(cfg.logging.level)
     if not cfg.symbols.use_vlm_on_meso:
@@ -74,6 +191,7 @@ def classify_meso_tiles(cfg):
     assert tile_index_path.exists(), "tile_index.json missing; run tiler."
     tiles = read_json(tile_index_path)
     meso_tiles = [t for t in tiles if t["scale"]=="meso"]
+    set_crop_cache_mb(cfg.runtime.tile.get("crop_cache_mb", 256))
 
     vec_root = Path(cfg.paths.processed) / "vector_text"
     vec_index = read_json(vec_root / "index.json")
@@ -100,19 +218,22 @@ def classify_meso_tiles(cfg):
     # pick VLM
     vlm_name, vlm_path = _select_vlm(cfg)
     assert vlm_path, "No enabled VLM found (qwen2_vl_2b/qwen2_vl/llava…). Enable one in configs/models.yaml."
+    get_registry(cfg)  # weights load once, on the first tile
+    precision = resolve_precision(cfg)
+    source_model = f"{vlm_name}@{precision}"
 
-    # Load per-page vector labels into memory
-    vec_cache: Dict[str, Dict[int, List[Dict[str,Any]]]] = {}
+    # Load per-page vector labels into memory (grid-indexed)
+    vec_cache: Dict[str, Dict[int, TextIndex]] = {}
     for pdf_name, pages in vec_index.items():
         vec_cache[pdf_name] = {}
         for p in pages:
-            vec_cache[pdf_name][int(p["page"])] = read_json(p["path"])
+            vec_cache[pdf_name][int(p["page"])] = load_page_text_index(p["path"])
 
     # Rank meso tiles by number of labels intersecting
     scored = []
     for t in meso_tiles:
         pdf, page = t["pdf"], int(t["page"])
-        labels_here = _labels_in_tile(vec_cache.get(pdf,{}).get(page,[]), t["bbox"])
+        labels_here = _labels_in_tile(vec_cache.get(pdf,{}).get(page), t["bbox"])
         scored.append((len(labels_here), labels_here, t))
     scored.sort(key=lambda x: x[0], reverse=True)
 
@@ -124,46 +245,112 @@ def classify_meso_tiles(cfg):
     results: List[ComponentCandidate] = []
     out_root = Path(cfg.paths.processed) / "components" / "candidates"
 
-    for i, (nlab, labels_here, t) in enumerate(scored):
-        if i >= budget:
-            break
+    batch_size = int(getattr(cfg.symbols, "batch_size", 1) or 1)
+    bucket_px = int(getattr(cfg.symbols, "batch_bucket_px", 64) or 64)
 
-        # Build prompt strings
-        allowed_str = "\n".join(allowed_ids)
+    # Build prompt strings for every tile within budget
+    allowed_str = "\n".join(allowed_ids)
+    system_str = system_tmpl
+    reps, members_of = _dedup_clusters(scored, cfg)
+    if len(reps) < len(scored):
+        log.info(f"[symbols] dedup: {len(scored)} tiles → {len(reps)} clusters")
+    img_opts = vision_image_opts(cfg)
+    # prefix cache: system + ALLOWED_TYPES go before the image, so their KV is computed once
+    use_prefix = bool(getattr(cfg.symbols, "prefix_cache", False)) and batch_size <= 1
+    head, tail_tmpl = _split_user_tmpl(user_tmpl, allowed_str)
+    jobs = []
+    for i in reps[:budget]:
+        nlab, labels_here, t = scored[i]
         labels_str = ", ".join(labels_here[:30]) if labels_here else "(none)"
-        system_str = system_tmpl
         user_str = user_tmpl.replace("{ALLOWED_TYPES}", allowed_str).replace("{NEARBY_LABELS}", labels_str)
+        user_msg = (head, tail_tmpl.replace("{NEARBY_LABELS}", labels_str)) if use_prefix else user_str
+        img, content_bbox = _prep_tile(t, img_opts)
+        jobs.append((labels_here, t, user_str, img, content_bbox, user_msg))
+    if jobs:
+        px_in = sum((j[1]["bbox"][2]-j[1]["bbox"][0]) * (j[1]["bbox"][3]-j[1]["bbox"][1]) for j in jobs)
+        px_out = sum(j[3].size[0] * j[3].size[1] for j in jobs)
+        log.info(f"[symbols] image budget: {px_in/1e6:.1f} → {px_out/1e6:.1f} Mpx over {len(jobs)} tiles")
 
-        raw_json = _gen_with_vlm(
-            local_path=vlm_path,
-            system_str=system_str,
-            user_str=user_str,
-            image_path=t["path"],
-            max_new_tokens=int(cfg.symbols.max_new_tokens),
-        )
+    # Answer unchanged tiles from the shared inference cache
+    cache = get_inference_cache(cfg)
+    max_new = int(cfg.symbols.max_new_tokens)
+    json_opts = json_decoding_opts(cfg)
+    raw_by_job: List[str] = ["{}"] * len(jobs)
+    keys: List[str | None] = [None] * len(jobs)
+    todo: List[int] = []
+    variant = "+".join(v for v in (json_variant(json_opts), "prefix" if use_prefix else "") if v)
+    for k, (_, t, user_str, img, _, _) in enumerate(jobs):
+        if cache.enabled:
+            digest = image_digest(img)
+            keys[k] = cache.make_key(model_id(vlm_path), precision, system_str + "\n" + user_str, digest, max_new,
+                                     variant=variant)
+            hit = cache.get(keys[k])
+            if hit is not None:
+                raw_by_job[k] = hit["value"]
+                continue
+        todo.append(k)
 
-        # parse result json
-        try:
-            obj = json.loads(raw_json)
-        except Exception:
-            obj = {"type": None, "confidence": 0.0, "ports_expected": [], "notes": "parse_error", "alternatives": []}
+    # Generate the misses in size-bucketed batches (sharded over the inference pool); results keep job order
+    batches = [[todo[i] for i in sub] for sub in _size_batches([jobs[k][3].size for k in todo], batch_size, bucket_px)]
+    gen_jobs = [{
+        "local_path": vlm_path, "system_str": system_str, "precision": precision,
+        "max_new_tokens": max_new, "json_opts": json_opts, "prefix": use_prefix,
+        "user_msgs": [jobs[k][5] for k in batch], "images": [jobs[k][3] for k in batch],
+    } for batch in batches]
+    pkv = {"prefills": 0, "prefix_len": 0, "reused": 0, "fallbacks": 0}
+    for batch, (outs, pstats) in zip(batches, run_inference_jobs(cfg, _symbol_job, gen_jobs)):
+        for k, raw in zip(batch, outs):
+            raw_by_job[k] = raw
+            if keys[k]:
+                cache.put(keys[k], raw)
+        for name in ("prefills", "reused", "fallbacks"):
+            pkv[name] += pstats.get(name, 0)
+        pkv["prefix_len"] = max(pkv["prefix_len"], pstats.get("prefix_len", 0))
+    if batch_size > 1:
+        log.info(f"[symbols] batched {len(todo)} tiles (batch_size={batch_size})")
+    if use_prefix and todo:
+        # one prefill per process that ran jobs (pool workers each build their own)
+        log.info(f"[symbols] prefix KV: {pkv['prefix_len']} tokens prefilled {pkv['prefills']}x, "
+                 f"reused {pkv['reused']}x, {pkv['fallbacks']} fallbacks")
+    if cache.enabled:
+        log.info(f"[symbols] inference cache: {cache.stats_str()}")
+    if todo:
+        log.info(f"[symbols] throughput: {gen_stats_str()}")
 
+    def _emit(t, obj, labels_here, content_bbox=None, copied_from=None):
+        if copied_from is None:
+            materialize_tile(t)   # the model saw this tile; keep its PNG for review
         cand = ComponentCandidate(
             id=f"{t['pdf']}:{t['page']}:meso:r{t['row']:03d}c{t['col']:03d}",
             pdf=t["pdf"], page=int(t["page"]),
-            tile_path=t["path"], tile_bbox=t["bbox"],
+            tile_path=t["path"], tile_bbox=t["bbox"], content_bbox=content_bbox,
             type=obj.get("type"), confidence=float(obj.get("confidence") or 0.0),
             ports_expected=obj.get("ports_expected") or [],
             notes=obj.get("notes"),
             alternatives=[CandidateAlt(**a) for a in obj.get("alternatives",[]) if isinstance(a, dict)],
             labels_context=labels_here,
-            source_model=vlm_name,
+            source_model=source_model,
+            copied_from=copied_from,
         )
-
         out_path = out_root / t["pdf"] / f"page-{t['page']}" / f"meso_r{t['row']:03d}_c{t['col']:03d}.json"
         ensure_dir(out_path.parent)
         write_json(json.loads(cand.model_dump_json()), out_path)
         results.append(cand)
+        return cand
+
+    for i, (labels_here, t, _, _, content_bbox, _), raw_json in zip(reps, jobs, raw_by_job):
+        # parse result json
+        try:
+            obj = json.loads(raw_json)
+        except Exception:
+            obj = {"type": None, "confidence": 0.0, "ports_expected": [], "notes": "parse_error", "alternatives": []}
+
+        rep = _emit(t, obj, labels_here, content_bbox)
+        # near-identical copies inherit the representative's answer
+        for j in members_of.get(i, []):
+            _, m_labels, m_t = scored[j]
+            _, m_box = _prep_tile(m_t, img_opts)
+            _emit(m_t, obj, m_labels, m_box, copied_from=rep.id)
 
     # Write index
     idx = [{
@@ -3,6 +3,9 @@ from pathlib import Path
 from typing import Dict, Any, List
 from src.utils.io import read_json, write_json, ensure_dir
 from src.utils.logging import setup_logging
+from src.vision.cache import get_inference_cache
+from src.vision.pool import run_inference_jobs
+from src.ingest.tiler import materialize_tile
 
 # optional VLM helper (Qwen2-VL)
 def _try_qwen_table_json(cfg, img_path: str, max_new_tokens: int = 256):
@@ -12,6 +15,10 @@ def _try_qwen_table_json(cfg, img_path: str, max_new_tokens: int = 256):
     except Exception:
         return None
 
+def _table_job(cfg, img_path: str):
+    # inference-pool job: one tile crop → rows (or None)
+    return _try_qwen_table_json(cfg, img_path, max_new_tokens=getattr(cfg.tables, "max_new_tokens", 256))
+
 def run_table_reader(
     cfg,
     pdf_stem: str,
@@ -40,13 +47,19 @@ def run_table_reader(
     cands.sort(key=lambda r: (r.get("n_vec", 0) + r.get("n_vlm", 0)), reverse=True)
     cands = cands[:top_k_tiles]
 
-    tables: List[Dict[str, Any]] = []
+    crops = []
     for r in cands:
         rec = read_json(r["tile_json"])
         img_path = rec.get("tile_path")
+        if img_path and not Path(img_path).exists() and rec.get("page_png"):
+            # virtual tile: crop it from the page raster now
+            img_path = materialize_tile({"path": img_path, "page_png": rec["page_png"], "bbox": rec["tile_bbox"]})
         if not img_path or not Path(img_path).exists():
             continue
-        rows = _try_qwen_table_json(cfg, img_path, max_new_tokens=getattr(cfg.tables, "max_new_tokens", 256))
+        crops.append((r, img_path))
+
+    tables: List[Dict[str, Any]] = []
+    for (r, img_path), rows in zip(crops, run_inference_jobs(cfg, _table_job, [p for _, p in crops])):
         if not rows or not isinstance(rows, list):
             continue
         # simple validity check
@@ -63,4 +76,7 @@ def run_table_reader(
     out_path = out_dir / f"page-{page}.json"
     write_json({"pdf": pdf_stem, "page": page, "count": len(tables), "tables": tables}, out_path)
     log.info(f"[table_reader] found {len(tables)} tables → {out_path}")
+    cache = get_inference_cache(cfg)
+    if cache.enabled:
+        log.info(f"[table_reader] inference cache: {cache.stats_str()}")
     return {"count": len(tables), "path": str(out_path)}
@@ -0,0 +1,30 @@
+# tests/unit/conftest.py
+# reference implementations: modules as they stood in the repository's first commit
+import subprocess
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+
+def _git(*args) -> str:
+    return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+@pytest.fixture(scope="session")
+def baseline():
+    """baseline("src/cv/bbox_merge.py") -> that module as first committed (skips without the git history)."""
+    mods = {}
+
+    def load(rel: str):
+        if rel not in mods:
+            try:
+                rev = _git("rev-list", "--max-parents=0", "HEAD").split()[-1]
+                src = _git("show", f"{rev}:{rel}")
+            except (OSError, IndexError, subprocess.CalledProcessError):
+                pytest.skip(f"baseline {rel} needs the repository's git history")
+            mod = types.ModuleType(f"baseline_{Path(rel).stem}")
+            exec(compile(src, f"{rev[:7]}:{rel}", "exec"), mod.__dict__)
+            mods[rel] = mod
+        return mods[rel]
+    return load
@@ -0,0 +1,68 @@
+# tests/unit/test_bands.py
+# banded raster engine: strips cut the page, not the wires
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("skimage")
+pytest.importorskip("loguru")
+from src.geometry import wires
+from src.geometry.wires import _bands, _clip_rows, _merge_colinear_grid
+from src.utils import raster_cache as rc
+
+def _cfg(enable):
+    return SimpleNamespace(
+        runtime=SimpleNamespace(workers=1),
+        geometry=SimpleNamespace(
+            raster_engine="hough", skeletonize=True,
+            binarize=SimpleNamespace(blocksize=41, C=7),
+            hough=SimpleNamespace(threshold=30, min_line_length=40, max_line_gap=8),
+            merge_lines=SimpleNamespace(angle_deg_eps=3.0, endpoint_px_eps=6),
+            bands={"enable": enable, "height_px": 256, "overlap_px": 64, "workers": 1}))
+
+def test_bands_cover_every_row_once():
+    bands = _bands(1000, 256, 64)
+    assert [(c0, c1) for _, _, c0, c1 in bands] == [(0, 256), (256, 512), (512, 768), (768, 1000)]
+    assert bands[0][:2] == (0, 320) and bands[1][:2] == (192, 576) and bands[-1][:2] == (704, 1000)
+    assert _bands(0, 256, 64) == []
+
+def test_clip_rows_shares_the_cut_point():
+    s = (10, 100, 70, 400)                   # crosses the core boundary at y=256
+    top, bottom = _clip_rows(s, 0, 256), _clip_rows(s, 256, 512)
+    assert top == (10, 100, 41, 256) and bottom == (41, 256, 70, 400)
+    assert _clip_rows((70, 400, 10, 100), 0, 256) == top   # drawing direction does not matter
+    assert _clip_rows(s, 512, 768) is None
+
+def test_clip_rows_horizontal_owned_by_one_band():
+    h = (0, 256, 300, 256)                   # exactly on a core boundary
+    assert _clip_rows(h, 0, 256) is None and _clip_rows(h, 256, 512) == h
+
+def _long(polys, min_len=200):
+    out = []
+    for p in polys:
+        (x1, y1), (x2, y2) = p["polyline"][0], p["polyline"][-1]
+        if math.hypot(x2 - x1, y2 - y1) >= min_len:
+            out.append(tuple(sorted([(x1, y1), (x2, y2)])))
+    return sorted(out)
+
+def test_banded_run_matches_single_band(tmp_path, monkeypatch):
+    page = np.full((1200, 500), 255, np.uint8)
+    cv2.line(page, (100, 50), (100, 1150), 0, 3)     # vertical, crosses every band boundary
+    cv2.line(page, (200, 60), (420, 1140), 0, 3)     # diagonal, crosses every band boundary
+    cv2.line(page, (20, 512), (480, 512), 0, 3)      # horizontal on a core boundary
+    png = tmp_path / "raw" / "png" / "doc" / "page-1.png"
+    gray = rc.raster_paths(png)["gray"]
+    gray.parent.mkdir(parents=True)
+    rc._save(page, gray)
+    monkeypatch.setattr(wires, "_geometry_cfg", lambda cfg: cfg)   # SimpleNamespace needs no resolving
+
+    single, _ = wires._raster_segments(png, _cfg(False))
+    banded, _ = wires._raster_segments(png, _cfg(True))
+    assert banded != single                          # the page really was cut into strips
+    want, got = _long(_merge_colinear_grid(single, _cfg(False))), _long(_merge_colinear_grid(banded, _cfg(True)))
+    assert len(want) == len(got) == 3
+    for a, b in zip(want, got):
+        assert max(abs(u - v) for pa, pb in zip(a, b) for u, v in zip(pa, pb)) <= 3
@@ -0,0 +1,47 @@
+# tests/unit/test_box_cluster.py
+# sort-and-sweep clustering / greedy merge: baseline equivalence and hand-picked edges
+import random
+
+import pytest
+
+from src.utils.box_cluster import cluster_boxes, merge_overlaps_greedy
+
+def _random_boxes(seed, n=150, span=1000, max_side=120):
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        x, y = rnd.randrange(0, span), rnd.randrange(0, span)
+        out.append((x, y, x + rnd.randrange(1, max_side), y + rnd.randrange(1, max_side)))
+    return out
+
+def test_matches_baseline(baseline):
+    pytest.importorskip("loguru")   # merge_candidates pulls in the logging setup
+    boxes = _random_boxes(0)
+    legacy = baseline("src/post/merge_candidates.py").cluster_candidates
+    assert cluster_boxes(boxes, 0.3, 8) == legacy([{"tile_bbox": b} for b in boxes], 0.3, 8)
+    assert merge_overlaps_greedy(boxes, 0.2) == baseline("src/cv/bbox_merge.py").merge_overlaps(boxes, 0.2)
+
+def test_empty_and_single():
+    assert cluster_boxes([], 0.3, 8) == []
+    assert cluster_boxes([(0, 0, 10, 10)], 0.3, 8) == [[0]]
+    assert merge_overlaps_greedy([]) == []
+    assert merge_overlaps_greedy([(0, 0, 10, 10)]) == [(0, 0, 10, 10)]
+
+def test_touching_boxes():
+    edge = [(0, 0, 10, 10), (10, 0, 20, 10)]      # shared edge: gap 0, IoU 0
+    corner = [(0, 0, 10, 10), (10, 10, 20, 20)]   # shared corner only
+    apart = [(0, 0, 10, 10), (11, 0, 20, 10)]     # 1 px gap
+    assert cluster_boxes(edge, 0.3, 0) == [[0, 1]]
+    assert cluster_boxes(corner, 0.3, 0) == [[0, 1]]
+    assert cluster_boxes(apart, 0.3, 0) == [[0], [1]]
+    assert cluster_boxes(apart, 0.3, 1) == [[0, 1]]
+    assert cluster_boxes(edge, 0.3, -1) == [[0], [1]]   # negative touch: overlap required
+    # touching is not overlapping: nothing to merge at any positive IoU threshold
+    assert merge_overlaps_greedy(edge, 0.05) == [(10, 0, 20, 10), (0, 0, 10, 10)]
+
+def test_merge_chain_and_zero_threshold():
+    # (0..10) is below the threshold against (8..18) alone, not against it grown by (4..14)
+    boxes = [(0, 0, 10, 10), (4, 0, 14, 10), (8, 0, 18, 10)]
+    assert merge_overlaps_greedy(boxes, 0.3) == [(0, 0, 18, 10)]
+    assert merge_overlaps_greedy([(0, 0, 1, 1), (50, 50, 60, 60)], 0.0) == [(0, 0, 60, 60)]
+    assert cluster_boxes([(0, 0, 1, 1), (50, 50, 60, 60)], 0.0, 0) == [[0, 1]]
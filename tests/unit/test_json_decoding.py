@@ -0,0 +1,57 @@
+# tests/unit/test_json_decoding.py
+import json
+
+import pytest
+
+from src.vision.json_decoding import JsonScanner
+
+VALID = [
+    '{}',
+    '{"type": "breaker", "confidence": 0.91, "ports_expected": ["L1", "L2"], "notes": null}',
+    '{"a": [1, -2.5, 3e-4, true, false, null, {"b": []}], "c": "x\\"y\\\\z\\u00e9"}',
+    '{ "rows" : [ [ "c1" , "c2" ] , [ ] ] }',
+]
+
+@pytest.mark.parametrize("text", VALID)
+def test_valid_objects_close(text):
+    json.loads(text)   # the fixtures themselves are JSON
+    sc = JsonScanner()
+    assert sc.feed(text)
+    assert sc.done
+
+@pytest.mark.parametrize("text", VALID)
+def test_every_prefix_is_accepted_and_open(text):
+    for k in range(len(text)):
+        sc = JsonScanner()
+        assert sc.feed(text[:k]), text[:k]
+        assert not sc.done or k == len(text)
+
+@pytest.mark.parametrize("text", [
+    'x{}',                  # preamble (strict)
+    '{a: 1}',               # unquoted key
+    '{"a" 1}',              # missing colon
+    '{"a": tru3}',          # bad literal
+    '{"a": 1,, "b": 2}',    # double comma
+    '{"a": [1, 2}',         # mismatched close
+    '{"a": "line\nbreak"}', # raw newline in a string
+    '{"a": "\\q"}',         # bad escape
+    '{"a": "\\u12g4"}',     # bad unicode escape
+    '{"a": 01}',            # leading zero
+    '{"a": 1.}',            # dangling decimal point
+])
+def test_invalid_prefixes_rejected(text):
+    assert not JsonScanner().feed(text)
+
+def test_lenient_skips_preamble_and_ignores_trailer():
+    sc = JsonScanner(lenient=True)
+    assert sc.feed('```json\n{"labels": ["TB1-4", "100A"]}')
+    assert sc.done
+    assert sc.feed("\n```\nanything after the object")
+
+def test_copy_is_independent():
+    sc = JsonScanner()
+    assert sc.feed('{"a": [1')
+    c = sc.copy()
+    assert c.feed("]}") and c.done
+    assert not sc.done
+    assert not sc.feed("}")   # the original is still inside the list
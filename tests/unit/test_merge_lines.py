@@ -0,0 +1,45 @@
+# tests/unit/test_merge_lines.py
+# colinear merger semantics on small fixed inputs
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("skimage")
+pytest.importorskip("loguru")
+from src.geometry.wires import _merge_colinear_grid
+
+CFG = SimpleNamespace(geometry=SimpleNamespace(merge_lines=SimpleNamespace(angle_deg_eps=3.0, endpoint_px_eps=6)))
+
+def _spans(polys):
+    return [set(p["polyline"]) for p in polys]
+
+def test_broken_wire_becomes_its_full_span():
+    segs = [(100, 50, 190, 50), (0, 50, 96, 51), (194, 49, 300, 49)]
+    assert _spans(_merge_colinear_grid(segs, CFG)) == [{(0, 50), (300, 49)}]
+
+def test_corner_and_parallel_wires_stay_apart():
+    segs = [(0, 0, 100, 0),      # horizontal
+            (100, 0, 100, 80),   # shares the corner, perpendicular
+            (0, 20, 100, 20)]    # parallel, 20 px below
+    assert len(_merge_colinear_grid(segs, CFG)) == 3
+
+def test_stepped_chain_does_not_drift_off_the_seed_line():
+    # each piece is 4 px below the previous one: neighbours are within endpoint_px_eps,
+    # but the third piece is 8 px off the seed's line
+    segs = [(0, 0, 100, 0), (104, 4, 200, 4), (204, 8, 300, 8)]
+    assert _spans(_merge_colinear_grid(segs, CFG)) == [{(0, 0), (200, 4)}, {(204, 8), (300, 8)}]
+
+def test_bent_chain_is_compared_with_the_seed_angle():
+    # 0°, 2°, 4°: each pair of neighbours is within 3°, the third piece is 4° off the seed
+    segs = [(0, 0, 100, 0), (100, 0, 200, 3), (200, 3, 300, 10)]
+    polys = _merge_colinear_grid(segs, CFG)
+    assert _spans(polys) == [{(0, 0), (200, 3)}, {(200, 3), (300, 10)}]
+
+def test_reversed_stroke_merges():
+    # same wire drawn right-to-left, and a piece sloping up by half a degree (angle wraps at pi)
+    segs = [(0, 0, 100, 0), (200, 0, 104, 0), (204, 1, 300, 0)]
+    assert _spans(_merge_colinear_grid(segs, CFG)) == [{(0, 0), (300, 0)}]
+
+def test_empty():
+    assert _merge_colinear_grid([], CFG) == []
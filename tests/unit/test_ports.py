@@ -0,0 +1,33 @@
+# tests/unit/test_ports.py
+# grid-bucketed junction clustering: baseline equivalence and cell-boundary edges
+import random
+
+import pytest
+
+pytest.importorskip("loguru")   # src.geometry.ports pulls in the logging setup
+from src.geometry.ports import _cluster_points, endpoint_key
+
+def test_matches_baseline(baseline):
+    rnd = random.Random(0)
+    pts = [(rnd.randrange(-400, 400), rnd.randrange(-400, 400)) for _ in range(300)]
+    legacy = baseline("src/geometry/ports.py")._cluster_points
+    for radius in (0, 1, 6, 25):
+        assert _cluster_points(pts, radius) == legacy(pts, radius)
+
+def test_empty():
+    assert _cluster_points([], 6) == []
+
+def test_chains_link_through_the_middle_point():
+    # L-inf: (0,0)-(6,6) at radius 6 links, and the chain pulls (12,0) in
+    assert _cluster_points([(0, 0), (6, 6), (12, 0), (40, 40)], 6) == [[(0, 0), (6, 6), (12, 0)], [(40, 40)]]
+
+def test_points_on_cell_boundaries():
+    # cells are `radius` wide: 0, 6, 12 sit on cell edges, -1 / 5 straddle the origin's
+    assert _cluster_points([(0, 0), (6, 0)], 6) == [[(0, 0), (6, 0)]]       # exactly radius apart
+    assert _cluster_points([(0, 0), (7, 0)], 6) == [[(0, 0)], [(7, 0)]]
+    assert _cluster_points([(-1, -1), (5, 5)], 6) == [[(-1, -1), (5, 5)]]
+    assert _cluster_points([(-6, 0), (6, 0)], 6) == [[(-6, 0)], [(6, 0)]]    # two cells apart, 12 > 6
+    assert _cluster_points([(0, 0), (0, 0), (1, 0)], 0) == [[(0, 0), (0, 0)], [(1, 0)]]   # radius 0: duplicates only
+
+def test_endpoint_key_truncates():
+    assert endpoint_key(12.9, -3.2) == "12,-3"
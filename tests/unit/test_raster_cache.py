@@ -0,0 +1,91 @@
+# tests/unit/test_raster_cache.py
+import os
+
+import numpy as np
+import pytest
+
+from src.utils import raster_cache as rc
+
+def _page(tmp_path, name="page-1.png"):
+    png = tmp_path / "raw" / "png" / "doc" / name
+    png.parent.mkdir(parents=True)
+    png.write_bytes(b"")   # only its path and mtime matter until PIL is involved
+    return png
+
+def test_raster_paths_layout(tmp_path):
+    p = rc.raster_paths(tmp_path / "raw" / "png" / "doc" / "page-3.png")
+    assert p["gray"] == tmp_path / "raw" / "raster" / "doc" / "page-3.gray.npy"
+    assert {k: v.name for k, v in p.items()} == {"gray": "page-3.gray.npy", "rgb": "page-3.rgb.npy",
+                                                 "bits": "page-3.bits.npy"}
+
+def test_save_then_memmap_round_trip(tmp_path):
+    png = _page(tmp_path)
+    paths = rc.raster_paths(png)
+    paths["gray"].parent.mkdir(parents=True)
+    gray = np.random.default_rng(0).integers(0, 256, (37, 53), dtype=np.uint8)
+    rc._save(gray, paths["gray"])
+    got = rc.page_gray(png)
+    assert isinstance(got, np.memmap) and not got.flags.writeable
+    assert np.array_equal(got, gray)
+    assert rc.page_rgb(png) is None   # gray mode writes no RGB array
+    assert not paths["gray"].with_name(paths["gray"].name + ".tmp").exists()
+
+def test_rebuilt_array_is_reopened(tmp_path):
+    png = _page(tmp_path)
+    path = rc.raster_paths(png)["gray"]
+    path.parent.mkdir(parents=True)
+    rc._save(np.zeros((4, 4), np.uint8), path)
+    assert rc.page_gray(png).max() == 0
+    rc._save(np.full((4, 4), 7, np.uint8), path)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert rc.page_gray(png).max() == 7
+
+@pytest.mark.parametrize("width", [1, 7, 8, 13, 64, 101])
+def test_bilevel_window_matches_unpacked(width):
+    ink = np.random.default_rng(width).random((29, width)) < 0.4
+    bl = rc.Bilevel(np.packbits(ink, axis=1), width)
+    assert bl.shape == (29, width)
+    for x1, y1, x2, y2 in [(0, 0, width, 29), (width // 3, 5, width, 17), (min(9, width - 1), 0, width + 50, 3)]:
+        win = bl.window(x1, y1, x2, y2)
+        assert win.dtype == np.uint8
+        assert np.array_equal(win, ink[y1:y2, x1:min(x2, width)].astype(np.uint8))
+
+@pytest.mark.parametrize("mode", ["gray", "rgb", "bilevel"])
+def test_build_page_raster_round_trip(tmp_path, mode):
+    Image = pytest.importorskip("PIL.Image")
+    png = tmp_path / "raw" / "png" / "doc" / "page-1.png"
+    png.parent.mkdir(parents=True)
+    rgb = np.random.default_rng(1).integers(0, 256, (40, 61, 3), dtype=np.uint8)
+    Image.fromarray(rgb).save(png)
+    rec = rc.build_page_raster(str(png), mode=mode, threshold=160)
+    assert rec["mode"] == mode and rec["shape"] == [40, 61]
+    gray = np.asarray(Image.fromarray(rgb).convert("L"))
+    if mode == "bilevel":
+        bl = rc.page_bits(png)
+        assert np.array_equal(bl.window(0, 0, 61, 40), (gray < 160).astype(np.uint8))
+    else:
+        assert np.array_equal(rc.page_gray(png), gray)
+        assert (rc.page_rgb(png) is not None) == (mode == "rgb")
+        if mode == "rgb":
+            assert np.array_equal(rc.page_rgb(png), rgb)
+    # fresh arrays are not rewritten
+    before = {k: os.stat(v).st_mtime_ns for k, v in rec.items() if k in ("gray", "rgb", "bits")}
+    rc.build_page_raster(str(png), mode=mode, threshold=160)
+    assert before == {k: os.stat(v).st_mtime_ns for k, v in rec.items() if k in ("gray", "rgb", "bits")}
+
+def test_raster_opts_default_rgb():
+    # colour is the default: gray / bilevel renders are opt-in (VLM crops keep phase colours)
+    class Cfg:
+        runtime = type("R", (), {"raster_cache": {}})()
+    assert rc.raster_opts(Cfg())["mode"] == "rgb"
+    Cfg.runtime.raster_cache = {"mode": "nonsense"}
+    assert rc.raster_opts(Cfg())["mode"] == "rgb"
+    Cfg.runtime.raster_cache = {"mode": "gray"}
+    assert rc.raster_opts(Cfg())["mode"] == "gray"
+
+def test_base_config_default_rgb():
+    import yaml
+    from pathlib import Path
+    base = yaml.safe_load((Path(__file__).resolve().parents[2] / "configs" / "base.yaml").read_text(encoding="utf-8"))
+    assert base["runtime"]["raster_cache"]["mode"] == "rgb"
@@ -0,0 +1,34 @@
+# tests/unit/test_registry.py
+# resident-size accounting and LRU eviction under the RAM budget
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("loguru")
+from src.vision import registry as reg
+
+def _int8_model(n=512):
+    return reg._quantize_dynamic_int8(torch.nn.Sequential(torch.nn.Linear(n, n), torch.nn.ReLU()))
+
+def test_int8_weights_are_counted():
+    m = _int8_model()
+    assert list(m.parameters()) == []            # packed away by quantize_dynamic
+    assert reg._model_nbytes(m) >= 512 * 512     # one byte per int8 weight, plus the bias
+
+def test_tied_weights_counted_once():
+    lin = torch.nn.Linear(64, 64, bias=False)
+    m = torch.nn.Sequential(lin, torch.nn.ReLU(), lin)
+    assert reg._model_nbytes(m) == 64 * 64 * 4
+
+def test_int8_handles_are_evicted_under_budget(monkeypatch):
+    def load(self, key):
+        m = _int8_model()
+        return reg.ModelHandle(key=key, processor=None, model=m, nbytes=reg._model_nbytes(m))
+    monkeypatch.setattr(reg.ModelRegistry, "_load", load)
+
+    one = reg._model_nbytes(_int8_model())
+    r = reg.ModelRegistry(ram_budget_gb=1.5 * one / (1 << 30))
+    a = r.get("model-a", dtype="int8")
+    r.get("model-b", dtype="int8")
+    assert [k[1] for k in r._handles] == ["model-b"]   # a was least recently used
+    assert r.resident_bytes() == one
+    assert r.get("model-a", dtype="int8") is not a and r.loads == 3
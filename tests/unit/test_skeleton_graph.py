@@ -0,0 +1,73 @@
+# tests/unit/test_skeleton_graph.py
+# trace_skeleton on hand-drawn 1 px skeletons
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+from src.geometry.skeleton_graph import trace_skeleton
+
+OPTS = {"min_branch_px": 5.0, "dp_epsilon_px": 1.0}
+
+def _canvas(h=40, w=40):
+    return np.zeros((h, w), dtype=np.uint8)
+
+def _ends(polys):
+    return sorted(p["polyline"][k] for p in polys for k in (0, -1))
+
+def test_plus_has_one_degree_4_junction():
+    sk = _canvas()
+    sk[20, 5:36] = 255
+    sk[5:36, 20] = 255
+    out = trace_skeleton(sk, OPTS)
+    assert out["junctions"] == [{"xy": (20, 20), "degree": 4}]
+    assert sorted(out["endpoints"]) == [(5, 20), (20, 5), (20, 35), (35, 20)]
+    assert len(out["polylines"]) == 4
+    assert all((20, 20) in (p["polyline"][0], p["polyline"][-1]) for p in out["polylines"])
+
+def test_t_has_one_degree_3_junction():
+    sk = _canvas()
+    sk[10, 5:36] = 255
+    sk[10:36, 20] = 255
+    out = trace_skeleton(sk, OPTS)
+    assert out["junctions"] == [{"xy": (20, 10), "degree": 3}]
+    assert sorted(out["endpoints"]) == [(5, 10), (20, 35), (35, 10)]
+
+def test_l_is_one_open_polyline_through_the_corner():
+    sk = _canvas()
+    sk[30, 10:31] = 255
+    sk[10:31, 10] = 255
+    out = trace_skeleton(sk, OPTS)
+    assert out["junctions"] == []
+    assert sorted(out["endpoints"]) == [(10, 10), (30, 30)]
+    (poly,) = out["polylines"]
+    assert (10, 30) in poly["polyline"] and not poly.get("closed")
+
+def test_closed_loop_has_no_free_ends():
+    sk = _canvas()
+    sk[10, 10:31] = 255
+    sk[30, 10:31] = 255
+    sk[10:31, 10] = 255
+    sk[10:31, 30] = 255
+    out = trace_skeleton(sk, OPTS)
+    assert out["endpoints"] == [] and out["junctions"] == []
+    (poly,) = out["polylines"]
+    assert poly["closed"] is True
+    pl = poly["polyline"]
+    assert pl[0] == pl[-1]
+    assert set(pl) == {(10, 10), (30, 10), (30, 30), (10, 30)}
+
+def test_small_loop_is_dropped_as_a_glyph():
+    sk = _canvas()
+    sk[10, 10:12] = 255
+    sk[11, 10:12] = 255   # 2x2 block: every pixel degree 2 after diagonal pruning, length 4 < 5
+    assert trace_skeleton(sk, OPTS)["polylines"] == []
+
+def test_diagonal_staircase_reads_as_one_wire():
+    sk = _canvas()
+    for k in range(15):
+        sk[5 + k, 5 + k] = 255
+        sk[5 + k, 6 + k] = 255   # each step: right then down, orthogonal path beside every diagonal
+    out = trace_skeleton(sk, OPTS)
+    assert out["junctions"] == []
+    assert sorted(out["endpoints"]) == [(5, 5), (20, 19)]
+    assert len(out["polylines"]) == 1
@@ -0,0 +1,56 @@
+# tests/unit/test_spatial.py
+# TextIndex queries: baseline equivalence and grid-cell edges
+import random
+
+import pytest
+
+from src.utils.io import write_json
+from src.utils.spatial import TextIndex, load_page_text_index
+
+def test_query_rect_matches_baseline_scan(baseline):
+    pytest.importorskip("svgelements")   # svg_parse_text imports it at module level
+    intersect = baseline("src/parsers/svg_parse_text.py").intersect
+    rnd = random.Random(0)
+    items = []
+    for k in range(300):
+        x, y = rnd.uniform(-200, 5000), rnd.uniform(-200, 5000)
+        items.append({"text": f"T{k}", "bbox": [x, y, x + rnd.uniform(0, 600), y + rnd.uniform(0, 80)]})
+    ix = TextIndex(items, cell=256.0)
+    for _ in range(50):
+        x, y = rnd.uniform(-500, 5500), rnd.uniform(-500, 5500)
+        rect = [x, y, x + rnd.uniform(0, 1500), y + rnd.uniform(0, 1500)]
+        assert ix.query_rect(rect, 1.0) == [i for i, it in enumerate(items) if intersect(it["bbox"], rect, 1.0)]
+
+def test_empty_index():
+    ix = TextIndex([])
+    assert ix.query_rect([0, 0, 100, 100]) == []
+    assert ix.query_radius((0, 0), 50) == []
+
+def test_touching_rects_need_min_overlap():
+    ix = TextIndex([{"text": "K1", "bbox": [16, 16, 32, 32]}], cell=16)   # on cell boundaries
+    assert ix.query_rect([32, 32, 48, 48], 0.0) == [0]    # shares only the corner
+    assert ix.query_rect([32, 32, 48, 48], 1.0) == []
+    assert ix.query_rect([0, 0, 16, 16], 0.0) == [0]      # cell below / left of the item
+    assert ix.query_rect([31, 0, 40, 17], 1.0) == [0]     # exactly 1 px of overlap on both axes
+
+def test_radius_on_cell_boundaries():
+    ix = TextIndex([{"text": "Q1", "bbox": [16, 16, 32, 32]},           # center (24, 24)
+                    {"text": "Q2", "bbox": [-32, -32, 0, 0]}], cell=16)  # center (-16, -16), negative cells
+    assert ix.query_radius((32, 24), 8) == [0]            # center exactly r away, in the next cell
+    assert ix.query_radius((32, 24), 7.9) == []
+    assert ix.query_radius((0, 0), 16) == [1]
+    assert ix.query_radius((4, 4), 20) == [0, 1]
+
+def test_texts_in_query_order():
+    items = [{"text": "Q1", "bbox": [0, 0, 10, 10]}, {"text": "K2", "bbox": [300, 0, 310, 10]},
+             {"text": "TB1-4", "bbox": [5, 5, 20, 12]}]
+    ix = TextIndex(items, cell=16)
+    assert ix.texts(ix.query_rect([0, 0, 30, 30])) == ["Q1", "TB1-4"]
+
+def test_load_page_text_index(tmp_path):
+    assert len(load_page_text_index(tmp_path / "missing.json")) == 0
+    p = tmp_path / "page-1.json"
+    write_json([{"text": "L1", "bbox": [0, 0, 10, 10]}], p)
+    ix = load_page_text_index(p)
+    assert ix.texts(ix.query_radius((5, 5), 1)) == ["L1"]
+    assert load_page_text_index(p) is ix   # memoized on (path, mtime)
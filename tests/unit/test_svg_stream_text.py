@@ -0,0 +1,37 @@
+# tests/unit/test_svg_stream_text.py
+# streaming SVG text extractor: output and damaged files
+import sys
+
+import pytest
+
+from src.parsers.svg_stream_text import parse_svg_text_stream
+
+SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="200" height="100" viewBox="0 0 400 200">'
+       '<defs><text x="0" y="0">HIDDEN</text></defs>'
+       '<g transform="translate(10,20)"><text x="0" y="10" font-size="10">K1</text></g>'
+       '<text x="100" y="50" font-size="20"><tspan>Q2</tspan></text>'
+       '</svg>')
+
+@pytest.fixture
+def stdlib_parser(monkeypatch):
+    monkeypatch.setitem(sys.modules, "lxml", None)   # import lxml → ImportError: ElementTree iterparse
+
+def test_text_in_root_user_space(tmp_path, stdlib_parser):
+    p = tmp_path / "page-1.svg"
+    p.write_text(SVG, encoding="utf-8")
+    items = parse_svg_text_stream(str(p))
+    assert [it["text"] for it in items] == ["K1", "Q2"]
+    assert items[0]["bbox"] == [5.0, 11.0, 10.5, 16.0]   # viewBox halves everything
+
+def test_truncated_svg_returns_nothing(tmp_path, stdlib_parser):
+    p = tmp_path / "page-1.svg"
+    p.write_text(SVG[: SVG.index("<tspan>") + 3], encoding="utf-8")
+    assert parse_svg_text_stream(str(p)) == []
+
+def test_not_xml_returns_nothing(tmp_path, stdlib_parser):
+    p = tmp_path / "page-1.svg"
+    p.write_bytes(b"\x00\x01 not an svg")
+    assert parse_svg_text_stream(str(p)) == []
+
+def test_missing_file(tmp_path):
+    assert parse_svg_text_stream(str(tmp_path / "nope.svg")) == []
@@ -0,0 +1,7 @@
+# tests/unit/test_vector_wires.py
+from src.geometry.vector_wires import canonical_seg
+
+def test_canonical_seg_ignores_drawing_direction():
+    assert canonical_seg(10, 5, 0, 5) == canonical_seg(0, 5, 10, 5) == (0, 5, 10, 5)
+    assert canonical_seg(3, 9, 3, 1) == (3, 1, 3, 9)
+    assert canonical_seg(7, 7, 7, 7) == (7, 7, 7, 7)
@@ -0,0 +1,44 @@
+# tests/unit/test_wire_mask.py
+# text / title-block mask boxes in PNG pixels, whatever space the text was recorded in
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("skimage")
+pytest.importorskip("loguru")
+from src.geometry.wires import _page_mask_boxes
+from src.utils.io import write_json
+
+MO = {"enable": True, "text": True, "legend": False, "margin_px": 4.0, "count_avoided": False}
+
+def _cfg(tmp_path):
+    return SimpleNamespace(paths=SimpleNamespace(processed=str(tmp_path / "processed")))
+
+def test_ingest_spans_scaled_by_recorded_ppi(tmp_path):
+    # the directory name carries no meaning: only text_ppi does
+    tj = tmp_path / "moved" / "elsewhere" / "page-1.json"
+    write_json([{"text": "K1", "bbox": [10, 20, 30, 25]}], tj)
+    pg = {"page": 1, "text_json": str(tj), "text_ppi": 450}
+    assert _page_mask_boxes(_cfg(tmp_path), "doc", pg, 900, MO) == [(16, 36, 64, 54)]
+
+def test_vector_text_scaled_by_index_ppi(tmp_path):
+    vec = tmp_path / "processed" / "vector_text"
+    write_json([{"text": "TB1", "bbox": [96, 96, 192, 120]}], vec / "doc" / "page-2.json")
+    write_json({"doc": [{"page": 2, "path": str(vec / "doc" / "page-2.json"), "count": 1, "source": "svg",
+                         "ppi": 96}]}, vec / "index.json")
+    # no text_ppi (manifest written before it was recorded): go through the index
+    pg = {"page": 2, "text_json": str(vec / "doc" / "page-2.json")}
+    assert _page_mask_boxes(_cfg(tmp_path), "doc", pg, 300, MO) == [(296, 296, 604, 379)]
+
+def test_legend_box_from_title_block_labels(tmp_path):
+    tj = tmp_path / "t" / "page-1.json"
+    write_json([{"text": "Title: MCC-2", "bbox": [1000, 900, 1200, 920]},
+                {"text": "Drawing No 17", "bbox": [1000, 930, 1150, 950]},
+                {"text": "Q1", "bbox": [10, 10, 30, 20]}], tj)
+    pg = {"page": 1, "text_json": str(tj), "text_ppi": 300}
+    mo = {**MO, "text": False, "legend": True}
+    assert _page_mask_boxes(_cfg(tmp_path), "doc", pg, 300, mo) == [(946, 846, 1254, 1004)]
+
+def test_no_text_no_boxes(tmp_path):
+    assert _page_mask_boxes(_cfg(tmp_path), "doc", {"page": 3}, 300, {**MO, "legend": True}) == []